@@ -0,0 +1,175 @@
+import zlib
+from typing import Any, Optional
+
+import orjson
+from bson import ObjectId
+from fastapi.encoders import ENCODERS_BY_TYPE
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel
+from starlette.datastructures import Headers, MutableHeaders
+
+from static_files import accepted_encodings, brotli
+
+# Default JSON response class and compression of API payloads.
+#
+# FastJSONResponse renders with orjson, which also handles datetime natively;
+# ObjectIds and models that reach it unconverted are handled by _default.
+# Return values without a response model go through jsonable_encoder first,
+# which learns ObjectId below.
+# CompressionMiddleware compresses JSON, NDJSON and CSV bodies above a minimum
+# size with the best coding the client accepts. Streamed bodies (the NDJSON
+# list and the export) are compressed as they come and flushed every
+# flush_size bytes, so they keep streaming without a flush per small chunk.
+# Compressing weakens the ETag, as the bytes sent are not the ones it was
+# made for. Responses that already carry a Content-Encoding pass through.
+
+COMPRESSIBLE_TYPES = {"application/json", "application/x-ndjson", "text/csv"}
+
+
+def _default(value: Any):
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+ENCODERS_BY_TYPE.setdefault(ObjectId, str)
+
+
+class FastJSONResponse(ORJSONResponse):
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    accepted = accepted_encodings(accept_encoding)
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+class _Compressor:
+    def __init__(self, coding: str, gzip_level: int, brotli_quality: int, flush_size: int):
+        self.flush_size = flush_size
+        self._pending = 0  # bytes taken in since the last flush
+        if coding == "br":
+            self._brotli = brotli.Compressor(quality=brotli_quality)
+        else:
+            self._brotli = None
+            self._zlib = zlib.compressobj(gzip_level, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+
+    def compress(self, data: bytes) -> bytes:
+        """
+        Compress a chunk. Output is flushed, so the client can decode it, once
+        flush_size bytes have come in; each flush costs some compression ratio.
+        """
+        self._pending += len(data)
+        flush = self._pending >= self.flush_size
+        if flush:
+            self._pending = 0
+        if self._brotli is not None:
+            return self._brotli.process(data) + (self._brotli.flush() if flush else b"")
+        return self._zlib.compress(data) + (self._zlib.flush(zlib.Z_SYNC_FLUSH) if flush else b"")
+
+    def finish(self) -> bytes:
+        if self._brotli is not None:
+            return self._brotli.finish()
+        return self._zlib.flush(zlib.Z_FINISH)
+
+
+def weak_etag(etag: str) -> str:
+    """Compressed bytes differ from the ones a strong ETag was made for"""
+    return etag if etag.startswith("W/") else "W/" + etag
+
+
+class CompressionMiddleware:
+    """ASGI middleware compressing API payloads with gzip or brotli"""
+
+    def __init__(
+        self,
+        app,
+        minimum_size: int = 1024,
+        gzip_level: int = 6,
+        brotli_quality: int = 4,
+        flush_size: int = 16 * 1024,
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.flush_size = flush_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        coding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if coding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        compressor = None  # set once the response is known to be compressed
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start_message, compressor, passthrough
+            if passthrough:
+                await send(message)
+                return
+            if message["type"] == "http.response.start":
+                headers = Headers(raw=message.get("headers", []))
+                media_type = headers.get("content-type", "").split(";")[0].strip()
+                if (
+                    media_type not in COMPRESSIBLE_TYPES
+                    or "content-encoding" in headers
+                    or message["status"] < 200
+                    or message["status"] in (204, 304)
+                ):
+                    passthrough = True
+                    await send(message)
+                else:
+                    # held back until the first body chunk shows how large it is
+                    start_message = message
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if compressor is None:
+                if not more_body and len(body) < self.minimum_size:
+                    passthrough = True
+                    await send(start_message)
+                    await send(message)
+                    return
+                compressor = _Compressor(
+                    coding, self.gzip_level, self.brotli_quality, self.flush_size
+                )
+                headers = MutableHeaders(raw=start_message["headers"])
+                headers["Content-Encoding"] = coding
+                headers.add_vary_header("Accept-Encoding")
+                if "etag" in headers:
+                    headers["ETag"] = weak_etag(headers["etag"])
+                if more_body:
+                    del headers["Content-Length"]
+                else:
+                    body = compressor.compress(body) + compressor.finish()
+                    headers["Content-Length"] = str(len(body))
+                    await send(start_message)
+                    await send({"type": "http.response.body", "body": body})
+                    return
+                await send(start_message)
+
+            chunk = compressor.compress(body) if body else b""
+            if not more_body:
+                chunk += compressor.finish()
+            elif not chunk:
+                return  # still buffered in the compressor
+            await send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
+        await self.app(scope, receive, send_compressed)
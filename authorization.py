@@ -0,0 +1,33 @@
+from fastapi import Depends
+
+from jwt_auth import TokenData, get_current_user
+from ttl_cache import TTLCache
+from user_model import User, UserSummary
+
+
+# Small LRU of username -> role. Entries are also dropped explicitly when a
+# role changes, so the TTL only bounds how long a change made by another
+# worker can take to show up.
+role_cache: TTLCache[str] = TTLCache(maxsize=1024, ttl=60)
+
+
+async def get_authorized_user(
+    current_user: TokenData = Depends(get_current_user),
+) -> TokenData:
+    """
+    Dependency that resolves the caller's current role once per request.
+    The role comes from the cache, and from the database on a miss, so a
+    role change applies before the token carrying the old role expires.
+    """
+    role = role_cache.get(current_user.username)
+    if role is None:
+        user = await User.find_one(
+            {"username": current_user.username}, projection_model=UserSummary
+        )
+        # a token for a user that no longer exists gets no special rights
+        role = user.role if user else "BasicUser"
+        role_cache.set(current_user.username, role)
+
+    if role == current_user.role:
+        return current_user
+    return current_user.model_copy(update={"role": role})
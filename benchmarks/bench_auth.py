@@ -0,0 +1,42 @@
+"""
+Per-request cost of authenticating a bearer token: full verification (HMAC
+signature and claims) against a hit in the token cache, which also covers the
+revocation check. Runs without a database:
+
+    python -m benchmarks.bench_auth
+"""
+import time
+
+import benchmarks.common  # noqa: F401  (sets the app settings)
+from jwt_auth import _verify_jwt_token, create_access_token, decode_jwt_token, token_cache
+from token_revocation import revoked_tokens, token_key
+
+ROUNDS = 50_000
+REVOKED = 10_000
+
+
+def per_call_us(function, rounds: int = ROUNDS) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        function()
+    return (time.perf_counter() - start) / rounds * 1_000_000
+
+
+def main():
+    token = create_access_token({"username": "bench_user", "role": "BasicUser"})
+    # a revocation list of realistic size, the lookup should not depend on it
+    for i in range(REVOKED):
+        revoked_tokens.add(token_key(f"revoked-{i}"), float("inf"))
+
+    verify = per_call_us(lambda: _verify_jwt_token(token))
+    token_cache.clear()
+    decode_jwt_token(token)
+    cached = per_call_us(lambda: decode_jwt_token(token))
+
+    print(f"{'full verification':>20}: {verify:6.2f} us per request")
+    print(f"{'cached':>20}: {cached:6.2f} us per request")
+    print(f"{'token cache':>20}: {token_cache.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Import throughput of POST /movies/bulk against one POST /movies per row, and
+export throughput of GET /movies/export. Needs a local mongod:
+
+    BENCH_MONGODB_URL=mongodb://localhost:27017 python -m benchmarks.bench_bulk_import
+"""
+import asyncio
+import json
+import time
+
+import httpx
+
+from benchmarks.common import init_bench_database, synthetic_title
+from jwt_auth import create_access_token
+from main import app
+
+BULK_ROWS = 100_000
+SINGLE_ROWS = 1_000
+CHUNK_ROWS = 1_000
+
+
+def row(i: int) -> dict:
+    return {
+        "movie": {"title": synthetic_title(i), "comment": f"Comment for movie {i}"},
+        "watchlist": {"watched_status": "watched" if i % 2 else "not_watched"},
+        "review": {"rating": i % 6, "review": f"Review for movie {i}"},
+    }
+
+
+async def ndjson_body(count: int):
+    for start in range(0, count, CHUNK_ROWS):
+        lines = (json.dumps(row(i)) for i in range(start, min(start + CHUNK_ROWS, count)))
+        yield ("\n".join(lines) + "\n").encode()
+
+
+async def clear(db):
+    for name in ["movies", "reviews", "watchlist"]:
+        await db[name].delete_many({})
+
+
+def report(label: str, rows: int, elapsed: float):
+    print(f"{label:>28}: {rows:7d} rows in {elapsed:6.2f} s, {rows / elapsed:8.0f} rows/s")
+
+
+async def main():
+    client_db, db = await init_bench_database()
+    token = create_access_token({"username": "bench_user", "role": "BasicUser"})
+    headers = {"Authorization": f"Bearer {token}"}
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench", timeout=None
+    ) as client:
+        await clear(db)
+        start = time.perf_counter()
+        for i in range(SINGLE_ROWS):
+            response = await client.post("/movies", json=row(i), headers=headers)
+            response.raise_for_status()
+        report("POST /movies, one per row", SINGLE_ROWS, time.perf_counter() - start)
+
+        await clear(db)
+        start = time.perf_counter()
+        response = await client.post(
+            "/movies/bulk",
+            content=ndjson_body(BULK_ROWS),
+            headers={**headers, "Content-Type": "application/x-ndjson"},
+        )
+        response.raise_for_status()
+        report("POST /movies/bulk", response.json()["inserted"], time.perf_counter() - start)
+
+        start = time.perf_counter()
+        exported = 0
+        async with client.stream("GET", "/movies/export", headers=headers) as response:
+            async for _ in response.aiter_lines():
+                exported += 1
+        report("GET /movies/export", exported, time.perf_counter() - start)
+
+    client_db.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,55 @@
+"""
+Latency of the movie detail lookup at simulated network round trip times.
+
+The previous get_movie_by_id ran Movie.get, User.find_one, Review.find_one and
+Watchlist.find_one one after another. Against a local mongod the round trips
+are almost free, so each row adds round trips x RTT to the measured time to
+show what the lookup costs when the database is further away. Needs a local
+mongod:
+
+    BENCH_MONGODB_URL=mongodb://localhost:27017 python -m benchmarks.bench_get_movie_by_id
+"""
+import asyncio
+
+from benchmarks.common import CommandCounter, init_bench_database, seed_movies, timed
+from movie_model import Movie, Review, Watchlist
+from movie_queries import fetch_movie_detail
+from user_model import User, UserSummary
+
+MOVIES = 10_000
+RTTS_MS = [0, 1, 5, 20]
+USERNAME = "bench_user"
+
+
+async def sequential_lookup(movie_id: str):
+    """The lookups get_movie_by_id used to make"""
+    movie = await Movie.get(movie_id)
+    await User.find_one({"username": USERNAME}, projection_model=UserSummary)
+    review = await Review.find_one({"movie_id": movie_id, "user_id": USERNAME})
+    watchlist = await Watchlist.find_one({"watched_id": movie_id, "user_id": USERNAME})
+    return movie, review, watchlist
+
+
+async def main():
+    counter = CommandCounter()
+    client, db = await init_bench_database(counter)
+    await seed_movies(db, MOVIES, username=USERNAME)
+    movie_id = str((await db["movies"].find_one({}, skip=MOVIES // 2))["_id"])
+
+    print(f"{'implementation':>15} {'round trips':>12} " + " ".join(f"{f'rtt {r}ms':>10}" for r in RTTS_MS))
+    for name, run in [
+        ("sequential", lambda: sequential_lookup(movie_id)),
+        ("aggregation", lambda: fetch_movie_detail(movie_id, USERNAME)),
+    ]:
+        counter.reset()
+        await run()
+        round_trips = counter.count
+        best, _ = await timed(run, repeat=20)
+        estimates = " ".join(f"{best + round_trips * rtt:>10.1f}" for rtt in RTTS_MS)
+        print(f"{name:>15} {round_trips:>12} {estimates}")
+
+    client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
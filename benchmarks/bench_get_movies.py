@@ -0,0 +1,79 @@
+"""
+Query count and latency of get_movies at different catalog sizes.
+
+Compares the aggregation based listing with the previous implementation that
+issued one Review.find_one per movie. The query count includes getMore
+batches of the aggregation cursor. Needs a local mongod:
+
+    BENCH_MONGODB_URL=mongodb://localhost:27017 python -m benchmarks.bench_get_movies
+"""
+import asyncio
+
+from bson import ObjectId
+
+from benchmarks.common import CommandCounter, init_bench_database, seed_movies, timed
+from jwt_auth import TokenData
+from movie_model import Movie, MovieResponse, Review, Watchlist
+from movie_queries import fetch_movie_list
+
+SIZES = [100, 1_000, 10_000]
+
+
+async def legacy_get_movies(watched_status: str, username: str):
+    """The per-movie review lookup that get_movies used to do"""
+    if watched_status == "all":
+        watched_information = await Watchlist.find_all().to_list()
+    else:
+        watched_information = await Watchlist.find(
+            {"watched_status": watched_status, "user_id": username}
+        ).to_list()
+    watchlist_map = {doc.watched_id: doc.watched_status for doc in watched_information}
+    ids = [ObjectId(doc.watched_id) for doc in watched_information]
+    movies = await Movie.find({"_id": {"$in": ids}}).to_list()
+    result = []
+    for movie in movies:
+        review = await Review.find_one({"movie_id": str(movie.id)})
+        result.append(
+            MovieResponse(
+                id=str(movie.id),
+                title=movie.title,
+                comment=movie.comment,
+                review=review.review if review else "",
+                added_by=movie.added_by,
+                rating=review.rating if review else 0,
+                date_added=movie.date_added,
+                watched_status=watchlist_map.get(str(movie.id), "not_watched"),
+            )
+        )
+    return result
+
+
+async def aggregated_get_movies(watched_status: str, username: str):
+    movies, _ = await fetch_movie_list(watched_status, username)
+    return movies
+
+
+async def main():
+    counter = CommandCounter()
+    client, db = await init_bench_database(counter)
+    user = TokenData(username="bench_user")
+
+    print(f"{'movies':>8} {'implementation':>15} {'queries':>8} {'best ms':>10}")
+    for size in SIZES:
+        await seed_movies(db, size, username=user.username)
+        for name, run in [
+            ("aggregation", lambda: aggregated_get_movies("all", user.username)),
+            ("per-movie", lambda: legacy_get_movies("all", user.username)),
+        ]:
+            counter.reset()
+            await run()
+            queries = counter.count
+            best, rows = await timed(run)
+            assert len(rows) == size
+            print(f"{size:>8} {name:>15} {queries:>8} {best:>10.1f}")
+
+    client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
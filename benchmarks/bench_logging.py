@@ -0,0 +1,71 @@
+"""
+Request throughput of GET /users/validate-token with logging off, with the
+queued logging pipeline, and with the file and console handlers attached to
+the logger directly (the previous setup, blocking the event loop).
+
+The endpoint logs one record per request and does not touch the database, so
+no mongod is needed. Console output goes to stderr; redirect it to see the
+cost of a real terminal or pipe:
+
+    python -m benchmarks.bench_logging 2>/dev/null
+"""
+import asyncio
+import logging
+import time
+from contextlib import contextmanager
+
+import httpx
+
+import benchmarks.common  # noqa: F401  (sets the app settings)
+import logging_config
+from jwt_auth import create_access_token
+from main import app
+
+REQUESTS = 2_000
+CONCURRENCY = 16
+
+
+@contextmanager
+def logging_mode(mode: str):
+    logger = logging_config.setup_logger()
+    queue_handlers = list(logger.handlers)
+    level = logger.level
+    try:
+        if mode == "off":
+            logger.setLevel(logging.CRITICAL + 1)
+        elif mode == "direct":
+            logger.handlers = list(logging_config._listener.handlers)
+        yield
+    finally:
+        logger.handlers = queue_handlers
+        logger.setLevel(level)
+
+
+async def run(client: httpx.AsyncClient, token: str) -> float:
+    headers = {"Authorization": f"Bearer {token}"}
+    remaining = iter(range(REQUESTS))
+
+    async def worker():
+        for _ in remaining:
+            response = await client.get("/users/validate-token", headers=headers)
+            response.raise_for_status()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(CONCURRENCY)))
+    return REQUESTS / (time.perf_counter() - start)
+
+
+async def main():
+    token = create_access_token({"username": "bench_user", "role": "BasicUser"})
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        await run(client, token)  # warm up
+        for mode in ["off", "queued", "direct"]:
+            with logging_mode(mode):
+                throughput = await run(client, token)
+            print(f"{mode:>8}: {throughput:8.0f} requests/s")
+    print(f"{'dropped':>8}: {logging_config.dropped_records()} records")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,116 @@
+"""
+Bytes read from Mongo, response bytes and CPU per row of the movie and user
+list read paths: hydrating full Beanie documents and copying them into the
+response models (before), against projecting rows into the response shape
+in the database and validating the page once (after). Needs a local mongod:
+
+    BENCH_MONGODB_URL=mongodb://localhost:27017 python -m benchmarks.bench_read_models
+"""
+import asyncio
+import time
+
+import bson
+from pymongo import monitoring
+
+from benchmarks.common import init_bench_database, seed_movies
+from jwt_auth import get_password_hash
+from movie_model import Movie, MovieResponse
+from movie_queries import fetch_movie_list, movie_list_adapter
+from user_queries import USER_PROJECTION, user_list_adapter
+from user_model import User, UserDto
+
+ROWS = 10_000
+REPEAT = 3
+
+
+class ReplyBytes(monitoring.CommandListener):
+    """Size of the BSON replies, roughly the bytes the server sends back"""
+
+    def __init__(self):
+        self.enabled = False
+        self.total = 0
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        if self.enabled:
+            self.total += len(bson.encode(event.reply))
+
+    def failed(self, event):
+        pass
+
+
+async def movies_before():
+    movies = await Movie.find_all().to_list()
+    rows = [
+        MovieResponse(
+            id=str(movie.id),
+            title=movie.title,
+            comment=movie.comment,
+            added_by=movie.added_by,
+            date_added=movie.date_added,
+        )
+        for movie in movies
+    ]
+    return movie_list_adapter.dump_json(rows)
+
+
+async def movies_after():
+    rows, _ = await fetch_movie_list("all", "bench_user")
+    return movie_list_adapter.dump_json(rows)
+
+
+async def users_before():
+    users = await User.find_all().to_list()
+    rows = [UserDto(id=str(u.id), username=u.username, email=u.email, role=u.role) for u in users]
+    return user_list_adapter.dump_json(rows)
+
+
+async def users_after():
+    rows = await User.aggregate([USER_PROJECTION]).to_list()
+    return user_list_adapter.dump_json(user_list_adapter.validate_python(rows))
+
+
+async def measure(label: str, read, replies: ReplyBytes):
+    replies.enabled, replies.total = True, 0
+    body = await read()
+    replies.enabled = False
+    mongo_bytes = replies.total
+
+    best_cpu = None
+    for _ in range(REPEAT):
+        start = time.process_time()
+        await read()
+        cpu = time.process_time() - start
+        best_cpu = cpu if best_cpu is None else min(best_cpu, cpu)
+    print(
+        f"{label:>16}: {mongo_bytes / ROWS:7.0f} B/row from Mongo"
+        f"  {len(body) / ROWS:6.0f} B/row response"
+        f"  {best_cpu / ROWS * 1_000_000:6.1f} us CPU/row"
+    )
+
+
+async def main():
+    replies = ReplyBytes()
+    client, db = await init_bench_database(replies)
+    await seed_movies(db, ROWS)
+    await db["users"].delete_many({})
+    password = get_password_hash("benchmark-password")
+    await db["users"].insert_many(
+        [
+            {"username": f"user{i}", "email": f"user{i}@example.com", "password": password,
+             "role": "BasicUser"}
+            for i in range(ROWS)
+        ]
+    )
+
+    await measure("movies before", movies_before, replies)
+    await measure("movies after", movies_after, replies)
+    await measure("users before", users_before, replies)
+    await measure("users after", users_after, replies)
+    client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,91 @@
+"""
+CPU per request and bytes on the wire of a movie list response at 1k and 10k
+rows: FastAPI's stdlib JSONResponse against the orjson default response class
+and the pre-serialized body the list endpoints send, each without compression
+and with gzip (and brotli, if installed). Rows are built in memory, so it runs
+without a database:
+
+    python -m benchmarks.bench_responses
+"""
+import asyncio
+import time
+from datetime import datetime, timedelta
+from typing import List
+
+import httpx
+from fastapi import FastAPI, Response
+from fastapi.responses import JSONResponse
+
+from benchmarks.common import synthetic_title
+from api_responses import CompressionMiddleware, FastJSONResponse, brotli
+from movie_model import MovieResponse
+from movie_queries import movie_list_adapter
+
+SIZES = [1_000, 10_000]
+REQUESTS = 20
+
+
+def build_app(rows: List[MovieResponse], compress: bool) -> FastAPI:
+    app = FastAPI()
+    if compress:
+        app.add_middleware(CompressionMiddleware)
+
+    @app.get("/stdlib", response_model=List[MovieResponse], response_class=JSONResponse)
+    async def stdlib():
+        return rows
+
+    @app.get("/orjson", response_model=List[MovieResponse], response_class=FastJSONResponse)
+    async def fast():
+        return rows
+
+    @app.get("/adapter", response_model=List[MovieResponse])
+    async def adapter():
+        return Response(movie_list_adapter.dump_json(rows), media_type="application/json")
+
+    return app
+
+
+def make_rows(count: int) -> List[MovieResponse]:
+    start = datetime(2025, 1, 1)
+    return [
+        MovieResponse(
+            id=f"{i:024x}", title=synthetic_title(i), comment="A comment about the movie",
+            added_by=f"user{i % 50}", rating=i % 6, average_rating=(i % 50) / 10,
+            review_count=i % 7, date_added=start + timedelta(minutes=i),
+            watched_status="watched" if i % 2 else "not_watched",
+        )
+        for i in range(count)
+    ]
+
+
+async def measure(client: httpx.AsyncClient, path: str, encoding: str):
+    headers = {"Accept-Encoding": encoding}
+    # the raw body, before httpx decodes it, is what the client receives
+    async with client.stream("GET", path, headers=headers) as response:
+        wire_bytes = sum([len(chunk) async for chunk in response.aiter_raw()])
+    start = time.process_time()
+    for _ in range(REQUESTS):
+        await client.get(path, headers=headers)
+    cpu_ms = (time.process_time() - start) / REQUESTS * 1000
+    return cpu_ms, wire_bytes
+
+
+async def main():
+    encodings = ["identity", "gzip"] + (["br"] if brotli is not None else [])
+    for size in SIZES:
+        rows = make_rows(size)
+        print(f"{size} movies")
+        for encoding in encodings:
+            app = build_app(rows, compress=encoding != "identity")
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+                for path in ["/stdlib", "/orjson", "/adapter"]:
+                    cpu_ms, wire_bytes = await measure(client, path, encoding)
+                    print(
+                        f"  {path[1:]:>8} {encoding:>8}: {cpu_ms:8.2f} ms CPU/request"
+                        f"  {wire_bytes / 1024:8.1f} KiB on the wire"
+                    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,41 @@
+"""
+Latency of GET /movies/search against downloading the whole list and
+filtering it, which is what the frontend would have to do without search.
+Needs a local mongod:
+
+    BENCH_MONGODB_URL=mongodb://localhost:27017 python -m benchmarks.bench_search
+"""
+import asyncio
+
+from benchmarks.common import init_bench_database, seed_movies, timed
+from movie_queries import fetch_movie_list, search_movies
+
+SIZES = [1_000, 10_000, 100_000]
+QUERY = "ghost"
+
+
+async def fetch_all_and_filter(query: str):
+    movies, _ = await fetch_movie_list("all", "bench_user")
+    query = query.lower()
+    return [m for m in movies if query in m.title.lower() or query in (m.comment or "").lower()][:20]
+
+
+async def main():
+    client, db = await init_bench_database()
+
+    print(f"{'movies':>8} {'approach':>22} {'best ms':>10} {'rows':>6}")
+    for size in SIZES:
+        await seed_movies(db, size)
+        for name, run in [
+            ("fetch all + filter", lambda: fetch_all_and_filter(QUERY)),
+            ("text search", lambda: search_movies(QUERY, "text", 0, 20)),
+            ("prefix search", lambda: search_movies(QUERY, "prefix", 0, 20)),
+        ]:
+            best, rows = await timed(run, repeat=3)
+            print(f"{size:>8} {name:>22} {best:>10.1f} {len(rows):>6}")
+
+    client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,233 @@
+import os
+import time
+from datetime import datetime, timedelta
+
+# Benchmarks run against a scratch database on a local mongod by default
+BENCH_MONGODB_URL = os.environ.get("BENCH_MONGODB_URL", "mongodb://localhost:27017")
+BENCH_DB_NAME = os.environ.get("BENCH_DB_NAME", "MovieTrackerBench")
+
+# The app settings are required at import time of some modules
+os.environ.setdefault("CONNECTION_STRING", BENCH_MONGODB_URL)
+os.environ.setdefault("SECRET_KEY", "benchmark-secret")
+
+from beanie import init_beanie
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import monitoring
+
+from movie_model import (
+    Movie,
+    MovieTombstone,
+    Review,
+    Watchlist,
+    normalize_title,
+    utc_now,
+    watchlist_copies,
+)
+from db_context import dedupe_reviews
+from live_events import StreamTicket
+from token_revocation import RevokedToken
+from user_model import User
+
+
+TITLE_WORDS = [
+    "Star", "Night", "Return", "Lost", "City", "Dream", "Empire", "Shadow", "River",
+    "Ghost", "Summer", "Winter", "Last", "Secret", "Journey", "Storm", "Garden", "Island",
+]
+
+
+def synthetic_title(i: int) -> str:
+    words = len(TITLE_WORDS)
+    return f"{TITLE_WORDS[i % words]} {TITLE_WORDS[(i * 7 + 3) % words]} {i}"
+
+
+class CommandCounter(monitoring.CommandListener):
+    """Counts the commands sent to the server, ignoring handshakes and pings"""
+
+    ignored = {"hello", "ismaster", "isMaster", "ping", "endSessions"}
+
+    def __init__(self):
+        self.commands = []
+
+    def reset(self):
+        self.commands = []
+
+    @property
+    def count(self):
+        return len(self.commands)
+
+    def started(self, event):
+        if event.command_name not in self.ignored:
+            self.commands.append(event.command_name)
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+async def init_bench_database(counter: CommandCounter | None = None, backend: str = "mongod"):
+    """
+    backend "mongomock" uses the in-memory mongomock-motor client instead of a
+    mongod. It has no command monitoring and does not implement everything
+    the app uses ($lookup with a pipeline, $convert, sessions, GridFS).
+    """
+    if backend == "mongomock":
+        from mongomock_motor import AsyncMongoMockClient
+
+        client = AsyncMongoMockClient()
+    else:
+        listeners = [counter] if counter else []
+        client = AsyncIOMotorClient(BENCH_MONGODB_URL, event_listeners=listeners)
+    db = client[BENCH_DB_NAME]
+    # a database left by an older run may hold the non-unique review index
+    await dedupe_reviews(db)
+    await init_beanie(
+        database=db,
+        document_models=[
+            User, Movie, Review, Watchlist, MovieTombstone, RevokedToken, StreamTicket
+        ],
+    )
+    return client, db
+
+
+async def seed_movies(db, count: int, username: str = "bench_user"):
+    """Insert count movies, each with one review and one watchlist entry"""
+    for name in ["movies", "reviews", "watchlist"]:
+        await db[name].delete_many({})
+
+    start = datetime.now() - timedelta(days=count)
+    # the fields the startup backfills would set, which benchmarks do not run
+    updated_at = utc_now()
+    movies, reviews, watchlist = [], [], []
+    for i in range(count):
+        movie_id = ObjectId()
+        title = synthetic_title(i)
+        movies.append(
+            {
+                "_id": movie_id,
+                "title": title,
+                "title_normalized": normalize_title(title),
+                "rating_sum": i % 6,
+                "rating_count": 1,
+                "rating_histogram": {str(i % 6): 1},
+                "rating_average": i % 6,
+                "comment": f"Comment for movie {i}",
+                "added_by": username,
+                "date_added": start + timedelta(days=i),
+                "updated_at": updated_at,
+            }
+        )
+        reviews.append(
+            {
+                "movie_id": str(movie_id),
+                "user_id": username,
+                "rating": i % 6,
+                "review": f"Review for movie {i}",
+                "date_added": start + timedelta(days=i),
+                "updated_at": updated_at,
+            }
+        )
+        watchlist.append(
+            {
+                "_id": str(movie_id),
+                "watched_id": str(movie_id),
+                "user_id": username,
+                "watched_status": "watched" if i % 2 else "not_watched",
+                "date_added": start + timedelta(days=i),
+                "updated_at": updated_at,
+                **watchlist_copies(movies[-1]),
+            }
+        )
+    await db["movies"].insert_many(movies)
+    await db["reviews"].insert_many(reviews)
+    await db["watchlist"].insert_many(watchlist)
+
+
+async def seed_dataset(
+    db, users: int, movies: int, reviews_per_movie: int, password_hash: str, batch_size: int = 10_000
+):
+    """
+    Insert users user0..user{users-1} sharing one password hash, and movies
+    added round robin by them. Each movie is reviewed by reviews_per_movie
+    consecutive users, starting with its creator, and sits on each reviewer's
+    watchlist. Rating stats on the movies match the reviews, and every field
+    the startup backfills would set is seeded, since the harness skips them.
+    """
+    for name in ["users", "movies", "reviews", "watchlist"]:
+        await db[name].delete_many({})
+
+    await db["users"].insert_many(
+        [
+            {"username": f"user{i}", "email": f"user{i}@example.com", "password": password_hash,
+             "role": "AdminUser" if i == 0 else "BasicUser"}
+            for i in range(users)
+        ]
+    )
+
+    reviewers_per_movie = min(reviews_per_movie, users)
+    start = datetime.now() - timedelta(minutes=movies)
+    updated_at = utc_now()
+    batches = {"movies": [], "reviews": [], "watchlist": []}
+    for i in range(movies):
+        movie_id = ObjectId()
+        date_added = start + timedelta(minutes=i)
+        ratings = [(i + j) % 6 for j in range(reviewers_per_movie)]
+        title = synthetic_title(i)
+        histogram = {}
+        for rating in ratings:
+            histogram[str(rating)] = histogram.get(str(rating), 0) + 1
+        batches["movies"].append(
+            {
+                "_id": movie_id,
+                "title": title,
+                "title_normalized": normalize_title(title),
+                "comment": f"Comment for movie {i}",
+                "added_by": f"user{i % users}",
+                "date_added": date_added,
+                "rating_sum": sum(ratings),
+                "rating_count": len(ratings),
+                "rating_histogram": histogram,
+                "rating_average": sum(ratings) / len(ratings) if ratings else 0,
+                "updated_at": updated_at,
+            }
+        )
+        for j, rating in enumerate(ratings):
+            reviewer = f"user{(i + j) % users}"
+            batches["reviews"].append(
+                {"movie_id": str(movie_id), "user_id": reviewer, "rating": rating,
+                 "review": f"Review {j} for movie {i}", "date_added": date_added,
+                 "updated_at": updated_at}
+            )
+            batches["watchlist"].append(
+                {"_id": str(ObjectId()) if j else str(movie_id), "watched_id": str(movie_id),
+                 "user_id": reviewer, "watched_status": "watched" if (i + j) % 2 else "not_watched",
+                 "date_added": date_added, "updated_at": updated_at,
+                 **watchlist_copies(batches["movies"][-1])}
+            )
+        if len(batches["reviews"]) >= batch_size:
+            for name, documents in batches.items():
+                await db[name].insert_many(documents)
+                documents.clear()
+    for name, documents in batches.items():
+        if documents:
+            await db[name].insert_many(documents)
+
+
+async def timed(coro_factory, repeat: int = 5):
+    """Run coro_factory() repeat times and return the best wall time in ms"""
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = await coro_factory()
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def percentile(samples, pct: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
@@ -0,0 +1,262 @@
+"""
+Load test of the API, driving the real FastAPI app in-process through an ASGI
+client against a seeded database. Each scenario reports throughput, latency
+percentiles, errors and the number of Mongo commands per request, and the
+results can be written as JSON and compared between commits:
+
+    BENCH_MONGODB_URL=mongodb://localhost:27017 python -m benchmarks.harness \\
+        --users 100 --movies 10000 --output before.json
+    python -m benchmarks.harness --movies 10000 --output after.json --compare before.json
+
+--backend mongomock runs without a mongod, for smoke runs; scenarios that
+need features mongomock lacks are reported with errors and no command counts.
+"""
+import argparse
+import asyncio
+import json
+import random
+import subprocess
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from typing import Callable, Optional
+
+import httpx
+
+from benchmarks.common import CommandCounter, init_bench_database, percentile, seed_dataset
+from jwt_auth import create_access_token, get_password_hash
+from main import app
+from photo_store import save_photo
+from response_cache import get_response_cache
+
+PASSWORD = "benchmark-password"
+# smallest valid PNG, for the photo fetch scenario
+PHOTO = bytes.fromhex(
+    "89504e470d0a1a0a0000000d4948445200000001000000010806000000"
+    "1f15c4890000000d49444154789c6360000002000154a24f5d0000000049454e44ae426082"
+)
+
+
+@dataclass
+class Context:
+    tokens: list
+    own_movie_ids: list  # movies added by user0, which user0 may edit
+    movie_ids: list
+    photo_id: Optional[str]
+    users: int
+    rng: random.Random
+
+
+@dataclass
+class Result:
+    requests: int
+    errors: int
+    throughput_rps: float
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+    mongo_ops_per_request: Optional[float]
+
+
+def auth(context: Context, user: int = 0) -> dict:
+    return {"Authorization": f"Bearer {context.tokens[user]}"}
+
+
+def movie_payload(context: Context) -> dict:
+    rating = context.rng.randint(1, 5)
+    return {
+        "movie": {"title": f"Edited {rating}", "comment": "edited by the harness"},
+        "watchlist": {"watched_status": context.rng.choice(["watched", "not_watched"])},
+        "review": {"rating": rating, "review": "edited"},
+    }
+
+
+def list_scenario(watched_status: str, **params) -> Callable:
+    return lambda context: ("GET", f"/movies/{watched_status}", {
+        "params": {"limit": 50, **params}, "headers": auth(context),
+    })
+
+
+def sign_in(context: Context):
+    user = context.rng.randrange(context.users)
+    return "POST", "/users/sign-in", {"data": {"username": f"user{user}", "password": PASSWORD}}
+
+
+SCENARIOS: dict[str, Callable] = {
+    "list_all": list_scenario("all"),
+    "list_my": list_scenario("my"),
+    "list_watched": list_scenario("watched"),
+    "list_not_watched": list_scenario("not_watched"),
+    "list_all_by_rating": list_scenario("all", sort="-rating", min_rating=3),
+    "list_my_by_title": list_scenario("my", sort="title"),
+    "get_movie_by_id": lambda context: (
+        "GET", f"/movies/get/{context.rng.choice(context.movie_ids)}", {"headers": auth(context)}
+    ),
+    "update_movie": lambda context: (
+        "PUT", f"/movies/{context.rng.choice(context.own_movie_ids)}",
+        {"json": movie_payload(context), "headers": auth(context)},
+    ),
+    "add_review": lambda context: (
+        "POST", f"/movies/{context.rng.choice(context.movie_ids)}/reviews",
+        {"json": {"rating": context.rng.randint(0, 5), "review": "harness"},
+         "headers": auth(context, context.rng.randrange(context.users))},
+    ),
+    "sign_in": sign_in,
+    "photo_fetch": lambda context: ("GET", f"/movies/photos/{context.photo_id}", {}),
+}
+
+
+async def run_scenario(
+    client: httpx.AsyncClient,
+    build_request: Callable,
+    context: Context,
+    requests: int,
+    concurrency: int,
+    counter: Optional[CommandCounter],
+    cold_cache: bool,
+) -> Result:
+    latencies, errors = [], 0
+    remaining = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for _ in remaining:
+            method, url, kwargs = build_request(context)
+            if cold_cache:
+                await get_response_cache().invalidate_all()
+            start = time.perf_counter()
+            response = await client.request(method, url, **kwargs)
+            latencies.append((time.perf_counter() - start) * 1000)
+            if response.status_code >= 400:
+                errors += 1
+
+    if counter:
+        counter.reset()
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    return Result(
+        requests=requests,
+        errors=errors,
+        throughput_rps=round(requests / elapsed, 1),
+        p50_ms=round(percentile(latencies, 50), 3),
+        p95_ms=round(percentile(latencies, 95), 3),
+        p99_ms=round(percentile(latencies, 99), 3),
+        mongo_ops_per_request=round(counter.count / requests, 2) if counter else None,
+    )
+
+
+async def build_context(db, args) -> Context:
+    await seed_dataset(
+        db, args.users, args.movies, args.reviews_per_movie, get_password_hash(PASSWORD)
+    )
+    movies = await db["movies"].find({}, projection={"added_by": 1}).to_list(None)
+    try:
+        photo_id = await save_photo(PHOTO, "image/png")
+    except Exception as e:
+        print(f"Could not store the photo, photo_fetch will fail: {e}")
+        photo_id = "0" * 64
+    return Context(
+        # user0 is the only admin, as seeded
+        tokens=[
+            create_access_token(
+                {"username": f"user{i}", "role": "AdminUser" if i == 0 else "BasicUser"}
+            )
+            for i in range(args.users)
+        ],
+        own_movie_ids=[str(m["_id"]) for m in movies if m["added_by"] == "user0"],
+        movie_ids=[str(m["_id"]) for m in movies],
+        photo_id=photo_id,
+        users=args.users,
+        rng=random.Random(args.seed),
+    )
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(results: dict, baseline: Optional[dict]):
+    print(
+        f"{'scenario':>18} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}"
+        f" {'ops/req':>8} {'errors':>6}"
+    )
+    for name, result in results.items():
+        ops = result["mongo_ops_per_request"]
+        line = (
+            f"{name:>18} {result['throughput_rps']:9.1f} {result['p50_ms']:8.2f}"
+            f" {result['p95_ms']:8.2f} {result['p99_ms']:8.2f}"
+            f" {ops if ops is not None else '-':>8} {result['errors']:6d}"
+        )
+        before = (baseline or {}).get(name)
+        if before and before["throughput_rps"]:
+            change = (result["throughput_rps"] / before["throughput_rps"] - 1) * 100
+            p99_change = (result["p99_ms"] / before["p99_ms"] - 1) * 100 if before["p99_ms"] else 0
+            line += f"   req/s {change:+6.1f}%  p99 {p99_change:+6.1f}%"
+        print(line)
+
+
+async def main(args):
+    counter = CommandCounter() if args.backend == "mongod" else None
+    client_db, db = await init_bench_database(counter, backend=args.backend)
+    context = await build_context(db, args)
+
+    names = args.scenarios or list(SCENARIOS)
+    results = {}
+    # an unhandled error in the app counts as a failed request, it does not stop the run
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for name in names:
+            result = await run_scenario(
+                client, SCENARIOS[name], context, args.requests, args.concurrency,
+                counter, args.cold_cache,
+            )
+            results[name] = asdict(result)
+    client_db.close()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)["results"]
+    print_results(results, baseline)
+
+    if args.output:
+        report = {
+            "commit": git_commit(),
+            "timestamp": datetime.now().isoformat(),
+            "backend": args.backend,
+            "scale": {"users": args.users, "movies": args.movies,
+                      "reviews_per_movie": args.reviews_per_movie},
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "cold_cache": args.cold_cache,
+            "results": results,
+        }
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Load test the API in-process")
+    parser.add_argument("--backend", choices=["mongod", "mongomock"], default="mongod")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--movies", type=int, default=5_000)
+    parser.add_argument("--reviews-per-movie", type=int, default=3)
+    parser.add_argument("--requests", type=int, default=500, help="per scenario")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--cold-cache", action="store_true", help="bypass the list response cache")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--scenarios", nargs="*", choices=list(SCENARIOS))
+    parser.add_argument("--output", help="write the results as JSON")
+    parser.add_argument("--compare", help="JSON results of an earlier run")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
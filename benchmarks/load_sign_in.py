@@ -0,0 +1,93 @@
+"""
+Latency of GET /movies/all while sign-ins hammer the same worker.
+
+bcrypt now runs on the password hasher's thread pool, so the p99 of the
+movie list should stay close to its idle value during a sign-in burst.
+Needs a local mongod:
+
+    BENCH_MONGODB_URL=mongodb://localhost:27017 python -m benchmarks.load_sign_in
+"""
+import asyncio
+import time
+
+import httpx
+
+from benchmarks.common import init_bench_database, percentile, seed_movies
+from jwt_auth import create_access_token, get_password_hash
+from main import app
+from password_hasher import get_password_hasher
+
+MOVIES = 1_000
+PROBES = 200
+SIGN_IN_CLIENTS = 16
+PASSWORD = "benchmark-password"
+
+
+async def probe_movies(client: httpx.AsyncClient, token: str, count: int):
+    latencies = []
+    for _ in range(count):
+        start = time.perf_counter()
+        response = await client.get(
+            "/movies/all", params={"limit": 50}, headers={"Authorization": f"Bearer {token}"}
+        )
+        response.raise_for_status()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+async def hammer_sign_in(client: httpx.AsyncClient, username: str, stop: asyncio.Event):
+    count = 0
+    while not stop.is_set():
+        response = await client.post(
+            "/users/sign-in", data={"username": username, "password": PASSWORD}
+        )
+        response.raise_for_status()
+        count += 1
+    return count
+
+
+def report(label: str, latencies):
+    print(
+        f"{label:>22}: p50 {percentile(latencies, 50):7.1f} ms"
+        f"  p99 {percentile(latencies, 99):7.1f} ms"
+    )
+
+
+async def main():
+    client_db, db = await init_bench_database()
+    await seed_movies(db, MOVIES)
+    await db["users"].delete_many({})
+    hashed = get_password_hash(PASSWORD)
+    await db["users"].insert_many(
+        [
+            {"username": f"user{i}", "email": f"user{i}@example.com", "password": hashed,
+             "role": "BasicUser"}
+            for i in range(SIGN_IN_CLIENTS)
+        ]
+    )
+    token = create_access_token({"username": "bench_user", "role": "BasicUser"})
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        report("idle", await probe_movies(client, token, PROBES))
+
+        stop = asyncio.Event()
+        sign_ins = [
+            asyncio.create_task(hammer_sign_in(client, f"user{i}", stop))
+            for i in range(SIGN_IN_CLIENTS)
+        ]
+        start = time.perf_counter()
+        latencies = await probe_movies(client, token, PROBES)
+        stop.set()
+        completed = sum(await asyncio.gather(*sign_ins))
+        elapsed = time.perf_counter() - start
+
+        report(f"{SIGN_IN_CLIENTS} sign-in clients", latencies)
+        print(f"{'sign-ins':>22}: {completed / elapsed:7.1f} /s")
+        print(f"{'hasher':>22}: {get_password_hasher().stats()}")
+
+    client_db.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,14 +1,188 @@
+import asyncio
 import logging
+from contextlib import asynccontextmanager
+from datetime import datetime
 from beanie import init_beanie
+from bson import ObjectId
 from my_config import get_settings
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReadPreference
 
-from movie_model import Movie, Review, Watchlist
+from live_events import StreamTicket
+from movie_model import Movie, MovieTombstone, Review, Watchlist
+from metrics import mongo_command_timer
+from pool_monitor import pool_gauges
+from token_revocation import RevokedToken
 from user_model import User
 
 logger = logging.getLogger(__name__)
 
-async def init_database():
+# Query shapes the routers run, as (document model, filter, sort). Each one is
+# explained at startup so a shape that is not backed by an index gets noticed.
+QUERY_SHAPES = [
+    (Movie, {}, [("date_added", 1), ("_id", 1)]),
+    (Movie, {"title_normalized": {"$regex": "^a"}}, [("title_normalized", 1), ("_id", 1)]),
+    (Movie, {"rating_average": {"$gte": 3}}, [("rating_average", 1), ("_id", 1)]),
+    (Movie, {"added_by": ""}, [("date_added", 1), ("_id", 1)]),
+    (Watchlist, {"user_id": "", "watched_status": ""}, [("date_added", 1), ("_id", 1)]),
+    (Watchlist, {"user_id": ""}, [("date_added", 1), ("_id", 1)]),
+    (
+        Watchlist,
+        {"user_id": "", "watched_status": "", "date_added": {"$gte": datetime.min}},
+        [("date_added", 1), ("_id", 1)],
+    ),
+    (Watchlist, {"user_id": "", "added_by": ""}, [("date_added", 1), ("_id", 1)]),
+    (Watchlist, {"user_id": "", "watched_status": ""}, [("title_normalized", 1), ("_id", 1)]),
+    (Watchlist, {"user_id": "", "watched_status": ""}, [("rating_average", 1), ("_id", 1)]),
+    (Watchlist, {"user_id": ""}, [("title_normalized", 1), ("_id", 1)]),
+    (Watchlist, {"user_id": ""}, [("rating_average", 1), ("_id", 1)]),
+    (
+        Watchlist,
+        {"user_id": "", "rating_average": {"$gte": 3}},
+        [("rating_average", 1), ("_id", 1)],
+    ),
+    (Watchlist, {"watched_status": ""}, None),
+    (Watchlist, {"watched_id": ""}, None),
+    (Watchlist, {"watched_id": "", "user_id": ""}, None),
+    (Watchlist, {"user_id": "", "updated_at": {"$gte": datetime.min}}, None),
+    (Watchlist, {"updated_at": {"$gte": datetime.min}}, None),
+    (Movie, {"updated_at": {"$gte": datetime.min}}, None),
+    (Review, {"updated_at": {"$gte": datetime.min}}, None),
+    (MovieTombstone, {"deleted_at": {"$gte": datetime.min}}, None),
+    (Review, {"movie_id": ""}, None),
+    (Review, {"movie_id": "", "user_id": ""}, None),
+    (User, {"username": ""}, None),
+    (User, {"email": ""}, None),
+    (User, {}, [("username", 1)]),
+    (User, {"role": ""}, [("username", 1)]),
+    (User, {"username": {"$regex": "^a"}}, [("username", 1)]),
+    (User, {"email": {"$regex": "^a"}}, [("email", 1)]),
+]
+
+
+def find_stage(plan, stage: str) -> bool:
+    """Return True if an explain() plan contains the stage, e.g. COLLSCAN or an in-memory SORT"""
+    if isinstance(plan, dict):
+        if plan.get("stage") == stage:
+            return True
+        return any(find_stage(value, stage) for value in plan.values())
+    if isinstance(plan, list):
+        return any(find_stage(value, stage) for value in plan)
+    return False
+
+
+async def check_query_plans():
+    """Explain every known query shape and warn about collection scans and in-memory sorts"""
+    for model, query_filter, sort in QUERY_SHAPES:
+        collection = model.get_motor_collection()
+        cursor = collection.find(query_filter).limit(1)
+        if sort:
+            cursor = cursor.sort(sort)
+        try:
+            explanation = await cursor.explain()
+        except Exception as e:
+            logger.warning(f"Could not explain query on '{collection.name}': {str(e)}")
+            continue
+        winning_plan = explanation.get("queryPlanner", {}).get("winningPlan", {})
+        for stage, problem in (("COLLSCAN", "is a COLLSCAN"), ("SORT", "sorts in memory")):
+            if find_stage(winning_plan, stage):
+                logger.warning(
+                    f"Query on '{collection.name}' with filter {list(query_filter)} "
+                    f"and sort {sort} {problem}; add an index to the model's Settings"
+                )
+
+
+REVIEW_INDEX = "movie_id_1_user_id_1"
+
+
+def stale_duplicates(reviews: list) -> list:
+    """Ids of all but the latest of one user's reviews of a movie"""
+    latest_first = sorted(
+        reviews, key=lambda review: (review.get("u") or datetime.min, review["i"]), reverse=True
+    )
+    return [review["i"] for review in latest_first[1:]]
+
+
+async def dedupe_reviews(db) -> list:
+    """
+    Prepare the reviews for the unique (movie_id, user_id) index: delete all
+    but the latest review of each user and movie, and drop the index if it
+    was built without unique. Returns the ids of the movies whose stats
+    counted the deleted reviews.
+    """
+    reviews = db["reviews"]
+    indexes = await reviews.index_information()
+    if REVIEW_INDEX in indexes and indexes[REVIEW_INDEX].get("unique"):
+        return []
+    duplicates = reviews.aggregate(
+        [
+            {
+                "$group": {
+                    "_id": {"movie_id": "$movie_id", "user_id": "$user_id"},
+                    "reviews": {
+                        "$push": {"u": {"$ifNull": ["$updated_at", None]}, "i": "$_id"}
+                    },
+                    "count": {"$sum": 1},
+                }
+            },
+            {"$match": {"count": {"$gt": 1}}},
+        ],
+        allowDiskUse=True,
+    )
+    stale, movie_ids = [], []
+    async for group in duplicates:
+        stale += stale_duplicates(group["reviews"])
+        if ObjectId.is_valid(group["_id"]["movie_id"]):
+            movie_ids.append(group["_id"]["movie_id"])
+    for start in range(0, len(stale), 1000):
+        await reviews.delete_many({"_id": {"$in": stale[start:start + 1000]}})
+    if stale:
+        logger.warning(
+            f"Deleted {len(stale)} duplicate reviews of {len(movie_ids)} movies"
+            " before building the unique review index"
+        )
+    if REVIEW_INDEX in indexes:
+        await reviews.drop_index(REVIEW_INDEX)
+    return movie_ids
+
+
+@asynccontextmanager
+async def transaction():
+    """
+    Yield a session running a transaction. Standalone servers do not support
+    transactions, so there the session only groups the operations.
+    """
+    client = Movie.get_motor_collection().database.client
+    topology = client.topology_description.topology_type_name
+    async with await client.start_session() as session:
+        if topology in ("ReplicaSetWithPrimary", "Sharded", "LoadBalanced"):
+            # transactions must read from the primary whatever the client's read preference
+            async with session.start_transaction(read_preference=ReadPreference.PRIMARY):
+                yield session
+        else:
+            yield session
+
+
+def pool_options(my_config) -> dict:
+    """Client keyword arguments for the pool settings that are set"""
+    options = {
+        "maxPoolSize": my_config.mongo_max_pool_size,
+        "minPoolSize": my_config.mongo_min_pool_size,
+        "maxIdleTimeMS": my_config.mongo_max_idle_time_ms,
+        "waitQueueTimeoutMS": my_config.mongo_wait_queue_timeout_ms,
+        "compressors": my_config.mongo_compressors,
+        "readPreference": my_config.mongo_read_preference,
+    }
+    return {name: value for name, value in options.items() if value is not None}
+
+
+async def warm_pool(client: AsyncIOMotorClient, connections: int):
+    """Open connections up front so the first requests do not pay for the handshakes"""
+    await asyncio.gather(*(client.admin.command("ping") for _ in range(max(1, connections))))
+
+
+async def init_database() -> AsyncIOMotorClient:
+    """Connect, initialize Beanie and warm the pool; the caller closes the returned client"""
     my_config = get_settings()
     # Add tlsAllowInvalidCertificates=true to the connection string
     connection_string = my_config.connection_string
@@ -17,11 +191,31 @@ async def init_database():
     else:
         connection_string += "?tlsAllowInvalidCertificates=true"
     try:
-        client = AsyncIOMotorClient(connection_string)
+        client = AsyncIOMotorClient(
+            connection_string,
+            event_listeners=[pool_gauges, mongo_command_timer],
+            **pool_options(my_config),
+        )
         logger.info("database client created")
         db = client["MovieTracker"]
-        await init_beanie(database=db, document_models=[User, Movie, Review, Watchlist])
+        deduped_movies = await dedupe_reviews(db)
+        # init_beanie also builds the indexes declared in each model's Settings
+        await init_beanie(
+            database=db,
+            document_models=[
+                User, Movie, Review, Watchlist, MovieTombstone, RevokedToken, StreamTicket
+            ],
+        )
         logger.info("Beanie ORM initialized successfully with all document models")
+        if deduped_movies:
+            # imported here, movie_stats imports this module
+            from movie_stats import rebuild_stats
+
+            await rebuild_stats(deduped_movies)
     except Exception as e:
         logger.error(f"Database initialization failed: {str(e)}")
-        raise
\ No newline at end of file
+        raise
+
+    await warm_pool(client, my_config.mongo_min_pool_size)
+    await check_query_plans()
+    return client
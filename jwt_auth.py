@@ -1,11 +1,15 @@
+import time
 from datetime import datetime, timedelta
 from typing import Optional, Union, Annotated
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Query, status
 from fastapi.security import OAuth2PasswordBearer
 import jwt
 from passlib.context import CryptContext
 from pydantic import BaseModel
+from live_events import redeem_stream_ticket
 from my_config import get_settings
+from token_revocation import revoked_tokens, token_key
+from ttl_cache import TTLCache
 
 # Models
 class Token(BaseModel):
@@ -48,35 +52,57 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, config.secret_key, algorithm="HS256")
     return encoded_jwt
 
-def decode_jwt_token(token: str):
-    credentials_exception = HTTPException(
+# LRU of verified tokens, keyed by the token's sha256, so the signature of a
+# token is checked once rather than on every request. Each entry expires at
+# the token's exp, so the clock is the wall clock exp is given in.
+token_cache: TTLCache[TokenData] = TTLCache(maxsize=10_000, clock=time.time)
+
+# Tokens without exp are still cached, for at most this many seconds
+UNBOUNDED_TOKEN_TTL = 300
+
+
+def _credentials_exception() -> HTTPException:
+    # Only built when a token is rejected
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    
+
+
+def _verify_jwt_token(token: str) -> tuple[TokenData, float]:
+    """Check the signature and claims; returns the token data and when to stop trusting it"""
     config = get_settings()
-    
     try:
+        # PyJWT rejects expired tokens itself
         payload = jwt.decode(token, config.secret_key, algorithms=["HS256"])
-        username: str = payload.get("sub") or payload.get("username")
-        if username is None:
-            raise credentials_exception
-        
-        # Get expiration time and role
-        exp = payload.get("exp")
-        role = payload.get("role", "BasicUser")
-        
-        token_data = TokenData(username=username, role=role)
-        if exp:
-            token_data.exp = datetime.fromtimestamp(exp)
-            
-            # Check if token is expired
-            if datetime.utcnow() > token_data.exp:
-                raise credentials_exception
-                
-    except jwt.JWTError:
-        raise credentials_exception
+    except jwt.PyJWTError:
+        raise _credentials_exception()
+
+    username: str = payload.get("sub") or payload.get("username")
+    if username is None:
+        raise _credentials_exception()
+
+    # Get expiration time and role
+    exp = payload.get("exp")
+    role = payload.get("role", "BasicUser")
+
+    token_data = TokenData(username=username, role=role)
+    if exp:
+        token_data.exp = datetime.fromtimestamp(exp)
+        return token_data, float(exp)
+    return token_data, time.time() + UNBOUNDED_TOKEN_TTL
+
+
+def decode_jwt_token(token: str) -> TokenData:
+    key = token_key(token)
+    if key in revoked_tokens:
+        raise _credentials_exception()
+
+    token_data = token_cache.get(key)
+    if token_data is None:
+        token_data, expires_at = _verify_jwt_token(token)
+        token_cache.set(key, token_data, expires_at)
     return token_data
 
 # Add this function to be imported in movie.py
@@ -84,4 +110,17 @@ async def get_current_user(token: Annotated[str, Depends(oauth2_scheme)]) -> Tok
     """
     Dependency to get the current authenticated user from the token
     """
-    return decode_jwt_token(token)
\ No newline at end of file
+    return decode_jwt_token(token)
+
+
+async def get_stream_user(
+    ticket: str = Query(..., description="From POST /movies/events/ticket"),
+) -> TokenData:
+    """
+    Dependency for event streams, which EventSource opens without headers:
+    the user of a single-use stream ticket
+    """
+    owner = await redeem_stream_ticket(ticket)
+    if owner is None:
+        raise _credentials_exception()
+    return TokenData(username=owner["username"], role=owner["role"])
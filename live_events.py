@@ -0,0 +1,256 @@
+import asyncio
+import json
+import secrets
+from collections import deque
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from beanie import Document
+from pymongo import ASCENDING, IndexModel
+from pymongo.errors import OperationFailure, PyMongoError
+
+from logging_config import setup_logger
+from token_revocation import token_key
+
+logger = setup_logger()
+
+# Live list updates for GET /movies/events (Server-Sent Events).
+#
+# Each worker runs one change stream over the movies, reviews and watchlist
+# collections and fans the changes out to its subscribers. A watchlist change
+# only goes to the user whose watchlist it is; movie and review changes go to
+# everyone, since every list shows the movies and their ratings. Deletes of
+# reviews and watchlist rows only happen together with their movie, whose
+# delete is sent, so they are not forwarded.
+#
+# Event ids are the change stream resume tokens. A recent history lets a client
+# that reconnects with Last-Event-ID catch up; when its id is too old, or its
+# queue overflowed because it read too slowly, it gets a "resync" event and
+# reloads the list instead. Change streams need a replica set (a single node
+# one is enough); on a standalone server the feed stays off.
+#
+# EventSource cannot send an Authorization header, and a bearer token in the
+# URL would end up in the access log. The client trades its token for a stream
+# ticket (POST /movies/events/ticket) and opens the stream with that instead:
+# tickets are stored as hashes, expire after TICKET_SECONDS and are deleted
+# when redeemed, so a logged ticket is useless.
+
+COLLECTIONS = ["movies", "reviews", "watchlist"]
+CHANGE_STREAM_PIPELINE = [
+    {"$match": {"ns.coll": {"$in": COLLECTIONS}}},
+    # only the fields the events are built from; _id is the resume token
+    {
+        "$project": {
+            "operationType": 1,
+            "ns.coll": 1,
+            "documentKey": 1,
+            "fullDocument.movie_id": 1,
+            "fullDocument.watched_id": 1,
+            "fullDocument.user_id": 1,
+        }
+    },
+]
+NOT_A_REPLICA_SET = 40573
+HISTORY_LOST = (136, 280, 286)  # the resume token is no longer in the oplog
+RETRY_SECONDS = 5
+
+RESYNC = object()  # queued for a subscriber that missed events
+TICKET_SECONDS = 30
+
+
+class StreamTicket(Document):
+    ticket_hash: str
+    username: str
+    role: str
+    expires_at: datetime
+
+    class Settings:
+        name = "stream_tickets"
+        indexes = [
+            IndexModel([("ticket_hash", ASCENDING)], unique=True),
+            # Mongo removes tickets that were never redeemed
+            IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0),
+        ]
+
+
+async def issue_stream_ticket(username: str, role: str) -> str:
+    ticket = secrets.token_urlsafe(32)
+    await StreamTicket(
+        ticket_hash=token_key(ticket),
+        username=username,
+        role=role,
+        expires_at=datetime.now(timezone.utc) + timedelta(seconds=TICKET_SECONDS),
+    ).insert()
+    return ticket
+
+
+async def redeem_stream_ticket(ticket: str) -> Optional[dict]:
+    """The ticket's username and role, or None; a ticket can be redeemed once"""
+    # the TTL monitor runs about once a minute, so expiry is checked here too
+    return await StreamTicket.get_motor_collection().find_one_and_delete(
+        {"ticket_hash": token_key(ticket), "expires_at": {"$gt": datetime.now(timezone.utc)}},
+        projection={"username": 1, "role": 1},
+    )
+
+
+@dataclass
+class LiveEvent:
+    id: str
+    collection: str
+    operation: str
+    movie_id: str
+    user_id: Optional[str] = None  # None when every subscriber gets it
+
+    def visible_to(self, username: str) -> bool:
+        return self.user_id is None or self.user_id == username
+
+    def to_sse(self) -> str:
+        data = asdict(self)
+        del data["id"], data["user_id"]
+        return f"id: {self.id}\nevent: change\ndata: {json.dumps(data)}\n\n"
+
+
+def event_from_change(change: dict) -> Optional[LiveEvent]:
+    """The event for a change stream document, or None if it is not forwarded"""
+    collection = change["ns"]["coll"]
+    operation = change["operationType"]
+    if operation not in ("insert", "update", "replace", "delete"):
+        return None
+    document = change.get("fullDocument") or {}
+    event_id = change["_id"]["_data"]
+    if collection == "movies":
+        movie_id = str(change["documentKey"]["_id"])
+        return LiveEvent(event_id, collection, operation, movie_id)
+    if operation == "delete":
+        return None
+    if collection == "reviews" and document.get("movie_id"):
+        return LiveEvent(event_id, collection, operation, document["movie_id"])
+    if collection == "watchlist" and document.get("watched_id"):
+        return LiveEvent(
+            event_id, collection, operation, document["watched_id"], document.get("user_id")
+        )
+    return None
+
+
+class Subscriber:
+    def __init__(self, username: str, queue_size: int):
+        self.username = username
+        self.queue: asyncio.Queue = asyncio.Queue(queue_size)
+        self.overflowed = False
+
+    def offer(self, event) -> bool:
+        """Queue an event without waiting; a full queue is replaced by one RESYNC"""
+        if self.overflowed:
+            return False
+        try:
+            self.queue.put_nowait(event)
+            return True
+        except asyncio.QueueFull:
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESYNC)
+            self.overflowed = True
+            return False
+
+    def resynced(self):
+        self.overflowed = False
+
+
+class ChangeFeed:
+    def __init__(self, history: int = 1000):
+        self.subscribers: set[Subscriber] = set()
+        self.history: deque[LiveEvent] = deque(maxlen=history)
+        self.resume_token: Optional[dict] = None
+        self.available = False
+        self.events = 0
+        self.overflows = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def subscribe(
+        self, username: str, queue_size: int, last_event_id: Optional[str] = None
+    ) -> Subscriber:
+        subscriber = Subscriber(username, queue_size)
+        if last_event_id:
+            self._replay(subscriber, last_event_id)
+        self.subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        self.subscribers.discard(subscriber)
+
+    def _replay(self, subscriber: Subscriber, last_event_id: str):
+        ids = [event.id for event in self.history]
+        if last_event_id not in ids:
+            subscriber.offer(RESYNC)
+            return
+        for event in list(self.history)[ids.index(last_event_id) + 1:]:
+            if event.visible_to(subscriber.username) and not subscriber.offer(event):
+                return
+
+    def publish(self, event):
+        """Send an event (or RESYNC) to every subscriber allowed to see it"""
+        if event is not RESYNC:
+            self.history.append(event)
+            self.events += 1
+        for subscriber in list(self.subscribers):
+            if event is RESYNC or event.visible_to(subscriber.username):
+                overflowed = subscriber.overflowed
+                subscriber.offer(event)
+                if subscriber.overflowed and not overflowed:
+                    self.overflows += 1
+
+    def start(self, db):
+        self._task = asyncio.create_task(self.run(db))
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self.available = False
+
+    async def run(self, db):
+        """Follow the change stream, resuming after errors from the last token seen"""
+        while True:
+            try:
+                async with db.watch(
+                    CHANGE_STREAM_PIPELINE,
+                    full_document="updateLookup",
+                    resume_after=self.resume_token,
+                ) as stream:
+                    self.available = True
+                    async for change in stream:
+                        self.resume_token = change["_id"]
+                        event = event_from_change(change)
+                        if event:
+                            self.publish(event)
+            except OperationFailure as e:
+                if e.code == NOT_A_REPLICA_SET:
+                    logger.warning("Live events are off, change streams need a replica set")
+                    self.available = False
+                    return
+                if e.code in HISTORY_LOST:
+                    # changes since the token are gone; every client reloads its list
+                    logger.warning("Change stream history lost, resyncing subscribers: %s", e)
+                    self.resume_token = None
+                    self.publish(RESYNC)
+                else:
+                    logger.error("Change stream failed: %s", e)
+            except PyMongoError as e:
+                logger.error("Change stream interrupted: %s", e)
+            await asyncio.sleep(RETRY_SECONDS)
+
+    def stats(self) -> dict:
+        return {
+            "subscribers": len(self.subscribers),
+            "events": self.events,
+            "overflows": self.overflows,
+            "available": int(self.available),
+        }
+
+
+change_feed = ChangeFeed()
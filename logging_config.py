@@ -1,14 +1,70 @@
+import atexit
+import json
 import logging
 import os
-from datetime import datetime
-from logging.handlers import RotatingFileHandler
+import queue
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+from my_config import get_logging_settings
+
+# Records are put on a bounded queue by the request path and written to the
+# file and console by a QueueListener thread, so logging never does blocking
+# I/O on the event loop. When the writer falls behind, new records are dropped
+# rather than blocking the caller.
+#
+# The level and the queue size come from the LOG_LEVEL and LOG_QUEUE_SIZE
+# settings, see my_config.LoggingConfig.
 
 # Global logger instance
 _logger = None
+_listener = None
+
+# Attributes every LogRecord has; anything else was passed with extra={...}
+_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record, with extra={...} fields included"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class DroppingQueueHandler(QueueHandler):
+    """QueueHandler that drops records when the queue is full and counts them"""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The message is built by the listener thread, not by the caller.
+        # Only the traceback is rendered here, while the frames still exist.
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
 
 
 def setup_logger():
-    global _logger
+    global _logger, _listener
 
     # If logger is already configured, return the existing instance
     if _logger is not None:
@@ -22,7 +78,9 @@ def setup_logger():
 
     # Only configure the logger if it hasn't been configured yet
     if not logger.handlers:
-        logger.setLevel(logging.INFO)
+        settings = get_logging_settings()
+        logger.setLevel(settings.log_level.upper())
+        logger.propagate = False
 
         # Create a file handler that logs to a file with the current date
         log_filename = f"movie_app_{datetime.now().strftime('%Y-%m-%d')}.log"
@@ -30,20 +88,38 @@ def setup_logger():
         file_handler = RotatingFileHandler(
             log_file, maxBytes=10 * 1024 * 1024, backupCount=5
         )
-
-        # Create a formatter and set it for the handler
-        formatter = logging.Formatter("%(asctime)s - %(levelname)s - %(message)s")
-        file_handler.setFormatter(formatter)
+        file_handler.setFormatter(JsonFormatter())
 
         # Create a stream handler for console output
         console_handler = logging.StreamHandler()
-        console_handler.setFormatter(formatter)
+        console_handler.setFormatter(
+            logging.Formatter("%(asctime)s - %(levelname)s - %(message)s")
+        )
 
-        # Add the handlers to the logger
-        logger.addHandler(file_handler)
-        logger.addHandler(console_handler)
+        # The handlers only run on the listener thread
+        log_queue = queue.Queue(maxsize=settings.log_queue_size)
+        _listener = QueueListener(
+            log_queue, file_handler, console_handler, respect_handler_level=True
+        )
+        _listener.start()
+        atexit.register(shutdown_logger)
+        logger.addHandler(DroppingQueueHandler(log_queue))
 
     # Store the configured logger
     _logger = logger
 
     return logger
+
+
+def dropped_records() -> int:
+    """Number of records dropped because the queue was full"""
+    logger = logging.getLogger("movie_app")
+    return sum(getattr(handler, "dropped", 0) for handler in logger.handlers)
+
+
+def shutdown_logger():
+    """Write out the records still on the queue and stop the listener thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -1,14 +1,29 @@
+import asyncio
 from contextlib import asynccontextmanager
 import uvicorn
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from starlette.responses import FileResponse
+from fastapi.responses import PlainTextResponse
+from api_responses import CompressionMiddleware, FastJSONResponse
 from db_context import init_database
 from movie import movie_router
+from movie_model import Movie
+from movie_queries import backfill_normalized_titles, backfill_watchlist_copies
+from movie_stats import backfill_rating_stats
+from movie_sync import backfill_updated_at
 from user import user_router
 from db_context import init_database
-from logging_config import setup_logger
+from jwt_auth import token_cache
+from live_events import change_feed
+from logging_config import dropped_records, setup_logger
+from metrics import MetricsMiddleware, add_collector, render_metrics
+from my_config import get_settings
+from password_hasher import get_password_hasher
+from photo_store import migrate_legacy_photos
+from static_files import PrecompressedStaticFiles
+from pool_monitor import pool_gauges
+from response_cache import get_response_cache
+from token_revocation import run_revocation_sync, sync_revocations
 
 logger = setup_logger()
 
@@ -16,29 +31,95 @@ logger = setup_logger()
 async def lifespan(app: FastAPI):
     # on startup event
     logger.info("Application starts up...")
-    await init_database()
+    # One client (and connection pool) per worker, shared by all requests
+    app.state.mongo_client = await init_database()
+    await migrate_legacy_photos(get_settings().photo_max_dimension)
+    await backfill_normalized_titles()
+    await backfill_rating_stats()
+    # after the two above, which set the fields it copies
+    await backfill_watchlist_copies()
+    await backfill_updated_at()
+    await asyncio.to_thread(frontend_files.precompress)
+    if get_settings().live_events:
+        # the database Beanie was initialized on, where the app writes
+        change_feed.start(Movie.get_motor_collection().database)
+    revocation_sync = None
+    sync_seconds = get_settings().token_revocation_sync_seconds
+    if sync_seconds > 0:
+        await sync_revocations()
+        revocation_sync = asyncio.create_task(run_revocation_sync(sync_seconds))
     yield
     # on shutdown event
     logger.info("Application shuts down...")
+    if revocation_sync:
+        revocation_sync.cancel()
+    await change_feed.stop()
+    get_password_hasher().shutdown()
+    app.state.mongo_client.close()
 
-app = FastAPI(title="Vacation App", version="2.0.0", lifespan=lifespan)
+app = FastAPI(
+    title="Vacation App", version="2.0.0", lifespan=lifespan,
+    default_response_class=FastJSONResponse,
+)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Total-Count", "Server-Timing"],
 )
+# API payloads above the minimum size, the static files bring their own variants
+if get_settings().compression_minimum_size > 0:
+    app.add_middleware(CompressionMiddleware, minimum_size=get_settings().compression_minimum_size)
+# Added last so it wraps the other middleware and times the whole request
+app.add_middleware(MetricsMiddleware, op_budget=get_settings().mongo_op_budget)
 
 # Include the movie router
 app.include_router(movie_router, tags=["Movies"], prefix="/movies")
 app.include_router(user_router, tags=["Users"], prefix="/users")
 
-# Mount static files
-app.mount("/frontend", StaticFiles(directory="frontend"), name="frontend")
+# Mount static files, compressed variants are found or built at startup
+frontend_files = PrecompressedStaticFiles(
+    directory=get_settings().static_dir, cache_dir=get_settings().static_cache_dir
+)
+app.mount("/frontend", frontend_files, name="frontend")
+
+
+@app.get("/health")
+async def health():
+    """Liveness check with the connection pool gauges of this worker"""
+    return {"status": "ok", "db_pool": pool_gauges.stats()}
+
+
+def _gauges(prefix: str, description: str, stats: dict):
+    for name, value in stats.items():
+        yield f"{prefix}_{name}", "gauge", f"{description} {name.replace('_', ' ')}", [({}, value)]
+
+
+def _component_gauges():
+    """Gauges of this worker's connection pool, thread pool, caches and log queue"""
+    pools = pool_gauges.stats()
+    for name in next(iter(pools.values()), {}):
+        samples = [({"server": server}, stats[name]) for server, stats in pools.items()]
+        yield f"mongo_pool_{name}", "gauge", f"Connection pool {name.replace('_', ' ')}", samples
+    yield from _gauges("password_hasher", "Password hasher", get_password_hasher().stats())
+    yield from _gauges("response_cache", "Movie list cache", get_response_cache().stats())
+    yield from _gauges("token_cache", "Verified token cache", token_cache.stats())
+    yield from _gauges("log_records", "Log records", {"dropped": dropped_records()})
+    yield from _gauges("live_events", "Live events", change_feed.stats())
+
+
+add_collector(_component_gauges)
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus metrics of this worker"""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
 
 
 # Root route
 @app.get("/")
-async def read_index():
-    return FileResponse("./frontend/index.html")
+async def read_index(request: Request):
+    return await frontend_files.get_response("index.html", request.scope)
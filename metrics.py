@@ -0,0 +1,238 @@
+import contextvars
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Callable, Iterable, Optional
+
+from pymongo import monitoring
+
+from logging_config import setup_logger
+
+logger = setup_logger()
+
+# Request metrics in the Prometheus text format, without a client library.
+# The middleware times every request by route template; MongoCommandTimer
+# adds the Mongo commands a request ran to the RequestStats of the request,
+# found through a context variable. Collectors registered by main.py add
+# gauges (connection pool, password hasher, caches) when /metrics is read.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+OP_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 500)
+
+
+@dataclass
+class RequestStats:
+    # (command name, duration in ms); appended from Motor's worker threads
+    commands: list = field(default_factory=list)
+
+    @property
+    def mongo_ops(self) -> int:
+        return len(self.commands)
+
+    @property
+    def mongo_ms(self) -> float:
+        return sum(duration for _, duration in self.commands)
+
+    def breakdown(self) -> dict:
+        counts = defaultdict(int)
+        for name, _ in self.commands:
+            counts[name] += 1
+        return dict(counts)
+
+
+current_request: contextvars.ContextVar[Optional[RequestStats]] = contextvars.ContextVar(
+    "current_request", default=None
+)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _label_text(labels: dict) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, buckets: tuple):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        # labels (as a sorted tuple) -> [bucket counts..., sum, count]
+        self._series: dict[tuple, list] = {}
+
+    def observe(self, value: float, **labels):
+        key = tuple(sorted(labels.items()))
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * len(self.buckets) + [0.0, 0]
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help_text}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            series = {key: list(values) for key, values in self._series.items()}
+        for key, values in series.items():
+            labels = dict(key)
+            cumulative = 0
+            for bound, count in zip(self.buckets, values):
+                cumulative += count
+                yield f"{self.name}_bucket{_label_text({**labels, 'le': bound})} {cumulative}"
+            yield f"{self.name}_bucket{_label_text({**labels, 'le': '+Inf'})} {values[-1]}"
+            yield f"{self.name}_sum{_label_text(labels)} {values[-2]}"
+            yield f"{self.name}_count{_label_text(labels)} {values[-1]}"
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help_text = help_text
+        self._lock = threading.Lock()
+        self._values: dict[tuple, float] = defaultdict(float)
+
+    def inc(self, amount: float = 1, **labels):
+        with self._lock:
+            self._values[tuple(sorted(labels.items()))] += amount
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help_text}"
+        yield f"# TYPE {self.name} counter"
+        with self._lock:
+            values = dict(self._values)
+        for key, value in values.items():
+            yield f"{self.name}{_label_text(dict(key))} {value}"
+
+
+request_duration = Histogram(
+    "http_request_duration_seconds", "Request latency by route", LATENCY_BUCKETS
+)
+request_mongo_ops = Histogram(
+    "http_request_mongo_commands", "Mongo commands run by one request, by route", OP_BUCKETS
+)
+mongo_commands = Counter("mongo_commands_total", "Mongo commands by command name")
+mongo_command_seconds = Counter(
+    "mongo_command_duration_seconds_total", "Time spent in Mongo commands by command name"
+)
+op_budget_exceeded = Counter(
+    "mongo_op_budget_exceeded_total", "Requests that ran more Mongo commands than the budget"
+)
+METRICS = [request_duration, request_mongo_ops, mongo_commands, mongo_command_seconds,
+           op_budget_exceeded]
+
+# Callables returning (name, type, help, [(labels, value), ...]) for gauges
+# read when /metrics is scraped
+_collectors: list[Callable[[], Iterable[tuple]]] = []
+
+
+def add_collector(collector: Callable[[], Iterable[tuple]]):
+    _collectors.append(collector)
+
+
+def render_metrics() -> str:
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    for collector in _collectors:
+        for name, metric_type, help_text, samples in collector():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            lines.extend(f"{name}{_label_text(labels)} {value}" for labels, value in samples)
+    return "\n".join(lines) + "\n"
+
+
+class MongoCommandTimer(monitoring.CommandListener):
+    """Counts and times every Mongo command, globally and for the current request"""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        self._record(event.command_name, event.duration_micros)
+
+    def failed(self, event):
+        self._record(event.command_name, event.duration_micros)
+
+    def _record(self, command_name: str, duration_micros: int):
+        duration_ms = duration_micros / 1000
+        mongo_commands.inc(command=command_name)
+        mongo_command_seconds.inc(duration_ms / 1000, command=command_name)
+        stats = current_request.get()
+        if stats is not None:
+            stats.commands.append((command_name, duration_ms))
+
+
+mongo_command_timer = MongoCommandTimer()
+
+
+def _route_label(scope) -> str:
+    """The route template, never the raw path, to keep the number of series bounded"""
+    route = scope.get("route")
+    if route is not None:
+        return getattr(route, "path", "unknown")
+    if "endpoint" in scope:
+        # a mounted app such as the static files, labelled by its mount path
+        return scope.get("root_path") or "/"
+    return "unmatched"
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording latency and Mongo commands per route, adding a
+    Server-Timing header, and warning about requests over the Mongo op budget.
+    """
+
+    def __init__(self, app, op_budget: int = 20):
+        self.app = app
+        self.op_budget = op_budget
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = current_request.set(stats)
+        start = time.perf_counter()
+        status_code = 500
+
+        async def send_with_timing(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                elapsed_ms = (time.perf_counter() - start) * 1000
+                timing = (
+                    f'mongo;dur={stats.mongo_ms:.1f};desc="{stats.mongo_ops} ops", '
+                    f"app;dur={elapsed_ms:.1f}"
+                )
+                message["headers"] = [
+                    *message.get("headers", []), (b"server-timing", timing.encode())
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            current_request.reset(token)
+            route = _route_label(scope)
+            request_duration.observe(
+                time.perf_counter() - start,
+                method=scope["method"], route=route, status=status_code,
+            )
+            request_mongo_ops.observe(stats.mongo_ops, method=scope["method"], route=route)
+            if stats.mongo_ops > self.op_budget:
+                op_budget_exceeded.inc(method=scope["method"], route=route)
+                logger.warning(
+                    "%s %s ran %s Mongo commands, over the budget of %s: %s",
+                    scope["method"], route, stats.mongo_ops, self.op_budget, stats.breakdown(),
+                )
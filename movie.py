@@ -1,12 +1,16 @@
-from typing import List, Optional, Annotated
+import asyncio
+from typing import List, Literal, Optional, Annotated
 from bson import ObjectId
+from pymongo import UpdateMany, UpdateOne
 
-from fastapi import APIRouter, Depends, File, Path, HTTPException, UploadFile, status, Query
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, Depends, File, Header, Path, HTTPException, Request, Response, UploadFile, status, Query
+from fastapi.responses import JSONResponse, StreamingResponse
 from movie_model import (
     Movie,
+    MovieChanges,
     MovieRequest,
     MovieResponse,
+    MovieTombstone,
     RequestMovieWithWatchStatusAndReview,
     Review,
     ReviewRequest,
@@ -14,49 +18,124 @@ from movie_model import (
     Watchlist,
     WatchlistRequest,
     WatchlistResponse,
+    normalize_title,
+    utc_now,
 )
-from jwt_auth import get_current_user, TokenData
+from movie_bulk import (
+    csv_lines,
+    csv_rows,
+    export_rows,
+    import_movies,
+    iter_lines,
+    logged_stream,
+    ndjson_lines,
+    ndjson_rows,
+)
+from movie_queries import (
+    SORT_OPTIONS,
+    InvalidCursor,
+    ListOptions,
+    fetch_movie_detail,
+    fetch_movie_list,
+    movie_list_adapter,
+    search_movies,
+    stream_movie_list,
+)
+from jwt_auth import get_current_user, get_stream_user, TokenData
+from live_events import (
+    RESYNC, RETRY_SECONDS, TICKET_SECONDS, change_feed, issue_stream_ticket,
+)
+from authorization import get_authorized_user
 from datetime import datetime
 from beanie import PydanticObjectId
+from beanie.odm.queries.update import UpdateResponse
+from db_context import transaction
+from movie_sync import fetch_changes
+from movie_stats import (
+    apply_stats,
+    initial_stats,
+    merge_deltas,
+    rating_delta,
+    upsert_review,
+    upsert_reviews,
+)
 from logging_config import setup_logger
-import base64
-from user_model import User
+from my_config import get_settings
+from photo_store import InvalidPhoto, is_photo_digest, load_photo, prepare_photo, save_photo
+from response_cache import CachedResponse, etag_matches, get_response_cache, make_etag
+from orphan_gc import gc_runner
+from user_model import User, UserSummary, ensure_admin_role
 
 logger = setup_logger()
 
 movie_router = APIRouter()
 
+# movies one list request can be restricted to with ?id=
+MAX_LIST_IDS = 100
+
 # ----- MOVIE ENDPOINTS -----
-import base64
 
 @movie_router.get("/get-background-photo")
 async def get_background_photo(
     current_user: Optional[TokenData] = Depends(get_current_user),
 ) -> dict:
-    user_data = await User.find_one({"username": current_user.username})
-    
-    if user_data and hasattr(user_data, "photo") and user_data.photo:
-        # If the photo doesn't already have the data URI prefix, add it
-        photo = user_data.photo
-        if not photo.startswith('data:image'):
-            # Determine the image type if possible, or default to JPEG
-            image_type = "jpeg"
-            photo = f"data:image/{image_type};base64,{photo}"
-        
-        return {"photo": photo}
+    user_data = await User.find_one(
+        {"username": current_user.username}, projection_model=UserSummary
+    )
+
+    if user_data and user_data.photo_id:
+        # The photo itself is served by get_photo so browsers can cache it
+        return {"photo": f"/movies/photos/{user_data.photo_id}"}
     return {"photo": ""}
 
+@movie_router.get("/photos/{photo_id}")
+async def get_photo(
+    photo_id: str = Path(..., description="The digest of the photo"),
+    if_none_match: Optional[str] = Header(None),
+) -> Response:
+    # The URL is the sha256 of the content, so it never changes for a given photo
+    headers = {
+        "ETag": f'"{photo_id}"',
+        "Cache-Control": "public, max-age=31536000, immutable",
+    }
+    if not is_photo_digest(photo_id):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Photo not found")
+    if if_none_match and photo_id in if_none_match:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    photo = await load_photo(photo_id)
+    if not photo:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Photo not found")
+    contents, content_type = photo
+    return Response(content=contents, media_type=content_type, headers=headers)
+
 @movie_router.post("/upload-background-photo")
 async def upload_background_photo(
     photo: UploadFile = File(...),
     current_user: Optional[TokenData] = Depends(get_current_user),
 ) -> dict:
-    contents = await photo.read()
-    encoded_photo = base64.b64encode(contents).decode('utf-8')
+    settings = get_settings()
+    contents = await photo.read(settings.photo_max_bytes + 1)
+    if len(contents) > settings.photo_max_bytes:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Photo must be {settings.photo_max_bytes // 1024}KB or less.",
+        )
 
-    user_data = await User.find_one({"username": current_user.username})
-    user_data.photo = encoded_photo
-    await user_data.save()
+    try:
+        # Decoding and resizing is CPU bound, keep it off the event loop
+        contents, content_type = await asyncio.to_thread(
+            prepare_photo, contents, settings.photo_max_dimension
+        )
+    except InvalidPhoto as e:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE, detail=str(e)
+        )
+
+    photo_id = await save_photo(contents, content_type)
+    await User.find_one({"username": current_user.username}).update(
+        {"$set": {"photo_id": photo_id}, "$unset": {"photo": "", "photo_unreadable": ""}}
+    )
 
     return {"message": "Photo uploaded successfully"}
 
@@ -72,12 +151,14 @@ async def add_movie(
     review_data = payload.review
     watchlist_data = payload.watchlist
 
-    # Create new movie document
+    # Create new movie document, with the stats of the review created below
     new_movie = Movie(
         title=movie_data.title,
+        title_normalized=normalize_title(movie_data.title),
         comment=movie_data.comment,
         added_by=current_user.username if current_user else "anonymous",
         date_added=datetime.now(),
+        **initial_stats(review_data.rating if current_user else None),
     )
 
     # Save to database
@@ -86,7 +167,7 @@ async def add_movie(
     # Log movie addition
     role = current_user.role if current_user else "Anonymous"
     username = current_user.username if current_user else "anonymous"
-    logger.info(f"Movie '{movie_data.title}' added by user '{username}'. Role: {role} ")
+    logger.info("Movie '%s' added by user '%s'. Role: %s", movie_data.title, username, role)
 
     # If the user is logged in, create a review
     if current_user:
@@ -100,7 +181,8 @@ async def add_movie(
         )
         await new_review.insert()
         logger.info(
-            f"Review added for movie '{movie_data.title}' by user '{current_user.username}'. Rating: {review_data.rating}"
+            "Review added for movie '%s' by user '%s'. Rating: %s",
+            movie_data.title, current_user.username, review_data.rating,
         )
 
     # update watchlist
@@ -109,85 +191,220 @@ async def add_movie(
         watched_id=str(new_movie.id),
         user_id=current_user.username,
         watched_status=watchlist_data.watched_status,
+        title_normalized=new_movie.title_normalized,
+        rating_average=new_movie.rating_average,
+        added_by=new_movie.added_by,
     )
     await new_watchlist_indicator.insert()
+
+    await get_response_cache().invalidate_watchlist(
+        current_user.username, watchlist_data.watched_status
+    )
     return new_movie
 
 
+@movie_router.post("/bulk")
+async def bulk_add_movies(
+    request: Request,
+    current_user: Optional[TokenData] = Depends(get_current_user),
+) -> dict:
+    """
+    Add many movies from an NDJSON body (one RequestMovieWithWatchStatusAndReview
+    per line) or a text/csv body with the columns title, comment, watched_status,
+    rating and review. Valid rows are inserted, invalid ones reported by row number.
+    """
+    if not current_user:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Authentication required to import movies",
+        )
+
+    # The body is parsed as it arrives, it is never held in memory as a whole
+    lines = iter_lines(request.stream())
+    content_type = request.headers.get("content-type", "")
+    rows = csv_rows(lines) if content_type.startswith("text/csv") else ndjson_rows(lines)
+    try:
+        report = await import_movies(
+            rows, current_user.username, get_settings().bulk_import_batch_size
+        )
+    except UnicodeDecodeError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Body must be UTF-8 encoded"
+        )
+    finally:
+        # Batches written before a failure show up in the lists too
+        await get_response_cache().invalidate_all()
+    return report.to_dict()
+
+
+# Declared before /{watched_status} so "export" is not taken for a status
+@movie_router.get("/export")
+async def export_movies(
+    format: Literal["ndjson", "csv"] = Query("ndjson", description="Row format"),
+    current_user: Optional[TokenData] = Depends(get_current_user),
+) -> StreamingResponse:
+    """Stream the caller's movies in the format accepted by POST /movies/bulk"""
+    rows = export_rows(current_user.username, get_settings().bulk_import_batch_size)
+    if format == "csv":
+        lines, media_type = csv_lines(rows), "text/csv"
+    else:
+        lines, media_type = ndjson_lines(rows), "application/x-ndjson"
+    return StreamingResponse(
+        logged_stream(lines, f"exporting movies for user '{current_user.username}'"),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="movies.{format}"'},
+    )
+
+
+# Declared before /{watched_status} so "search" is not taken for a status
+@movie_router.get("/search", response_model=List[MovieResponse])
+async def search(
+    q: str = Query(..., min_length=1, max_length=200, description="Search text"),
+    mode: Literal["text", "prefix"] = Query("text", description="Full-text or title prefix"),
+    offset: int = Query(0, ge=0, le=10000),
+    limit: int = Query(20, ge=1, le=100),
+    current_user: Optional[TokenData] = Depends(get_current_user),
+) -> List[MovieResponse]:
+    """Search movie titles and comments, best matches first"""
+    return await search_movies(q, mode, offset, limit)
+
+
+# Declared before /{watched_status} so "changes" is not taken for a status
+@movie_router.get("/changes", response_model=MovieChanges)
+async def get_changes(
+    since: Optional[str] = Query(None, description="Token returned by the previous call"),
+    watched_status: str = Query("all", description="The list synced: all, my, watched, ..."),
+    limit: int = Query(1000, ge=1, le=5000, description="More changes than this ask for a resync"),
+    current_user: TokenData = Depends(get_current_user),
+) -> MovieChanges:
+    """Changes to one of the caller's movie lists since the last sync"""
+    try:
+        return await fetch_changes(since, current_user.username, watched_status, limit)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
+@movie_router.post("/events/ticket")
+async def movie_events_ticket(current_user: TokenData = Depends(get_current_user)) -> dict:
+    """A single-use ticket for opening GET /movies/events"""
+    ticket = await issue_stream_ticket(current_user.username, current_user.role)
+    return {"ticket": ticket, "expires_in": TICKET_SECONDS}
+
+
+# Declared before /{watched_status} so "events" is not taken for a status
+@movie_router.get("/events")
+async def movie_events(
+    current_user: TokenData = Depends(get_stream_user),
+    last_event_id: Optional[str] = Header(None),
+    resume_from: Optional[str] = Query(
+        None, description="Last event id, for a new EventSource after a reconnect"
+    ),
+) -> StreamingResponse:
+    """Server-Sent Events for changes to the movies shown in the caller's lists"""
+    if not change_feed.available:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Live updates are not available",
+        )
+    return StreamingResponse(
+        _event_lines(current_user.username, last_event_id or resume_from),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def _event_lines(username: str, last_event_id: Optional[str]):
+    """
+    The user's events as SSE, with a comment line when it has been quiet.
+    Subscribing inside the generator means no subscription exists before the
+    response streams, and the finally drops it however the response ends.
+    """
+    settings = get_settings()
+    heartbeat_seconds = settings.sse_heartbeat_seconds
+    subscriber = None
+    try:
+        subscriber = change_feed.subscribe(username, settings.sse_queue_size, last_event_id)
+        yield f"retry: {RETRY_SECONDS * 1000}\n\n"
+        while True:
+            try:
+                event = await asyncio.wait_for(subscriber.queue.get(), heartbeat_seconds)
+            except asyncio.TimeoutError:
+                yield ": heartbeat\n\n"
+                continue
+            if event is RESYNC:
+                subscriber.resynced()
+                yield "event: resync\ndata: {}\n\n"
+            else:
+                yield event.to_sse()
+    finally:
+        # the response is cancelled when the client disconnects
+        if subscriber:
+            change_feed.unsubscribe(subscriber)
+
+
 @movie_router.get("/{watched_status}", response_model=List[MovieResponse])
 async def get_movies(
     watched_status: str = Path(..., description="The ID of the movie to retrieve"),
+    limit: Optional[int] = Query(None, ge=1, le=1000, description="Page size"),
+    after: Optional[str] = Query(None, description="Cursor returned in X-Next-Cursor"),
+    stream: bool = Query(False, description="Stream rows as NDJSON"),
+    sort: Literal[SORT_OPTIONS] = Query(
+        "date", description="date, title or rating; prefix with - for descending"
+    ),
+    min_rating: Optional[float] = Query(None, ge=0, le=5, description="Minimum average rating"),
+    added_by: Optional[str] = Query(None, max_length=100, description="Only movies added by"),
+    date_from: Optional[datetime] = Query(None, description="Added on or after"),
+    date_to: Optional[datetime] = Query(None, description="Added on or before"),
+    id: List[str] = Query([], description="Only these movies, to refresh rows of the list"),
+    if_none_match: Optional[str] = Header(None),
     current_user: Optional[TokenData] = Depends(get_current_user),
 ) -> List[MovieResponse]:
     """Get all movies with optional user-specific data"""
+    username = current_user.username if current_user else None
+    if len(id) > MAX_LIST_IDS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {MAX_LIST_IDS} ids per request",
+        )
+    options = ListOptions(
+        sort, min_rating, added_by, date_from, date_to, movie_ids=tuple(id) if id else None
+    )
+
     try:
-        # get watched data based on watched_status
-        watched_information = []
-        if watched_status == "all":
-            # For "all", show all movies in the database
-            watched_information = await Watchlist.find_all().to_list()
-        elif watched_status == "my":
-            # For "my", show movies added by the current user
-            watched_information = await Watchlist.find(
-                {"user_id": current_user.username}
-            ).to_list()
-        elif watched_status in ["watched", "not_watched"]:
-            # For "watched"/"not_watched", filter by both status AND current user
-            watched_information = await Watchlist.find(
-                {"watched_status": watched_status, "user_id": current_user.username}
-            ).to_list()
-        else:
-            # Fallback for any other status
-            watched_information = await Watchlist.find(
-                {"watched_status": watched_status}
-            ).to_list()
-
-        # Create a dictionary to map movie IDs to their watched status
-        watchlist_map = {
-            doc.watched_id: doc.watched_status for doc in watched_information
-        }
-
-        watched_ids_as_objects = [
-            ObjectId(doc.watched_id) for doc in watched_information
-        ]
-
-        # get movies with the gathered watched information
-        movies = await Movie.find({"_id": {"$in": watched_ids_as_objects}}).to_list()
-        movie_responses = []
-
-        for movie in movies:
-            # get review data
-            review = await Review.find_one({"movie_id": str(movie.id)})
-            if not review:
-                # Handle case where a movie doesn't have a review
-                logger.warning(f"No review found for movie {movie.id} - {movie.title}")
-                review_text = ""
-                rating = 0
-            else:
-                review_text = review.review
-                rating = review.rating
-
-            # Get watched status from the map, default to "not_watched"
-            movie_watched_status = watchlist_map.get(str(movie.id), "not_watched")
-
-            movie_response = MovieResponse(
-                id=str(movie.id),
-                title=movie.title,
-                comment=movie.comment,
-                review=review_text,
-                added_by=movie.added_by,
-                rating=rating,
-                date_added=movie.date_added,
-                watched_status=movie_watched_status,  # Include the watched status
+        if stream:
+            rows = stream_movie_list(watched_status, username, after, limit, options)
+            lines = (movie.model_dump_json() + "\n" async for movie in rows)
+            return StreamingResponse(
+                logged_stream(lines, "streaming movies"), media_type="application/x-ndjson"
             )
 
-            movie_responses.append(movie_response)
-
-        return movie_responses
-
+        cache = get_response_cache()
+        variant = f"{after}|{limit}|{options.cache_key()}"
+        key, cached = await cache.get(watched_status, username, variant)
+        if cached is None:
+            # One aggregation joins watchlist, movies and reviews so the number of
+            # queries does not grow with the number of movies; sorting and
+            # filtering run in it too, before the page is cut
+            movies, next_cursor = await fetch_movie_list(
+                watched_status, username, after, limit, options
+            )
+            body = movie_list_adapter.dump_json(movies)
+            cached = CachedResponse(make_etag(body), body, next_cursor)
+            await cache.set(key, cached)
+
+        # Clients revalidate with the ETag; an unchanged list costs no body
+        headers = {"ETag": cached.etag, "Cache-Control": "private, no-cache"}
+        if cached.next_cursor:
+            headers["X-Next-Cursor"] = cached.next_cursor
+        if etag_matches(if_none_match, cached.etag):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        return Response(content=cached.body, media_type="application/json", headers=headers)
+
+    except InvalidCursor as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     except Exception as e:
         # Log the error and return a more helpful message
-        logger.error(f"Error in get_movies: {str(e)}")
+        logger.error("Error in get_movies: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error getting movies: {str(e)}",
@@ -197,60 +414,21 @@ async def get_movies(
 @movie_router.get("/get/{movie_id}", response_model=MovieResponse)
 async def get_movie_by_id(
     movie_id: str = Path(..., description="The ID of the movie to retrieve"),
-    current_user: Optional[TokenData] = Depends(get_current_user),
+    current_user: Optional[TokenData] = Depends(get_authorized_user),
 ) -> MovieResponse:
     """Get a specific movie by ID with optional user-specific data"""
 
-    # Get movie from database
-    movie = await Movie.get(movie_id)
-    if not movie:
+    # One aggregation returns the movie with the user's review and watchlist entry
+    username = current_user.username if current_user else None
+    movie_response = await fetch_movie_detail(movie_id, username)
+    if not movie_response:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Movie with ID={movie_id} not found",
         )
 
-    # Set admin status
-    is_admin = False
-    if current_user:
-        user = await User.find_one({"username": current_user.username})
-        if user and user.role == "AdminUser":
-            is_admin = True
-
-    # Initialize with default values
-    user_rating = 0
-    user_review = ""
-    watched_status = None
-
-    # Get user's review if logged in
-    if current_user:
-        review_data = await Review.find_one(
-            {"movie_id": movie_id, "user_id": current_user.username}
-        )
-        if review_data:
-            user_rating = review_data.rating
-            user_review = review_data.review
-            print(f"Found review: {user_rating}, {user_review}")
-
-        # Get watchlist status
-        watchlist_data = await Watchlist.find_one(
-            {"watched_id": movie_id, "user_id": current_user.username}
-        )
-        if watchlist_data:
-            watched_status = watchlist_data.watched_status
-            print(f"Watchlist status: {watched_status}")
-
-    # Create base response
-    movie_response = MovieResponse(
-        id=str(movie.id),
-        title=movie.title,
-        comment=movie.comment,
-        rating=user_rating,
-        review=user_review,
-        added_by=movie.added_by,
-        date_added=movie.date_added,
-        watched_status=watched_status,
-        is_admin=is_admin,
-    )
+    # Set admin status, the role is resolved by get_authorized_user
+    movie_response.is_admin = bool(current_user and current_user.role == "AdminUser")
     return movie_response
 
 
@@ -258,7 +436,7 @@ async def get_movie_by_id(
 async def update_movie(
     payload: RequestMovieWithWatchStatusAndReview,
     movie_id: str = Path(..., description="The ID of the movie to update"),
-    current_user: Optional[TokenData] = Depends(get_current_user),
+    current_user: Optional[TokenData] = Depends(get_authorized_user),
 ) -> Movie:
     """Update an existing movie"""
 
@@ -267,25 +445,52 @@ async def update_movie(
     review_data = payload.review
     movie_data = payload.movie
 
-    # Get movie from database
-    movie = await Movie.get(movie_id)
-    if not movie:
-        logger.error(f"Update movie failed: Movie with ID={movie_id} not found")
+    if not current_user:
+        logger.error("Unauthenticated movie edit attempt")
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Authentication required to edit movies.",
+        )
+    if not ObjectId.is_valid(movie_id):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Movie with ID={movie_id} not found",
         )
 
-    # Check permissions - allow only if user is admin or the movie creator
-    if current_user:
-        # Get user to check if admin
-        user = await User.find_one({"username": current_user.username})
-        is_admin = user and user.role == "AdminUser"
-
-        # If not admin and not the creator, forbid the action
-        if not is_admin and movie.added_by != current_user.username:
+    # The role is resolved by get_authorized_user
+    is_admin = current_user.role == "AdminUser"
+
+    # Only admins or the movie creator may edit, so the permission check is
+    # part of the update filter and the movie is read and written in one go
+    movie_filter = {"_id": ObjectId(movie_id)}
+    if not is_admin:
+        movie_filter["added_by"] = current_user.username
+
+    async with transaction() as session:
+        movie = await Movie.find_one(movie_filter, session=session).update(
+            {
+                "$set": {
+                    "title": movie_data.title,
+                    "title_normalized": normalize_title(movie_data.title),
+                    "comment": movie_data.comment,
+                    "updated_at": utc_now(),
+                }
+            },
+            session=session,
+            response_type=UpdateResponse.NEW_DOCUMENT,
+        )
+        if not movie:
+            # Tell a missing movie apart from one the user may not edit
+            existing = await Movie.get(movie_id, session=session)
+            if not existing:
+                logger.error("Update movie failed: Movie with ID=%s not found", movie_id)
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail=f"Movie with ID={movie_id} not found",
+                )
             logger.warning(
-                f"Unauthorized movie edit attempt: User '{current_user.username}' tried to edit movie '{movie.title}' created by '{movie.added_by}'"
+                "Unauthorized movie edit attempt: User '%s' tried to edit movie '%s' created by '%s'",
+                current_user.username, existing.title, existing.added_by,
             )
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
@@ -295,158 +500,79 @@ async def update_movie(
         # Log the edit operation
         admin_str = "Admin " if is_admin else ""
         logger.info(
-            f"{admin_str}User '{current_user.username}' edited movie '{movie.title}'. Role: {current_user.role}"
-        )
-    else:
-        logger.error("Unauthenticated movie edit attempt")
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Authentication required to edit movies.",
+            "%sUser '%s' edited movie '%s'. Role: %s",
+            admin_str, current_user.username, movie.title, current_user.role,
         )
 
-    # Update movie fields
-    movie.title = movie_data.title
-    movie.comment = movie_data.comment
-
-    # Save changes
-    await movie.save()
-
-    # MODIFIED: Review handling with special admin case
-    if review_data.rating > 0:
-        if is_admin:
-            # If admin, update or create review for the ORIGINAL CREATOR
-            # This ensures the review shows up for all users
-            existing_review = await Review.find_one(
-                Review.movie_id == movie_id,
-                Review.user_id == movie.added_by,  # Use movie creator's username
+        if review_data.rating > 0:
+            # An admin edit also updates the ORIGINAL CREATOR's review, so the
+            # review shows up for all users, as well as the admin's own review
+            reviewers = {current_user.username}
+            if is_admin:
+                reviewers.add(movie.added_by)
+            # One read of the previous ratings and one bulk write of the
+            # reviews, so the movie's rating stats move with a single $inc
+            old_ratings = await upsert_reviews(
+                movie_id, sorted(reviewers), review_data.rating, review_data.review, session
             )
-
-            if existing_review:
-                # Update existing review as admin
-                existing_review.rating = review_data.rating
-                existing_review.review = review_data.review
-                await existing_review.save()
-                logger.info(
-                    f"Admin updated review for movie '{movie.title}' originally added by '{movie.added_by}'. Rating: {review_data.rating}"
-                )
-            else:
-                # Create new review as admin for the original creator
-                new_review = Review(
-                    movie_id=movie_id,
-                    user_id=movie.added_by,  # Use movie creator's username
-                    rating=review_data.rating,
-                    review=review_data.review,
-                    date_added=datetime.now(),
-                )
-                await new_review.insert()
-                logger.info(
-                    f"Admin created new review for movie '{movie.title}' on behalf of '{movie.added_by}'. Rating: {review_data.rating}"
-                )
-
-            # Also update/create the admin's personal review
-            admin_review = await Review.find_one(
-                Review.movie_id == movie_id, Review.user_id == current_user.username
-            )
-
-            if admin_review:
-                admin_review.rating = review_data.rating
-                admin_review.review = review_data.review
-                await admin_review.save()
-            else:
-                new_admin_review = Review(
-                    movie_id=movie_id,
-                    user_id=current_user.username,
-                    rating=review_data.rating,
-                    review=review_data.review,
-                    date_added=datetime.now(),
-                )
-                await new_admin_review.insert()
-
-        else:
-            # Regular user flow - update their own review
-            existing_review = await Review.find_one(
-                Review.movie_id == movie_id, Review.user_id == current_user.username
-            )
-
-            if existing_review:
-                # Update existing review
-                existing_review.rating = review_data.rating
-                existing_review.review = review_data.review
-                await existing_review.save()
-                logger.info(
-                    f"Review updated for movie '{movie.title}' by user '{current_user.username}'. Rating: {review_data.rating}"
-                )
-            else:
-                # Create new review
-                new_review = Review(
-                    movie_id=movie_id,
-                    user_id=current_user.username,
-                    rating=review_data.rating,
-                    review=review_data.review,
-                    date_added=datetime.now(),
-                )
-                await new_review.insert()
-                logger.info(
-                    f"New review added for movie '{movie.title}' by user '{current_user.username}'. Rating: {review_data.rating}"
-                )
-
-    # Watchlist handling code remains unchanged
-    try:
-        # First check for ANY watchlist entry for this movie
-        existing_watchlists = await Watchlist.find({"watched_id": movie_id}).to_list()
-
-        # Check if there's an entry specifically for this user
-        user_watchlist = None
-        for watchlist in existing_watchlists:
-            if watchlist.user_id == current_user.username:
-                user_watchlist = watchlist
-                break
-
-        if user_watchlist:
-            # Update existing watchlist entry for this user
-            user_watchlist.watched_status = watchlist_data.watched_status
-            await user_watchlist.save()
+            deltas = [rating_delta(old_rating, review_data.rating) for old_rating in old_ratings]
+            movie = await apply_stats(movie_id, merge_deltas(deltas), session) or movie
             logger.info(
-                f"Watchlist updated for movie '{movie.title}' by user '{current_user.username}'. Status: {watchlist_data.watched_status}"
-            )
-        else:
-            # Generate a truly unique ID using an ObjectId
-            from bson import ObjectId
-
-            unique_id = str(ObjectId())
-
-            # Create new watchlist entry with the unique ID
-            new_watchlist = Watchlist(
-                id=unique_id,  # Use a completely new ID
-                watched_id=movie_id,
-                user_id=current_user.username,
-                watched_status=watchlist_data.watched_status,
-                date_added=datetime.now(),
+                "Reviews for movie '%s' set by '%s' for %s. Rating: %s",
+                movie.title, current_user.username, sorted(reviewers), review_data.rating,
             )
-            await new_watchlist.insert()
-            logger.info(
-                f"New watchlist entry created for movie '{movie.title}' by user '{current_user.username}'. Status: {watchlist_data.watched_status}"
-            )
-    except Exception as e:
-        error_message = f"Error updating watchlist for movie '{movie.title}': {str(e)}"
-        logger.error(error_message)
-        # Continue execution rather than crashing
 
+        # One bulk write for the watchlist: the copy of the title the rows
+        # sort on (the rating stats copied their average already), and this
+        # user's entry for the movie
+        await Watchlist.get_motor_collection().bulk_write(
+            [
+                UpdateMany(
+                    {"watched_id": movie_id},
+                    {"$set": {"title_normalized": movie.title_normalized}},
+                ),
+                UpdateOne(
+                    {"watched_id": movie_id, "user_id": current_user.username},
+                    {
+                        "$set": {
+                            "watched_status": watchlist_data.watched_status,
+                            "updated_at": utc_now(),
+                        },
+                        "$setOnInsert": {
+                            "_id": str(ObjectId()),
+                            "date_added": datetime.now(),
+                            "title_normalized": movie.title_normalized,
+                            "rating_average": movie.rating_average,
+                            "added_by": movie.added_by,
+                        },
+                    },
+                    upsert=True,
+                ),
+            ],
+            session=session,
+        )
+        logger.info(
+            "Watchlist set for movie '%s' by user '%s'. Status: %s",
+            movie.title, current_user.username, watchlist_data.watched_status,
+        )
+
+    # Title, comment and reviews show up in every list that has this movie
+    await get_response_cache().invalidate_all()
     return movie
 
 
 @movie_router.delete("/{movie_id}")
 async def delete_movie(
     movie_id: str = Path(..., description="The ID of the movie to delete"),
-    current_user: Optional[TokenData] = Depends(get_current_user),
+    current_user: Optional[TokenData] = Depends(get_authorized_user),
 ) -> dict:
     """Delete a movie and all associated reviews and watchlist entries"""
-    print(f"Deleting movie with ID: {movie_id}")
+    logger.debug("Deleting movie with ID: %s", movie_id)
 
     # Get movie from database
-    movie = await Movie.get(ObjectId(movie_id))
+    movie = await Movie.get(movie_id) if ObjectId.is_valid(movie_id) else None
     if not movie:
-        logger.error(f"Delete movie failed: Movie with ID={movie_id} not found")
+        logger.error("Delete movie failed: Movie with ID=%s not found", movie_id)
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Movie with ID={movie_id} not found",
@@ -454,14 +580,14 @@ async def delete_movie(
 
     # Check permissions - allow only if user is admin or the movie creator
     if current_user:
-        # Get user to check if admin
-        user = await User.find_one({"username": current_user.username})
-        is_admin = user and user.role == "AdminUser"
+        # The role is resolved by get_authorized_user
+        is_admin = current_user.role == "AdminUser"
 
         # If not admin and not the creator, forbid the action
         if not is_admin and movie.added_by != current_user.username:
             logger.warning(
-                f"Unauthorized movie delete attempt: User '{current_user.username}' tried to delete movie '{movie.title}' created by '{movie.added_by}'"
+                "Unauthorized movie delete attempt: User '%s' tried to delete movie '%s' created by '%s'",
+                current_user.username, movie.title, movie.added_by,
             )
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
@@ -471,7 +597,8 @@ async def delete_movie(
         # Log the delete operation
         admin_str = "Admin " if is_admin else ""
         logger.info(
-            f"{admin_str}User '{current_user.username}' deleted movie '{movie.title}'. Role: {current_user.role}"
+            "%sUser '%s' deleted movie '%s'. Role: %s",
+            admin_str, current_user.username, movie.title, current_user.role,
         )
     else:
         raise HTTPException(
@@ -479,20 +606,49 @@ async def delete_movie(
             detail="Authentication required to delete movies.",
         )
 
-    # Delete movie
-    await movie.delete()
-
-    # Delete associated reviews
-    await Review.find({"movie_id": movie_id}).delete()
+    # Delete the movie with its reviews and watchlist entries, all or nothing,
+    # leaving a tombstone so GET /changes can report the delete
+    async with transaction() as session:
+        await Movie.get_motor_collection().delete_one({"_id": movie.id}, session=session)
+        await MovieTombstone.get_motor_collection().insert_one(
+            {"movie_id": movie_id, "deleted_at": utc_now()}, session=session
+        )
+        await Review.get_motor_collection().delete_many({"movie_id": movie_id}, session=session)
+        await Watchlist.get_motor_collection().delete_many(
+            {"watched_id": movie_id}, session=session
+        )
 
-    # Delete associated watchlist entries
-    await Watchlist.find({"movie_id": movie_id}).delete()
+    await get_response_cache().invalidate_all()
 
     return {
         "message": f"Movie with ID={movie_id} and all associated data deleted successfully"
     }
 
 
+@movie_router.post("/admin/orphans", status_code=status.HTTP_202_ACCEPTED)
+async def start_orphan_collection(
+    current_user: Optional[TokenData] = Depends(get_authorized_user),
+) -> dict:
+    """Start removing reviews and watchlist entries of deleted movies in the background"""
+    ensure_admin_role(current_user)
+    if not gc_runner.start(get_settings().bulk_import_batch_size):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Orphan collection is already running",
+        )
+    logger.info("Admin '%s' started orphan collection", current_user.username)
+    return gc_runner.progress.to_dict()
+
+
+@movie_router.get("/admin/orphans")
+async def get_orphan_collection(
+    current_user: Optional[TokenData] = Depends(get_authorized_user),
+) -> dict:
+    """Progress of the current or last orphan collection on this worker"""
+    ensure_admin_role(current_user)
+    return gc_runner.progress.to_dict()
+
+
 # ----- REVIEW ENDPOINTS -----
 
 
@@ -505,9 +661,10 @@ async def add_review(
     current_user: Optional[TokenData] = Depends(get_current_user),
 ) -> Review:
     """Add or update a review for a movie"""
-    print(f"ADD REVIEW ENDPOINT CALLED for movie ID: {movie_id}")
-    print(f"Review data: {review_data}")
-    print(f"Current user: {current_user}")
+    logger.debug(
+        "Add review called for movie ID: %s, review data: %s, user: %s",
+        movie_id, review_data, current_user.username if current_user else None,
+    )
 
     if not current_user:
         raise HTTPException(
@@ -516,36 +673,28 @@ async def add_review(
         )
 
     # Verify movie exists
-    movie = await Movie.get(movie_id)
-    if not movie:
+    if not ObjectId.is_valid(movie_id) or not await Movie.get_motor_collection().find_one(
+        {"_id": ObjectId(movie_id)}, projection={"_id": 1}
+    ):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Movie with ID={movie_id} not found",
         )
 
-    # Check if user already has a review for this movie
-    existing_review = await Review.find_one(
-        Review.movie_id == movie_id, Review.user_id == current_user.username
-    )
-
-    if existing_review:
-        # Update existing review
-        print(f"Updating existing review: {existing_review.id}")
-        existing_review.rating = review_data.rating
-        existing_review.review = review_data.review
-        await existing_review.save()
-        print(f"Review updated successfully")
-        return existing_review
-    else:
-        # Create new review
-        print(f"Creating new review")
-        new_review = Review(
-            movie_id=movie_id,
-            user_id=current_user.username,
-            rating=review_data.rating,
-            review=review_data.review,
-            date_added=datetime.now(),
+    # Create or update the user's review and move the movie's rating stats together
+    async with transaction() as session:
+        old_rating, review = await upsert_review(
+            movie_id, current_user.username, review_data.rating, review_data.review, session
         )
-        await new_review.insert()
-        print(f"New review created with ID: {new_review.id}")
-        return new_review
+        inc = merge_deltas([rating_delta(old_rating, review_data.rating)])
+        await apply_stats(movie_id, inc, session)
+
+    # The movie's rating stats show up in every list that has it
+    await get_response_cache().invalidate_all()
+
+    action = "updated" if old_rating is not None else "created"
+    logger.info(
+        "Review %s for movie '%s' by user '%s'. Rating: %s",
+        action, movie_id, current_user.username, review_data.rating,
+    )
+    return Review.model_validate(review)
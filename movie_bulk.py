@@ -0,0 +1,286 @@
+import csv
+import io
+import json
+from datetime import datetime
+from typing import AsyncIterator, Iterable, Tuple
+
+from bson import ObjectId
+from pydantic import ValidationError
+from pymongo.errors import BulkWriteError
+
+from logging_config import setup_logger
+from movie_model import (
+    Movie,
+    RequestMovieWithWatchStatusAndReview,
+    Review,
+    Watchlist,
+    normalize_title,
+    utc_now,
+    watchlist_copies,
+)
+from movie_queries import join_movie_stages
+from movie_stats import initial_stats
+
+logger = setup_logger()
+
+# Bulk import and export of a user's movies. Rows have the shape of
+# RequestMovieWithWatchStatusAndReview; in CSV they are flattened into the
+# columns below. Each batch is written with one insert_many per collection.
+
+CSV_COLUMNS = ["title", "comment", "watched_status", "rating", "review"]
+
+# Only the first errors are reported, the count covers all of them
+MAX_REPORTED_ERRORS = 100
+
+
+class ImportReport:
+    def __init__(self):
+        self.inserted = 0
+        self.failed = 0
+        self.errors: list[dict] = []
+
+    def error(self, row: int, message: str):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"row": row, "error": message})
+
+    def to_dict(self) -> dict:
+        return {"inserted": self.inserted, "failed": self.failed, "errors": self.errors}
+
+
+# ----- PARSING -----
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Split a byte stream into decoded lines without holding more than one line"""
+    pending = b""
+    async for chunk in chunks:
+        pending += chunk
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            yield line.decode("utf-8-sig").rstrip("\r")
+    if pending:
+        yield pending.decode("utf-8-sig").rstrip("\r")
+
+
+async def ndjson_rows(lines: AsyncIterator[str]) -> AsyncIterator[Tuple[int, object]]:
+    """Yield (row number, parsed object or error message); blank lines are skipped"""
+    number = 0
+    async for line in lines:
+        if not line.strip():
+            continue
+        number += 1
+        try:
+            yield number, json.loads(line)
+        except ValueError as e:
+            yield number, f"Invalid JSON: {e}"
+
+
+def _nest_csv_record(record: dict) -> dict:
+    return {
+        "movie": {"title": record.get("title"), "comment": record.get("comment") or ""},
+        "watchlist": {"watched_status": record.get("watched_status")},
+        "review": {"rating": record.get("rating") or 0, "review": record.get("review") or ""},
+    }
+
+
+async def csv_rows(lines: AsyncIterator[str]) -> AsyncIterator[Tuple[int, object]]:
+    """
+    Yield (row number, nested row or error message) for a CSV with a header line.
+    Lines are joined until the quotes balance, so quoted fields may span lines.
+    """
+    header = None
+    number = 0
+    record = ""
+    async for line in lines:
+        record = f"{record}\n{line}" if record else line
+        if record.count('"') % 2:
+            continue
+        text, record = record, ""
+        if not text.strip():
+            continue
+        values = next(csv.reader([text]))
+        if header is None:
+            header = [name.strip() for name in values]
+            continue
+        number += 1
+        if len(values) != len(header):
+            yield number, f"Expected {len(header)} columns, got {len(values)}"
+            continue
+        yield number, _nest_csv_record(dict(zip(header, values)))
+    if record:
+        yield number + 1, "Unterminated quoted field"
+
+
+# ----- IMPORT -----
+
+
+def row_documents(
+    payload: RequestMovieWithWatchStatusAndReview, username: str, now: datetime
+) -> Tuple[dict, dict, dict]:
+    """The movie, review and watchlist documents add_movie would write for a row"""
+    movie_id = ObjectId()
+    updated_at = utc_now()
+    movie = {
+        "_id": movie_id,
+        "title": payload.movie.title,
+        "title_normalized": normalize_title(payload.movie.title),
+        "comment": payload.movie.comment,
+        "added_by": username,
+        "date_added": now,
+        "updated_at": updated_at,
+        **initial_stats(payload.review.rating),
+    }
+    review = {
+        "_id": ObjectId(),
+        "movie_id": str(movie_id),
+        "user_id": username,
+        "rating": payload.review.rating,
+        "review": payload.review.review,
+        "date_added": now,
+        "updated_at": updated_at,
+    }
+    watchlist = {
+        "_id": str(movie_id),
+        "watched_id": str(movie_id),
+        "user_id": username,
+        "watched_status": payload.watchlist.watched_status,
+        "date_added": now,
+        "updated_at": updated_at,
+        **watchlist_copies(movie),
+    }
+    return movie, review, watchlist
+
+
+async def _insert_batch(batch: list, report: ImportReport):
+    """batch holds (row number, (movie, review, watchlist)) for valid rows"""
+    movies = [documents[0] for _, documents in batch]
+    failed_rows = set()
+    try:
+        await Movie.get_motor_collection().insert_many(movies, ordered=False)
+    except BulkWriteError as e:
+        for write_error in e.details.get("writeErrors", []):
+            row, _ = batch[write_error["index"]]
+            failed_rows.add(row)
+            report.error(row, write_error.get("errmsg", "Insert failed"))
+
+    written = [(row, documents) for row, documents in batch if row not in failed_rows]
+    if written:
+        await Review.get_motor_collection().insert_many(
+            [documents[1] for _, documents in written], ordered=False
+        )
+        await Watchlist.get_motor_collection().insert_many(
+            [documents[2] for _, documents in written], ordered=False
+        )
+    report.inserted += len(written)
+
+
+async def import_movies(
+    rows: AsyncIterator[Tuple[int, object]], username: str, batch_size: int = 1000
+) -> ImportReport:
+    """Validate rows and insert the valid ones batch by batch; invalid rows are reported"""
+    report = ImportReport()
+    batch = []
+    async for number, row in rows:
+        if isinstance(row, str):
+            report.error(number, row)
+            continue
+        try:
+            payload = RequestMovieWithWatchStatusAndReview.model_validate(row)
+        except ValidationError as e:
+            report.error(number, _validation_message(e))
+            continue
+        batch.append((number, row_documents(payload, username, datetime.now())))
+        if len(batch) == batch_size:
+            await _insert_batch(batch, report)
+            batch = []
+    if batch:
+        await _insert_batch(batch, report)
+    logger.info(
+        "Bulk import by user '%s': %s inserted, %s failed", username, report.inserted, report.failed
+    )
+    return report
+
+
+def _validation_message(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in item['loc'])}: {item['msg']}" for item in error.errors()
+    )
+
+
+# ----- EXPORT -----
+
+
+def export_pipeline(username: str) -> list:
+    """A user's watchlist in import row shape, oldest first, with the user's own review"""
+    return [
+        {"$match": {"user_id": username}},
+        {"$sort": {"date_added": 1, "_id": 1}},
+        *join_movie_stages(),
+        {
+            "$lookup": {
+                "from": "reviews",
+                "localField": "watched_id",
+                "foreignField": "movie_id",
+                "pipeline": [
+                    {"$match": {"user_id": username}},
+                    {"$limit": 1},
+                    {"$project": {"rating": 1, "review": 1}},
+                ],
+                "as": "review",
+            }
+        },
+        {"$set": {"review": {"$arrayElemAt": ["$review", 0]}}},
+        {
+            "$project": {
+                "_id": 0,
+                "movie": {"title": "$movie.title", "comment": "$movie.comment"},
+                "watchlist": {"watched_status": "$watched_status"},
+                "review": {
+                    "rating": {"$ifNull": ["$review.rating", 0]},
+                    "review": {"$ifNull": ["$review.review", ""]},
+                },
+            }
+        },
+    ]
+
+
+def export_rows(username: str, batch_size: int = 1000) -> AsyncIterator[dict]:
+    """Rows straight from the aggregation cursor, fetched batch_size at a time"""
+    return Watchlist.get_motor_collection().aggregate(
+        export_pipeline(username), batchSize=batch_size
+    )
+
+
+async def ndjson_lines(rows: AsyncIterator[dict]) -> AsyncIterator[str]:
+    async for row in rows:
+        yield json.dumps(row) + "\n"
+
+
+def _csv_line(values: Iterable) -> str:
+    output = io.StringIO()
+    csv.writer(output, lineterminator="\n").writerow(values)
+    return output.getvalue()
+
+
+async def csv_lines(rows: AsyncIterator[dict]) -> AsyncIterator[str]:
+    yield _csv_line(CSV_COLUMNS)
+    async for row in rows:
+        yield _csv_line(
+            [
+                row["movie"]["title"],
+                row["movie"].get("comment", ""),
+                row["watchlist"]["watched_status"],
+                row["review"]["rating"],
+                row["review"]["review"],
+            ]
+        )
+
+
+async def logged_stream(lines: AsyncIterator[str], action: str) -> AsyncIterator[str]:
+    """The status code is already sent when streaming, so errors are only logged"""
+    try:
+        async for line in lines:
+            yield line
+    except Exception as e:
+        logger.error("Error %s: %s", action, e)
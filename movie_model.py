@@ -1,7 +1,22 @@
-from typing import Optional, List
-from datetime import datetime
+import unicodedata
+from typing import Dict, Optional, List
+from datetime import datetime, timezone
 from beanie import Document
 from pydantic import BaseModel, Field
+from pymongo import ASCENDING, TEXT, IndexModel
+
+
+def utc_now() -> datetime:
+    """Time of a write, for updated_at; UTC so all workers agree"""
+    return datetime.now(timezone.utc)
+
+
+def normalize_title(title: str) -> str:
+    """Lowercase, accent-free, single-spaced title used for prefix search"""
+    decomposed = unicodedata.normalize("NFKD", title)
+    without_accents = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return " ".join(without_accents.lower().split())
+
 
 # Request Models (for API input)
 class MovieRequest(BaseModel):
@@ -28,9 +43,36 @@ class Movie(Document):
     comment: str = ""
     added_by: str = "anonymous"  # Username of who added the movie
     date_added: datetime = Field(default_factory=datetime.now)
+    title_normalized: str = ""  # normalize_title(title), kept in sync by the writers
+    # Rating stats kept current by movie_stats on every review write
+    rating_sum: int = 0
+    rating_count: int = 0
+    rating_histogram: Dict[str, int] = Field(default_factory=dict)  # rating -> count
+    rating_average: float = 0  # rating_sum / rating_count, for sorting and filtering
+    updated_at: datetime = Field(default_factory=utc_now)  # set by every write, for GET /changes
     
     class Settings:
         name = "movies"  # Collection name
+        indexes = [
+            # "all" listing, paged by (date_added, _id)
+            IndexModel([("date_added", ASCENDING), ("_id", ASCENDING)]),
+            # full-text search, title matches rank above comment matches
+            IndexModel(
+                [("title", TEXT), ("comment", TEXT)],
+                weights={"title": 10, "comment": 1},
+                name="movie_text_search",
+            ),
+            # prefix search / autocomplete on titles
+            IndexModel([("title_normalized", ASCENDING), ("_id", ASCENDING)]),
+            # "all" listing sorted or filtered by average rating
+            IndexModel([("rating_average", ASCENDING), ("_id", ASCENDING)]),
+            # "all" listing of the movies one user added, by date
+            IndexModel(
+                [("added_by", ASCENDING), ("date_added", ASCENDING), ("_id", ASCENDING)]
+            ),
+            # movies changed since a sync token
+            IndexModel([("updated_at", ASCENDING)]),
+        ]
 
 class Review(Document):
     movie_id: str  # Reference to Movie.id
@@ -38,9 +80,17 @@ class Review(Document):
     rating: int = Field(..., ge=0, le=5)  # Rating between 0-5
     review: str = ""  # Review explaining the rating
     date_added: datetime = Field(default_factory=datetime.now)
+    updated_at: datetime = Field(default_factory=utc_now)
     
     class Settings:
         name = "reviews"  # Collection name
+        indexes = [
+            # a user's review of a movie, and by prefix every review of a movie;
+            # unique so concurrent first reviews cannot both insert
+            IndexModel([("movie_id", ASCENDING), ("user_id", ASCENDING)], unique=True),
+            # reviews changed since a sync token
+            IndexModel([("updated_at", ASCENDING)]),
+        ]
 
 class Watchlist(Document):
     id: str
@@ -48,9 +98,86 @@ class Watchlist(Document):
     user_id: str  # Reference to User.id (this links the movie to the user’s watchlist)
     watched_status: str
     date_added: datetime = Field(default_factory=datetime.now)
+    updated_at: datetime = Field(default_factory=utc_now)
+    # Copies of the movie's fields (see WATCHLIST_COPIES), so user lists sort
+    # and filter on the row through the indexes below instead of in memory
+    title_normalized: str = ""
+    rating_average: float = 0
+    added_by: str = "anonymous"
     
     class Settings:
         name = "watchlist"  # Collection name
+        indexes = [
+            # "watched"/"not_watched" listings, paged by (date_added, _id)
+            IndexModel(
+                [
+                    ("user_id", ASCENDING),
+                    ("watched_status", ASCENDING),
+                    ("date_added", ASCENDING),
+                    ("_id", ASCENDING),
+                ]
+            ),
+            # "my" listing, paged by (date_added, _id)
+            IndexModel(
+                [("user_id", ASCENDING), ("date_added", ASCENDING), ("_id", ASCENDING)]
+            ),
+            # the same listings sorted or filtered by title or average rating
+            IndexModel(
+                [
+                    ("user_id", ASCENDING),
+                    ("watched_status", ASCENDING),
+                    ("title_normalized", ASCENDING),
+                    ("_id", ASCENDING),
+                ]
+            ),
+            IndexModel(
+                [
+                    ("user_id", ASCENDING),
+                    ("watched_status", ASCENDING),
+                    ("rating_average", ASCENDING),
+                    ("_id", ASCENDING),
+                ]
+            ),
+            IndexModel(
+                [("user_id", ASCENDING), ("title_normalized", ASCENDING), ("_id", ASCENDING)]
+            ),
+            IndexModel(
+                [("user_id", ASCENDING), ("rating_average", ASCENDING), ("_id", ASCENDING)]
+            ),
+            # every entry for a movie, and a user's entry for a movie
+            IndexModel([("watched_id", ASCENDING), ("user_id", ASCENDING)]),
+            # status-only listing across all users
+            IndexModel([("watched_status", ASCENDING)]),
+            # entries changed since a sync token, a user's or everyone's
+            IndexModel([("user_id", ASCENDING), ("updated_at", ASCENDING)]),
+            IndexModel([("updated_at", ASCENDING)]),
+        ]
+
+
+# Movie fields copied onto its watchlist rows. added_by never changes; the
+# writers of title_normalized and rating_average update the rows with the movie.
+WATCHLIST_COPIES = ("title_normalized", "rating_average", "added_by")
+
+
+def watchlist_copies(movie: dict) -> dict:
+    """The WATCHLIST_COPIES values of a movie document"""
+    return {field: movie[field] for field in WATCHLIST_COPIES if field in movie}
+
+
+# How long deleted movies are remembered; older sync tokens get a full reload
+TOMBSTONE_RETENTION_SECONDS = 30 * 24 * 3600
+
+
+class MovieTombstone(Document):
+    """A deleted movie, kept for GET /movies/changes until the TTL index removes it"""
+    movie_id: str
+    deleted_at: datetime = Field(default_factory=utc_now)
+
+    class Settings:
+        name = "movie_tombstones"
+        indexes = [
+            IndexModel([("deleted_at", ASCENDING)], expireAfterSeconds=TOMBSTONE_RETENTION_SECONDS),
+        ]
 
 # Response Models (for API output)
 class MovieResponse(BaseModel):
@@ -60,6 +187,8 @@ class MovieResponse(BaseModel):
     review: Optional[str] = ""
     added_by: str
     rating: Optional[float] = 0
+    average_rating: Optional[float] = 0
+    review_count: Optional[int] = 0
     date_added: Optional[datetime] = None
     watched_status: Optional[str] = "not_watched"
     is_admin: Optional[bool] = False
@@ -82,3 +211,11 @@ class WatchlistResponse(BaseModel):
     favorite: bool
     date_added: datetime
     movie_title: Optional[str] = None
+
+class MovieChanges(BaseModel):
+    token: str  # pass back as since= on the next call
+    watched_status: str = "all"  # the list synced
+    changed: List[MovieResponse] = []  # rows of the list, as the list shows them
+    removed: List[str] = []  # ids of movies that changed and are no longer in the list
+    deleted: List[str] = []  # ids of deleted movies
+    resync: bool = False  # too old or too many changes: reload the list, then use token
@@ -0,0 +1,509 @@
+import base64
+import json
+import re
+from dataclasses import dataclass
+from datetime import datetime
+from typing import AsyncIterator, List, Optional, Tuple
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from pydantic import TypeAdapter
+from pymongo import UpdateMany, UpdateOne
+
+from movie_model import (
+    WATCHLIST_COPIES,
+    Movie,
+    MovieResponse,
+    Watchlist,
+    normalize_title,
+    watchlist_copies,
+)
+
+# The pipelines project rows into the MovieResponse shape, so pages are
+# validated (and serialized) as a whole list rather than row by row
+movie_list_adapter = TypeAdapter(List[MovieResponse])
+
+
+# ----- LIST OPTIONS -----
+# Sorting and filtering of the listings happen in the pipeline, before the
+# page is cut, so a client only receives the rows it shows. Each sort key is
+# paired with _id so every row has a unique position for keyset paging.
+
+# sort option -> field of the movie document
+SORT_FIELDS = {"date": "date_added", "title": "title_normalized", "rating": "rating_average"}
+SORT_OPTIONS = tuple(option for name in SORT_FIELDS for option in (name, f"-{name}"))
+
+
+@dataclass(frozen=True)
+class ListOptions:
+    sort: str = "date"  # a SORT_OPTIONS value, "-" for descending
+    min_rating: Optional[float] = None  # on the average rating
+    added_by: Optional[str] = None
+    # bound the date_added the list is ordered by when sorting by date: the
+    # movie's on the "all" listing, the watchlist row's on the others
+    date_from: Optional[datetime] = None
+    date_to: Optional[datetime] = None
+    # only these movies, to refresh changed rows of a list the client holds
+    movie_ids: Optional[Tuple[str, ...]] = None
+
+    @property
+    def sort_name(self) -> str:
+        return self.sort.lstrip("-")
+
+    @property
+    def direction(self) -> int:
+        return -1 if self.sort.startswith("-") else 1
+
+    def movie_filter(self, prefix: str = "") -> dict:
+        """Conditions on the movie document, its fields under prefix"""
+        query = {}
+        if self.min_rating is not None:
+            query[f"{prefix}rating_average"] = {"$gte": self.min_rating}
+        if self.added_by:
+            query[f"{prefix}added_by"] = self.added_by
+        return query
+
+    def ids_filter(self, field: str, object_ids: bool = False) -> dict:
+        """Restrict field, holding movie ids as strings or ObjectIds, to movie_ids"""
+        if self.movie_ids is None:
+            return {}
+        ids = list(self.movie_ids)
+        if object_ids:
+            ids = [ObjectId(movie_id) for movie_id in ids if ObjectId.is_valid(movie_id)]
+        return {field: {"$in": ids}}
+
+    def date_filter(self) -> dict:
+        bounds = {}
+        if self.date_from:
+            bounds["$gte"] = self.date_from
+        if self.date_to:
+            bounds["$lte"] = self.date_to
+        return {"date_added": bounds} if bounds else {}
+
+    def cache_key(self) -> str:
+        return "|".join(
+            str(value) for value in
+            (
+                self.sort, self.min_rating, self.added_by, self.date_from, self.date_to,
+                ",".join(self.movie_ids) if self.movie_ids is not None else None,
+            )
+        )
+
+
+DEFAULT_OPTIONS = ListOptions()
+
+
+# ----- PAGE CURSORS -----
+# A cursor is the (sort value, _id) pair of the last row of a page and the
+# sort it was made for, encoded so that clients treat it as an opaque string.
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+# The codec of every cursor and token handed to clients: JSON in url-safe
+# base64 without padding.
+def encode_opaque(data: dict) -> str:
+    return base64.urlsafe_b64encode(json.dumps(data).encode()).decode().rstrip("=")
+
+
+def decode_opaque(value: str) -> dict:
+    """Decode encode_opaque's output, raising ValueError if it is malformed"""
+    padded = value + "=" * (-len(value) % 4)
+    data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    if not isinstance(data, dict):
+        raise ValueError("not an encoded object")
+    return data
+
+
+def encode_cursor(value, doc_id, sort: str = "date") -> str:
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    return encode_opaque({"s": sort, "v": value, "i": str(doc_id)})
+
+
+def decode_cursor(cursor: str, sort: str = "date") -> Tuple[object, str]:
+    """Decode a cursor made for sort, raising InvalidCursor if it is malformed"""
+    try:
+        data = decode_opaque(cursor)
+        if data["s"] != sort:
+            raise ValueError("cursor is for another sort")
+        value = data["v"]
+        if sort.lstrip("-") == "date":
+            value = datetime.fromisoformat(value)
+        return value, str(data["i"])
+    except (ValueError, KeyError, TypeError, AttributeError) as e:
+        raise InvalidCursor(f"Invalid cursor: {cursor}") from e
+
+
+def _page_stages(
+    after: Optional[Tuple[object, object]],
+    limit: Optional[int],
+    field: str = "date_added",
+    direction: int = 1,
+) -> list:
+    """Keyset stages on (field, _id); limit + 1 rows tell whether there is more"""
+    stages: list = []
+    if after:
+        after_value, after_id = after
+        beyond = "$gt" if direction == 1 else "$lt"
+        stages.append(
+            {
+                "$match": {
+                    "$or": [
+                        {field: {beyond: after_value}},
+                        {field: after_value, "_id": {beyond: after_id}},
+                    ]
+                }
+            }
+        )
+    stages.append({"$sort": {field: direction, "_id": direction}})
+    if limit:
+        stages.append({"$limit": limit + 1})
+    stages.append({"$set": {"page_key": {"v": f"${field}", "i": "$_id"}}})
+    return stages
+
+
+def _stats_projection(movie: str) -> dict:
+    """Average rating and review count from the stats stored on the movie"""
+    rating_sum = {"$ifNull": [f"{movie}.rating_sum", 0]}
+    rating_count = {"$ifNull": [f"{movie}.rating_count", 0]}
+    return {
+        "average_rating": {
+            "$cond": [{"$gt": [rating_count, 0]}, {"$divide": [rating_sum, rating_count]}, 0]
+        },
+        "review_count": rating_count,
+    }
+
+
+# Stages that turn a stream of documents carrying a string "movie_id" and a
+# "watched_status" into the MovieResponse shape. The review lookup is limited
+# to one document per movie so the pipeline never pulls every review of a title.
+def _review_and_project_stages(date_added: str = "$movie.date_added") -> list:
+    return [
+        {
+            "$lookup": {
+                "from": "reviews",
+                "localField": "movie_id",
+                "foreignField": "movie_id",
+                "pipeline": [{"$limit": 1}, {"$project": {"rating": 1, "review": 1}}],
+                "as": "review",
+            }
+        },
+        {"$set": {"review": {"$arrayElemAt": ["$review", 0]}}},
+        {
+            "$project": {
+                "_id": 0,
+                "id": "$movie_id",
+                "title": "$movie.title",
+                "comment": "$movie.comment",
+                "added_by": "$movie.added_by",
+                "date_added": date_added,
+                "review": {"$ifNull": ["$review.review", ""]},
+                "rating": {"$ifNull": ["$review.rating", 0]},
+                **_stats_projection("$movie"),
+                "watched_status": {"$ifNull": ["$watched_status", "not_watched"]},
+                "page_key": 1,
+            }
+        },
+    ]
+
+
+def all_movies_pipeline(
+    after: Optional[Tuple[object, str]] = None,
+    limit: Optional[int] = None,
+    options: ListOptions = DEFAULT_OPTIONS,
+) -> list:
+    """Pipeline over the movies collection for the "all" listing"""
+    if after:
+        try:
+            after = (after[0], ObjectId(after[1]))
+        except InvalidId as e:
+            raise InvalidCursor(f"Invalid cursor id: {after[1]}") from e
+    query = {
+        **options.ids_filter("_id", object_ids=True),
+        **options.movie_filter(),
+        **options.date_filter(),
+    }
+    field = SORT_FIELDS[options.sort_name]
+    return [
+        *([{"$match": query}] if query else []),
+        *_page_stages(after, limit, field, options.direction),
+        *_movie_document_stages(),
+    ]
+
+
+def _movie_document_stages() -> list:
+    """Stages that turn movie documents into MovieResponse rows"""
+    return [
+        {
+            "$project": {
+                "_id": 0,
+                "movie": "$$ROOT",
+                "movie_id": {"$toString": "$_id"},
+                "page_key": 1,
+            }
+        },
+        {
+            "$lookup": {
+                "from": "watchlist",
+                "localField": "movie_id",
+                "foreignField": "watched_id",
+                "pipeline": [{"$limit": 1}, {"$project": {"watched_status": 1}}],
+                "as": "watchlist",
+            }
+        },
+        {"$set": {"watched_status": {"$arrayElemAt": ["$watchlist.watched_status", 0]}}},
+        *_review_and_project_stages(),
+    ]
+
+
+def search_pipeline(query: str, mode: str, offset: int, limit: int) -> list:
+    """
+    Pipeline for movie search. "text" ranks matches in titles and comments by
+    text score; "prefix" matches the start of the normalized title in title order.
+    """
+    if mode == "prefix":
+        pattern = "^" + re.escape(normalize_title(query))
+        ranking = [
+            {"$match": {"title_normalized": {"$regex": pattern}}},
+            {"$sort": {"title_normalized": 1, "_id": 1}},
+        ]
+    else:
+        ranking = [
+            {"$match": {"$text": {"$search": query}}},
+            {"$sort": {"score": {"$meta": "textScore"}, "_id": 1}},
+        ]
+    return [*ranking, {"$skip": offset}, {"$limit": limit}, *_movie_document_stages()]
+
+
+async def search_movies(query: str, mode: str, offset: int, limit: int) -> List[MovieResponse]:
+    rows = await Movie.aggregate(search_pipeline(query, mode, offset, limit)).to_list()
+    return movie_list_adapter.validate_python(rows)
+
+
+async def backfill_normalized_titles():
+    """Set title_normalized on movies written before the field existed"""
+    collection = Movie.get_motor_collection()
+    batch = []
+    async for movie in collection.find(
+        {"title_normalized": {"$exists": False}}, projection={"title": 1}
+    ):
+        batch.append(
+            UpdateOne(
+                {"_id": movie["_id"]},
+                {"$set": {"title_normalized": normalize_title(movie.get("title", ""))}},
+            )
+        )
+        if len(batch) == 1000:
+            await collection.bulk_write(batch, ordered=False)
+            batch = []
+    if batch:
+        await collection.bulk_write(batch, ordered=False)
+
+
+def join_movie_stages() -> list:
+    """Stages that embed the movie of each watchlist row as its "movie" field"""
+    return [
+        {
+            "$set": {
+                "movie_oid": {
+                    "$convert": {"input": "$watched_id", "to": "objectId", "onError": None}
+                }
+            }
+        },
+        {
+            "$lookup": {
+                "from": "movies",
+                "localField": "movie_oid",
+                "foreignField": "_id",
+                "as": "movie",
+            }
+        },
+        {"$unwind": "$movie"},
+    ]
+
+
+def watchlist_movies_pipeline(
+    watchlist_filter: dict,
+    dedupe: bool = False,
+    after: Optional[Tuple[object, str]] = None,
+    limit: Optional[int] = None,
+    options: ListOptions = DEFAULT_OPTIONS,
+) -> list:
+    """
+    Pipeline over the watchlist collection for user or status scoped listings.
+    The rows carry copies of the movie fields the options sort and filter on,
+    so the page is cut on the watchlist and only its movies are joined. The
+    date shown is the row's, the one the list is ordered and bounded by.
+    """
+    pipeline: list = [
+        {
+            "$match": {
+                **watchlist_filter,
+                **options.ids_filter("watched_id"),
+                **options.movie_filter(),
+                **options.date_filter(),
+            }
+        }
+    ]
+    if dedupe:
+        # The same movie can sit on several users' watchlists
+        pipeline.append(
+            {
+                "$group": {
+                    "_id": "$watched_id",
+                    "watched_status": {"$last": "$watched_status"},
+                    "date_added": {"$min": "$date_added"},
+                    "title_normalized": {"$first": "$title_normalized"},
+                    "rating_average": {"$first": "$rating_average"},
+                }
+            }
+        )
+        pipeline.append({"$set": {"watched_id": "$_id"}})
+
+    field = SORT_FIELDS[options.sort_name]
+    pipeline += [
+        *_page_stages(after, limit, field, options.direction),
+        *join_movie_stages(),
+        {"$set": {"movie_id": "$watched_id"}},
+        *_review_and_project_stages(date_added="$date_added"),
+    ]
+    return pipeline
+
+
+async def backfill_watchlist_copies():
+    """Copy the movie fields onto watchlist rows written before the copies existed"""
+    collection = Watchlist.get_motor_collection()
+    movie_ids = await collection.distinct("watched_id", {"title_normalized": {"$exists": False}})
+    for start in range(0, len(movie_ids), 1000):
+        chunk = [ObjectId(i) for i in movie_ids[start:start + 1000] if ObjectId.is_valid(i)]
+        batch = [
+            UpdateMany({"watched_id": str(movie["_id"])}, {"$set": watchlist_copies(movie)})
+            async for movie in Movie.get_motor_collection().find(
+                {"_id": {"$in": chunk}}, projection=dict.fromkeys(WATCHLIST_COPIES, 1)
+            )
+        ]
+        if batch:
+            await collection.bulk_write(batch, ordered=False)
+
+
+def movie_detail_pipeline(movie_oid: ObjectId, username: Optional[str]) -> list:
+    """Pipeline returning one movie with the caller's review and watchlist entry embedded"""
+    user_match = {"$match": {"user_id": username}}
+    return [
+        {"$match": {"_id": movie_oid}},
+        {"$set": {"movie_id": {"$toString": "$_id"}}},
+        {
+            "$lookup": {
+                "from": "reviews",
+                "localField": "movie_id",
+                "foreignField": "movie_id",
+                "pipeline": [user_match, {"$limit": 1}],
+                "as": "review",
+            }
+        },
+        {
+            "$lookup": {
+                "from": "watchlist",
+                "localField": "movie_id",
+                "foreignField": "watched_id",
+                "pipeline": [user_match, {"$limit": 1}],
+                "as": "watchlist",
+            }
+        },
+        {
+            "$project": {
+                "_id": 0,
+                "id": "$movie_id",
+                "title": 1,
+                "comment": 1,
+                "added_by": 1,
+                "date_added": 1,
+                "review": {"$ifNull": [{"$first": "$review.review"}, ""]},
+                "rating": {"$ifNull": [{"$first": "$review.rating"}, 0]},
+                **_stats_projection("$$ROOT"),
+                "watched_status": {"$ifNull": [{"$first": "$watchlist.watched_status"}, None]},
+            }
+        },
+    ]
+
+
+async def fetch_movie_detail(movie_id: str, username: Optional[str]) -> Optional[MovieResponse]:
+    """Load a movie with the caller's review and watched status in one aggregation"""
+    if not ObjectId.is_valid(movie_id):
+        return None
+    rows = await Movie.aggregate(
+        movie_detail_pipeline(ObjectId(movie_id), username)
+    ).to_list()
+    return MovieResponse(**rows[0]) if rows else None
+
+
+def _movie_list_query(
+    watched_status: str,
+    username: Optional[str],
+    after: Optional[str] = None,
+    limit: Optional[int] = None,
+    options: ListOptions = DEFAULT_OPTIONS,
+):
+    after_key = decode_cursor(after, options.sort) if after else None
+    if watched_status == "all":
+        return Movie.aggregate(all_movies_pipeline(after_key, limit, options))
+    if watched_status == "my":
+        watchlist_filter, dedupe = {"user_id": username}, False
+    elif watched_status in ["watched", "not_watched"]:
+        watchlist_filter = {"watched_status": watched_status, "user_id": username}
+        dedupe = False
+    else:
+        watchlist_filter, dedupe = {"watched_status": watched_status}, True
+    return Watchlist.aggregate(
+        watchlist_movies_pipeline(watchlist_filter, dedupe, after_key, limit, options)
+    )
+
+
+async def fetch_movie_list(
+    watched_status: str,
+    username: Optional[str],
+    after: Optional[str] = None,
+    limit: Optional[int] = None,
+    options: ListOptions = DEFAULT_OPTIONS,
+) -> Tuple[List[MovieResponse], Optional[str]]:
+    """
+    Run the listing for a watched_status as a single aggregation.
+    Returns the rows and the cursor of the next page, if there is one.
+    """
+    rows = await _movie_list_query(watched_status, username, after, limit, options).to_list()
+
+    next_cursor = None
+    if limit and len(rows) > limit:
+        rows = rows[:limit]
+        key = rows[-1]["page_key"]
+        next_cursor = encode_cursor(key["v"], key["i"], options.sort)
+
+    # One validation call for the whole page; page_key is ignored as an extra field
+    return movie_list_adapter.validate_python(rows), next_cursor
+
+
+def stream_movie_list(
+    watched_status: str,
+    username: Optional[str],
+    after: Optional[str] = None,
+    limit: Optional[int] = None,
+    options: ListOptions = DEFAULT_OPTIONS,
+) -> AsyncIterator[MovieResponse]:
+    """
+    Yield the listing row by row straight from the aggregation cursor.
+    The query is built eagerly so a bad cursor fails before streaming starts.
+    """
+    query = _movie_list_query(watched_status, username, after, limit, options)
+    return _iterate_rows(query, limit)
+
+
+async def _iterate_rows(query, limit: Optional[int]) -> AsyncIterator[MovieResponse]:
+    count = 0
+    async for row in query:
+        if limit and count == limit:
+            break
+        count += 1
+        yield MovieResponse(**row)
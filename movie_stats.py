@@ -0,0 +1,285 @@
+import argparse
+import asyncio
+from collections import Counter
+from datetime import datetime
+from typing import Iterable, Optional
+
+from bson import ObjectId
+from pymongo import ReturnDocument, UpdateMany, UpdateOne
+
+from db_context import init_database
+from logging_config import setup_logger
+from movie_model import Movie, Review, Watchlist, utc_now
+
+logger = setup_logger()
+
+# Every movie document carries rating_sum, rating_count and rating_histogram
+# (rating -> number of reviews). Writers keep them current with $inc so the
+# list view can show averages without aggregating over reviews on read.
+# rating_average is stored next to them so lists can sort and filter on it
+# through an index.
+
+AVERAGE_EXPRESSION = {
+    "$cond": [
+        {"$gt": ["$rating_count", 0]},
+        {"$divide": ["$rating_sum", "$rating_count"]},
+        0,
+    ]
+}
+
+
+def rating_delta(old_rating: Optional[int], new_rating: Optional[int]) -> Counter:
+    """The $inc needed when a review's rating goes from old to new (None = no review)"""
+    delta = Counter()
+    if old_rating is not None:
+        delta["rating_sum"] -= old_rating
+        delta["rating_count"] -= 1
+        delta[f"rating_histogram.{old_rating}"] -= 1
+    if new_rating is not None:
+        delta["rating_sum"] += new_rating
+        delta["rating_count"] += 1
+        delta[f"rating_histogram.{new_rating}"] += 1
+    return delta
+
+
+def merge_deltas(deltas: Iterable[Counter]) -> dict:
+    """Combine deltas into one $inc document, leaving out fields that cancel"""
+    total = Counter()
+    for delta in deltas:
+        total.update(delta)
+    return {field: value for field, value in total.items() if value}
+
+
+def initial_stats(rating: Optional[int]) -> dict:
+    """Stats for a new movie with at most one review"""
+    if rating is None:
+        return {"rating_sum": 0, "rating_count": 0, "rating_histogram": {}, "rating_average": 0}
+    return {
+        "rating_sum": rating,
+        "rating_count": 1,
+        "rating_histogram": {str(rating): 1},
+        "rating_average": float(rating),
+    }
+
+
+def stats_update(inc: dict) -> list:
+    """Update pipeline applying a merged $inc and recomputing rating_average from the result"""
+    increments = {
+        field: {"$add": [{"$ifNull": [f"${field}", 0]}, value]} for field, value in inc.items()
+    }
+    return [
+        {"$set": {**increments, "updated_at": utc_now()}},
+        {"$set": {"rating_average": AVERAGE_EXPRESSION}},
+    ]
+
+
+async def upsert_review(
+    movie_id: str, user_id: str, rating: int, review: str, session=None
+) -> tuple[Optional[int], dict]:
+    """
+    Create or update a user's review of a movie.
+    Returns the previous rating (None if the review is new) and the stored review.
+    """
+    now = datetime.now()
+    new_id = ObjectId()
+    previous = await Review.get_motor_collection().find_one_and_update(
+        {"movie_id": movie_id, "user_id": user_id},
+        {
+            "$set": {"rating": rating, "review": review, "updated_at": utc_now()},
+            "$setOnInsert": {"_id": new_id, "date_added": now},
+        },
+        upsert=True,
+        return_document=ReturnDocument.BEFORE,
+        session=session,
+    )
+    if previous is None:
+        stored = {"_id": new_id, "movie_id": movie_id, "user_id": user_id, "date_added": now}
+        return None, {**stored, "rating": rating, "review": review}
+    return previous["rating"], {**previous, "rating": rating, "review": review}
+
+
+async def upsert_reviews(
+    movie_id: str, user_ids: list[str], rating: int, review: str, session=None
+) -> list[Optional[int]]:
+    """
+    Create or update several users' reviews of a movie with one read and one
+    bulk write. Returns each user's previous rating (None if the review is new);
+    run it in a transaction so no write lands between the read and the write.
+    """
+    collection = Review.get_motor_collection()
+    previous = {
+        document["user_id"]: document["rating"]
+        async for document in collection.find(
+            {"movie_id": movie_id, "user_id": {"$in": user_ids}},
+            projection={"user_id": 1, "rating": 1},
+            session=session,
+        )
+    }
+    now = datetime.now()
+    await collection.bulk_write(
+        [
+            UpdateOne(
+                {"movie_id": movie_id, "user_id": user_id},
+                {
+                    "$set": {"rating": rating, "review": review, "updated_at": utc_now()},
+                    "$setOnInsert": {"date_added": now},
+                },
+                upsert=True,
+            )
+            for user_id in user_ids
+        ],
+        ordered=False,
+        session=session,
+    )
+    return [previous.get(user_id) for user_id in user_ids]
+
+
+async def apply_stats(movie_id: str, inc: dict, session=None) -> Optional[Movie]:
+    """
+    Apply a merged $inc to a movie's stats, copy the new average onto its
+    watchlist rows and return the updated movie (None if no-op)
+    """
+    if not inc:
+        return None
+    document = await Movie.get_motor_collection().find_one_and_update(
+        {"_id": ObjectId(movie_id)},
+        stats_update(inc),
+        return_document=ReturnDocument.AFTER,
+        session=session,
+    )
+    if not document:
+        return None
+    await Watchlist.get_motor_collection().update_many(
+        {"watched_id": movie_id},
+        {"$set": {"rating_average": document["rating_average"]}},
+        session=session,
+    )
+    return Movie.model_validate(document)
+
+
+# ----- REBUILD AND CONSISTENCY CHECK -----
+
+
+def _stats_pipeline() -> list:
+    return [
+        {"$group": {"_id": {"movie_id": "$movie_id", "rating": "$rating"}, "count": {"$sum": 1}}},
+        {
+            "$group": {
+                "_id": "$_id.movie_id",
+                "rating_sum": {"$sum": {"$multiply": ["$_id.rating", "$count"]}},
+                "rating_count": {"$sum": "$count"},
+                "histogram": {"$push": {"k": {"$toString": "$_id.rating"}, "v": "$count"}},
+            }
+        },
+    ]
+
+
+async def computed_stats() -> dict:
+    """Stats for every movie computed from the reviews collection"""
+    stats = {}
+    async for row in Review.get_motor_collection().aggregate(_stats_pipeline()):
+        stats[row["_id"]] = {
+            "rating_sum": row["rating_sum"],
+            "rating_count": row["rating_count"],
+            "rating_histogram": {item["k"]: item["v"] for item in row["histogram"]},
+            "rating_average": row["rating_sum"] / row["rating_count"],
+        }
+    return stats
+
+
+def _normalized(document: dict) -> dict:
+    histogram = {k: v for k, v in (document.get("rating_histogram") or {}).items() if v}
+    return {
+        "rating_sum": document.get("rating_sum", 0),
+        "rating_count": document.get("rating_count", 0),
+        "rating_histogram": histogram,
+        "rating_average": document.get("rating_average"),
+    }
+
+
+async def find_inconsistent(batch_size: int = 1000) -> list[str]:
+    """Ids of movies whose stored stats differ from the reviews"""
+    expected = await computed_stats()
+    empty = initial_stats(None)
+    mismatched = []
+    cursor = Movie.get_motor_collection().find(
+        {},
+        projection={"rating_sum": 1, "rating_count": 1, "rating_histogram": 1, "rating_average": 1},
+        batch_size=batch_size,
+    )
+    async for document in cursor:
+        movie_id = str(document["_id"])
+        if _normalized(document) != expected.get(movie_id, empty):
+            mismatched.append(movie_id)
+    return mismatched
+
+
+async def rebuild_stats(movie_ids: Optional[list[str]] = None, batch_size: int = 1000) -> int:
+    """Recompute the stats from the reviews, for all movies or only movie_ids"""
+    expected = await computed_stats()
+    empty = initial_stats(None)
+    query = {"_id": {"$in": [ObjectId(i) for i in movie_ids]}} if movie_ids is not None else {}
+    cursor = Movie.get_motor_collection().find(query, projection={"_id": 1})
+
+    updated = 0
+    batch, copies = [], []
+    async for document in cursor:
+        movie_id = str(document["_id"])
+        stats = expected.get(movie_id, empty)
+        batch.append(UpdateOne({"_id": document["_id"]}, {"$set": stats}))
+        average = {"rating_average": stats["rating_average"]}
+        copies.append(UpdateMany({"watched_id": movie_id}, {"$set": average}))
+        if len(batch) == batch_size:
+            await _write_stats(batch, copies)
+            updated += len(batch)
+            batch, copies = [], []
+    if batch:
+        await _write_stats(batch, copies)
+        updated += len(batch)
+    return updated
+
+
+async def _write_stats(batch: list, copies: list):
+    await Movie.get_motor_collection().bulk_write(batch, ordered=False)
+    await Watchlist.get_motor_collection().bulk_write(copies, ordered=False)
+
+
+async def backfill_rating_stats():
+    """
+    Give movies written before the stats existed their stats, computed from
+    the reviews, and movies written before rating_average existed their average
+    """
+    collection = Movie.get_motor_collection()
+    missing = [
+        str(document["_id"])
+        async for document in collection.find(
+            {"rating_count": {"$exists": False}}, projection={"_id": 1}
+        )
+    ]
+    if missing:
+        updated = await rebuild_stats(missing)
+        logger.info("Computed rating stats for %d movies written before they existed", updated)
+    await collection.update_many(
+        {"rating_average": {"$exists": False}},
+        [{"$set": {"rating_average": AVERAGE_EXPRESSION}}],
+    )
+
+
+async def main(command: str):
+    client = await init_database()
+    if command == "check":
+        mismatched = await find_inconsistent()
+        logger.info("%d movies have inconsistent rating stats", len(mismatched))
+        for movie_id in mismatched:
+            logger.info("Inconsistent rating stats: movie %s", movie_id)
+    else:
+        updated = await rebuild_stats()
+        logger.info("Rebuilt rating stats for %d movies", updated)
+    client.close()
+
+
+if __name__ == "__main__":
+    # python movie_stats.py check | rebuild
+    parser = argparse.ArgumentParser(description="Check or rebuild per-movie rating stats")
+    parser.add_argument("command", choices=["check", "rebuild"])
+    asyncio.run(main(parser.parse_args().command))
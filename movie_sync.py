@@ -0,0 +1,119 @@
+import asyncio
+from datetime import datetime, timedelta
+from typing import Optional
+
+from logging_config import setup_logger
+from movie_model import (
+    TOMBSTONE_RETENTION_SECONDS,
+    Movie,
+    MovieChanges,
+    MovieTombstone,
+    Review,
+    Watchlist,
+    utc_now,
+)
+from movie_queries import (
+    InvalidCursor, ListOptions, decode_opaque, encode_opaque, fetch_movie_list,
+)
+
+logger = setup_logger()
+
+# Delta sync for GET /movies/changes.
+#
+# Movies, reviews and watchlist entries carry updated_at, set by every write,
+# and deleting a movie leaves a tombstone that a TTL index removes after
+# TOMBSTONE_RETENTION_SECONDS. A sync token is the time a sync started; the
+# next sync finds the movies whose document, reviews or watchlist entries
+# changed since then, and the tombstones written since then. A sync is for
+# one list: the changed movies are run through that listing, so the rows have
+# its shape, and changed movies it no longer holds are reported as removed.
+# Each sync reads back SYNC_OVERLAP further, for clock skew between workers
+# and writes in flight, so a row can be sent twice.
+
+SYNC_OVERLAP = timedelta(seconds=60)
+
+
+def encode_sync_token(started: datetime) -> str:
+    return encode_opaque({"t": started.isoformat()})
+
+
+def decode_sync_token(token: str) -> datetime:
+    """The time in a sync token, raising InvalidCursor if it is malformed"""
+    try:
+        started = datetime.fromisoformat(decode_opaque(token)["t"])
+        if started.tzinfo is None:
+            raise ValueError("sync token without a time zone")
+        return started
+    except (ValueError, KeyError, TypeError) as e:
+        raise InvalidCursor(f"Invalid sync token: {token}") from e
+
+
+async def _changed_values(model, query: dict, field: str, limit: int) -> list:
+    cursor = model.get_motor_collection().find(query, projection={field: 1}).limit(limit + 1)
+    return [str(document[field]) async for document in cursor]
+
+
+# lists made of the caller's own watchlist; the others show any user's entries
+USER_LISTS = ("my", "watched", "not_watched")
+
+
+async def fetch_changes(
+    since: Optional[str], username: str, watched_status: str = "all", limit: int = 1000
+) -> MovieChanges:
+    """
+    Changes to one of the caller's lists since a sync token. Without a token,
+    with one older than the tombstones, or with more than limit changes, the
+    answer is a resync: reload the list, then sync from token.
+    """
+    started = utc_now()
+    token = encode_sync_token(started)
+    resync = MovieChanges(token=token, watched_status=watched_status, resync=True)
+    if since is None:
+        return resync
+    since_time = decode_sync_token(since)
+    if started - since_time > timedelta(seconds=TOMBSTONE_RETENTION_SECONDS):
+        return resync
+
+    after = {"$gte": since_time - SYNC_OVERLAP}
+    watchlist_query = {"updated_at": after}
+    if watched_status in USER_LISTS:
+        watchlist_query["user_id"] = username
+    movie_ids, review_movie_ids, watchlist_movie_ids, deleted = await asyncio.gather(
+        _changed_values(Movie, {"updated_at": after}, "_id", limit),
+        _changed_values(Review, {"updated_at": after}, "movie_id", limit),
+        _changed_values(Watchlist, watchlist_query, "watched_id", limit),
+        _changed_values(MovieTombstone, {"deleted_at": after}, "movie_id", limit),
+    )
+    found = (movie_ids, review_movie_ids, watchlist_movie_ids, deleted)
+    deleted = set(deleted)
+    changed = (set(movie_ids) | set(review_movie_ids) | set(watchlist_movie_ids)) - deleted
+    # a source cut at limit + 1 rows is incomplete even when its ids repeat,
+    # and limit applies to the movies the client would receive, not to each source
+    if any(len(values) > limit for values in found) or len(changed | deleted) > limit:
+        return resync
+
+    rows = []
+    if changed:
+        options = ListOptions(movie_ids=tuple(sorted(changed)))
+        rows, _ = await fetch_movie_list(watched_status, username, options=options)
+    return MovieChanges(
+        token=token,
+        watched_status=watched_status,
+        changed=rows,
+        removed=sorted(changed - {row.id for row in rows}),
+        deleted=sorted(deleted),
+    )
+
+
+async def backfill_updated_at():
+    """Set updated_at on documents written before the field existed"""
+    now = utc_now()
+    for model in (Movie, Review, Watchlist):
+        result = await model.get_motor_collection().update_many(
+            {"updated_at": {"$exists": False}}, {"$set": {"updated_at": now}}
+        )
+        if result.modified_count:
+            logger.info(
+                "Set updated_at on %s documents in %s",
+                result.modified_count, model.get_collection_name(),
+            )
@@ -1,16 +1,70 @@
 from functools import lru_cache
+from typing import Optional
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
-class MyConfig(BaseSettings):
+class LoggingConfig(BaseSettings):
+    # Loggers are set up at import time, before the required settings below may
+    # be available (tests, scripts), so logging_config reads only this part
+    # through get_logging_settings. LOG_LEVEL DEBUG enables the request
+    # debugging output; LOG_QUEUE_SIZE records can wait for the writer thread.
+    log_level: str = "INFO"
+    log_queue_size: int = 10_000
+
+    model_config = SettingsConfigDict(env_file=".env", extra="ignore")
+
+
+class MyConfig(LoggingConfig):
     connection_string: str
     secret_key: str
     db_name: str = "MovieTracker"
+    # MongoDB connection pool, see db_context.py; None keeps the driver default
+    mongo_max_pool_size: int = 100
+    mongo_min_pool_size: int = 0
+    mongo_max_idle_time_ms: Optional[int] = None
+    mongo_wait_queue_timeout_ms: Optional[int] = None
+    # comma separated, e.g. "zstd,snappy"; needs the zstandard / python-snappy packages
+    mongo_compressors: Optional[str] = None
+    mongo_read_preference: str = "primary"
+    # seconds between loads of other workers' logouts, see token_revocation.py;
+    # 0 keeps revocations in the memory of the worker that received the logout
+    token_revocation_sync_seconds: int = 30
+    # requests running more Mongo commands than this are logged, see metrics.py
+    mongo_op_budget: int = 20
+    # bcrypt runs on a thread pool of this size, see password_hasher.py
+    password_hash_workers: int = 4
+    # background photo uploads, see photo_store.py
+    photo_max_bytes: int = 500 * 1024
+    photo_max_dimension: int = 1920
+    # movie list response cache, see response_cache.py; set the URL to share it between workers
+    response_cache_size: int = 512
+    response_cache_url: Optional[str] = None
+    response_cache_ttl: int = 300
+    # lifetime of entries in the per-worker cache, which misses other workers' writes
+    response_cache_local_ttl: int = 15
+    # rows per insert_many in POST /movies/bulk, and per cursor batch in GET /movies/export
+    bulk_import_batch_size: int = 1000
+    # JSON, NDJSON and CSV responses from this size up are compressed, see api_responses.py;
+    # 0 turns compression off (e.g. when a proxy in front compresses)
+    compression_minimum_size: int = 1024
+    # GET /movies/events, see live_events.py; needs MongoDB running as a replica set
+    live_events: bool = True
+    sse_heartbeat_seconds: int = 15
+    sse_queue_size: int = 100
+    # frontend files, see static_files.py; point it at a build (frontend/dist) in production
+    static_dir: str = "frontend"
+    static_cache_dir: Optional[str] = ".static_cache"
 
-    model_config = SettingsConfigDict(env_file=".env")
+    # unlike LoggingConfig, unknown keys in .env are still an error here
+    model_config = SettingsConfigDict(env_file=".env", extra="forbid")
 
 
 
 @lru_cache
 def get_settings():
-    return MyConfig()
\ No newline at end of file
+    return MyConfig()
+
+
+@lru_cache
+def get_logging_settings():
+    return LoggingConfig()
\ No newline at end of file
@@ -0,0 +1,133 @@
+import asyncio
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from typing import Optional
+
+from bson import ObjectId
+from bson.errors import InvalidId
+
+from db_context import init_database
+from logging_config import setup_logger
+from movie_model import Movie, Review, Watchlist
+
+logger = setup_logger()
+
+# Reviews and watchlist entries refer to their movie by the string form of its
+# _id (Review.movie_id, Watchlist.watched_id). Rows whose movie no longer
+# exists are orphans; delete_movie used to leave the watchlist rows behind.
+# The collector walks each collection in _id order, one batch at a time, and
+# only deletes rows whose movie was confirmed missing in that batch.
+
+ORPHAN_SOURCES = [(Review, "movie_id"), (Watchlist, "watched_id")]
+
+
+@dataclass
+class GcProgress:
+    status: str = "idle"  # idle, running, done or failed
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    scanned: dict = field(default_factory=dict)  # collection name -> rows scanned
+    removed: dict = field(default_factory=dict)  # collection name -> rows removed
+    error: Optional[str] = None
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+def _movie_oid(value) -> Optional[ObjectId]:
+    try:
+        return ObjectId(value)
+    except (InvalidId, TypeError):
+        return None
+
+
+async def _existing_movies(movie_ids: set) -> set:
+    """The subset of movie_ids (strings) that belong to an existing movie"""
+    oids = [oid for oid in map(_movie_oid, movie_ids) if oid is not None]
+    if not oids:
+        return set()
+    cursor = Movie.get_motor_collection().find({"_id": {"$in": oids}}, projection={"_id": 1})
+    return {str(document["_id"]) async for document in cursor}
+
+
+async def remove_orphans(model, reference: str, progress: GcProgress, batch_size: int = 1000):
+    """Delete the rows of model whose reference field points at a missing movie"""
+    collection = model.get_motor_collection()
+    name = collection.name
+    progress.scanned[name] = 0
+    progress.removed[name] = 0
+
+    last_id = None
+    while True:
+        query = {"_id": {"$gt": last_id}} if last_id is not None else {}
+        batch = (
+            await collection.find(query, projection={reference: 1})
+            .sort("_id", 1)
+            .limit(batch_size)
+            .to_list(batch_size)
+        )
+        if not batch:
+            break
+        last_id = batch[-1]["_id"]
+
+        existing = await _existing_movies({row.get(reference) for row in batch})
+        orphan_ids = [row["_id"] for row in batch if row.get(reference) not in existing]
+        if orphan_ids:
+            result = await collection.delete_many({"_id": {"$in": orphan_ids}})
+            progress.removed[name] += result.deleted_count
+        progress.scanned[name] += len(batch)
+
+
+async def collect_orphans(progress: GcProgress, batch_size: int = 1000) -> GcProgress:
+    """Remove orphaned reviews and watchlist entries, updating progress as it goes"""
+    progress.status = "running"
+    progress.started_at = datetime.now()
+    progress.finished_at = None
+    progress.scanned, progress.removed, progress.error = {}, {}, None
+    try:
+        for model, reference in ORPHAN_SOURCES:
+            await remove_orphans(model, reference, progress, batch_size)
+        progress.status = "done"
+        logger.info("Orphan collection done: removed %s of %s", progress.removed, progress.scanned)
+    except Exception as e:
+        progress.status = "failed"
+        progress.error = str(e)
+        logger.error("Orphan collection failed: %s", e)
+    finally:
+        progress.finished_at = datetime.now()
+    return progress
+
+
+class GcRunner:
+    """Runs at most one collection at a time in the background of this worker"""
+
+    def __init__(self):
+        self.progress = GcProgress()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self, batch_size: int = 1000) -> bool:
+        """Start a run; returns False if one is already running"""
+        if self.running:
+            return False
+        self.progress = GcProgress(status="running", started_at=datetime.now())
+        self._task = asyncio.create_task(collect_orphans(self.progress, batch_size))
+        return True
+
+
+gc_runner = GcRunner()
+
+
+async def main():
+    client = await init_database()
+    progress = await collect_orphans(GcProgress())
+    logger.info("Orphan collection %s: %s", progress.status, progress.to_dict())
+    client.close()
+
+
+if __name__ == "__main__":
+    # python orphan_gc.py
+    asyncio.run(main())
@@ -0,0 +1,151 @@
+import asyncio
+import base64
+import hashlib
+from io import BytesIO
+from typing import Optional, Tuple
+
+from gridfs.errors import NoFile
+from motor.motor_asyncio import AsyncIOMotorGridFSBucket
+from PIL import Image, UnidentifiedImageError
+
+from logging_config import setup_logger
+from user_model import User
+
+logger = setup_logger()
+
+# Background photos live in GridFS, named by the sha256 of their bytes. The
+# digest doubles as the ETag and makes the photo URL safe to cache forever.
+PHOTO_BUCKET = "photos"
+
+CONTENT_TYPES = {"JPEG": "image/jpeg", "PNG": "image/png", "GIF": "image/gif"}
+
+
+class InvalidPhoto(ValueError):
+    pass
+
+
+def _bucket() -> AsyncIOMotorGridFSBucket:
+    database = User.get_motor_collection().database
+    return AsyncIOMotorGridFSBucket(database, bucket_name=PHOTO_BUCKET)
+
+
+def photo_digest(contents: bytes) -> str:
+    return hashlib.sha256(contents).hexdigest()
+
+
+def is_photo_digest(value: str) -> bool:
+    return len(value) == 64 and all(c in "0123456789abcdef" for c in value)
+
+
+def max_source_pixels(max_dimension: int) -> int:
+    """
+    Largest image decoded for a photo stored at max_dimension. A small file can
+    declare a huge canvas, and decoding allocates for every pixel; three times
+    the stored size on each side still takes a 12 MP camera photo.
+    """
+    return (3 * max_dimension) ** 2
+
+
+def prepare_photo(contents: bytes, max_dimension: int) -> Tuple[bytes, str]:
+    """
+    Check that contents is an image and shrink it so neither side is larger
+    than max_dimension. GIFs are kept as they are to keep animations; formats
+    other than JPEG, PNG and GIF (WEBP, BMP, ...) are re-encoded as PNG when
+    they have transparency and as JPEG otherwise.
+    Returns the bytes to store and their content type.
+    """
+    try:
+        # only reads the header; Pillow's own bomb check rejects giant canvases here
+        image = Image.open(BytesIO(contents))
+        image_format = image.format
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError) as e:
+        raise InvalidPhoto("Photo must be an image") from e
+    width, height = image.size
+    limit = max_source_pixels(max_dimension)
+    if width * height > limit:
+        raise InvalidPhoto(f"Photo must have at most {limit:,} pixels")
+
+    if image_format == "GIF" or (
+        image_format in CONTENT_TYPES and max(image.size) <= max_dimension
+    ):
+        return contents, CONTENT_TYPES[image_format]
+
+    output = BytesIO()
+    try:
+        # decoding happens here, a truncated or corrupt file fails now
+        image.thumbnail((max_dimension, max_dimension))
+        if image_format not in CONTENT_TYPES:
+            transparent = "A" in image.getbands() or "transparency" in image.info
+            image_format = "PNG" if transparent else "JPEG"
+            if image_format == "JPEG":
+                image = image.convert("RGB")
+        if image_format == "JPEG":
+            image.save(output, format="JPEG", quality=85, optimize=True)
+        else:
+            image.save(output, format="PNG", optimize=True)
+    except (OSError, ValueError) as e:
+        raise InvalidPhoto("Photo could not be read") from e
+    return output.getvalue(), CONTENT_TYPES[image_format]
+
+
+async def save_photo(contents: bytes, content_type: str) -> str:
+    """Store a photo unless an identical one is already stored; returns its digest"""
+    digest = photo_digest(contents)
+    bucket = _bucket()
+    existing = await bucket.find({"filename": digest}, limit=1).to_list(1)
+    if not existing:
+        await bucket.upload_from_stream(
+            digest, contents, metadata={"contentType": content_type}
+        )
+    return digest
+
+
+async def load_photo(digest: str) -> Optional[Tuple[bytes, str]]:
+    """Return the bytes and content type of a stored photo, or None"""
+    try:
+        stream = await _bucket().open_download_stream_by_name(digest)
+    except NoFile:
+        return None
+    contents = await stream.read()
+    metadata = stream.metadata or {}
+    return contents, metadata.get("contentType", "image/jpeg")
+
+
+async def migrate_legacy_photos(max_dimension: int):
+    """
+    Move base64 photos still stored on User documents into the photo store.
+    Photos that cannot be read are left in place and marked, so later
+    startups skip them.
+    """
+    legacy_users = User.get_motor_collection().find(
+        {"photo": {"$type": "string"}, "photo_unreadable": {"$ne": True}},
+        projection={"photo": 1},
+    )
+    migrated = skipped = 0
+    async for user in legacy_users:
+        photo = user["photo"]
+        if photo.startswith("data:image"):
+            photo = photo.split(",", 1)[-1]
+        try:
+            contents, content_type = await asyncio.to_thread(
+                prepare_photo, base64.b64decode(photo), max_dimension
+            )
+        except (InvalidPhoto, ValueError) as e:
+            logger.warning("Keeping unreadable legacy photo of user %s: %s", user["_id"], e)
+            await User.get_motor_collection().update_one(
+                {"_id": user["_id"]}, {"$set": {"photo_unreadable": True}}
+            )
+            skipped += 1
+            continue
+        digest = await save_photo(contents, content_type)
+        # only unset once the photo is safely in the store
+        await User.get_motor_collection().update_one(
+            {"_id": user["_id"]}, {"$set": {"photo_id": digest}, "$unset": {"photo": ""}}
+        )
+        migrated += 1
+    if migrated or skipped:
+        logger.info(
+            "Moved %d legacy background photos into the photo store,"
+            " kept %d that could not be read",
+            migrated, skipped,
+        )
@@ -0,0 +1,94 @@
+import threading
+from collections import defaultdict
+
+from pymongo import monitoring
+
+
+class PoolGauges(monitoring.ConnectionPoolListener):
+    """
+    Connection pool gauges per server, fed by pymongo's pool events.
+    Motor runs pymongo on worker threads, so the counters are updated under a lock.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._servers = defaultdict(self._empty)
+
+    @staticmethod
+    def _empty() -> dict:
+        return {
+            "open": 0,
+            "in_use": 0,
+            "waiting": 0,
+            "checkouts": 0,
+            "checkout_failures": 0,
+            "checkout_wait_total_ms": 0.0,
+            "checkout_wait_max_ms": 0.0,
+        }
+
+    def _server(self, address) -> dict:
+        return self._servers[f"{address[0]}:{address[1]}"]
+
+    def _checkout_done(self, address, duration):
+        server = self._server(address)
+        server["waiting"] -= 1
+        wait_ms = (duration or 0) * 1000
+        server["checkout_wait_total_ms"] += wait_ms
+        server["checkout_wait_max_ms"] = max(server["checkout_wait_max_ms"], wait_ms)
+
+    def connection_created(self, event):
+        with self._lock:
+            self._server(event.address)["open"] += 1
+
+    def connection_closed(self, event):
+        with self._lock:
+            self._server(event.address)["open"] -= 1
+
+    def connection_check_out_started(self, event):
+        with self._lock:
+            self._server(event.address)["waiting"] += 1
+
+    def connection_checked_out(self, event):
+        with self._lock:
+            self._checkout_done(event.address, event.duration)
+            server = self._server(event.address)
+            server["in_use"] += 1
+            server["checkouts"] += 1
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            self._checkout_done(event.address, event.duration)
+            self._server(event.address)["checkout_failures"] += 1
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self._server(event.address)["in_use"] -= 1
+
+    def connection_ready(self, event):
+        pass
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def stats(self) -> dict:
+        """Current gauges per server, with the mean checkout wait"""
+        with self._lock:
+            servers = {address: dict(server) for address, server in self._servers.items()}
+        for server in servers.values():
+            attempts = server["checkouts"] + server["checkout_failures"]
+            total = server.pop("checkout_wait_total_ms")
+            server["checkout_wait_mean_ms"] = round(total / attempts, 3) if attempts else 0.0
+            server["checkout_wait_max_ms"] = round(server["checkout_wait_max_ms"], 3)
+        return servers
+
+
+pool_gauges = PoolGauges()
@@ -0,0 +1,198 @@
+import hashlib
+import json
+import time
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Optional
+
+from logging_config import setup_logger
+from my_config import get_settings
+from ttl_cache import TTLCache
+
+logger = setup_logger()
+
+# Cache of serialized GET /movies/{watched_status} responses.
+#
+# Keys carry two generation counters: a global one, bumped by writes that can
+# change any list (editing, deleting or reviewing a movie), and one per list
+# group (watched_status, user), bumped by writes that only touch a user's
+# watchlist. Invalidating is a counter increment; stale entries are never read
+# again and fall out of the LRU.
+#
+# The in-process backend only sees the invalidations of its own worker, so its
+# entries also expire after a short TTL, which bounds how long a write made
+# through another worker can take to show up. Share the cache between workers
+# (response_cache_url) to have every write seen at once.
+
+USER_SCOPED_STATUSES = ("my", "watched", "not_watched")
+
+
+@dataclass
+class CachedResponse:
+    etag: str
+    body: bytes
+    next_cursor: Optional[str] = None
+
+    def to_json(self) -> str:
+        return json.dumps(
+            {"etag": self.etag, "body": self.body.decode(), "next_cursor": self.next_cursor}
+        )
+
+    @classmethod
+    def from_json(cls, raw) -> "CachedResponse":
+        data = json.loads(raw)
+        return cls(data["etag"], data["body"].encode(), data["next_cursor"])
+
+
+def make_etag(body: bytes) -> str:
+    return '"' + hashlib.sha1(body).hexdigest() + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison, as CompressionMiddleware sends compressed bodies with W/ ETags"""
+    if not if_none_match:
+        return False
+    opaque = etag.removeprefix("W/")
+    return any(
+        tag.strip() == "*" or tag.strip().removeprefix("W/") == opaque
+        for tag in if_none_match.split(",")
+    )
+
+
+def list_group(watched_status: str, username: Optional[str]) -> str:
+    """The list a response belongs to; "all" and status-only lists are shared by all users"""
+    if watched_status in USER_SCOPED_STATUSES:
+        return f"{watched_status}:{username}"
+    return f"{watched_status}:"
+
+
+class MemoryBackend:
+    """In-process LRU with a time to live, the default. Each worker has its own copy."""
+
+    def __init__(self, maxsize: int = 512, ttl: float = 15, clock=time.monotonic):
+        self._entries: TTLCache[CachedResponse] = TTLCache(maxsize, ttl, clock)
+        self._generations: dict[str, int] = {}
+
+    @property
+    def evictions(self) -> int:
+        return self._entries.evictions
+
+    async def get(self, key: str) -> Optional[CachedResponse]:
+        return self._entries.get(key)
+
+    async def set(self, key: str, value: CachedResponse):
+        self._entries.set(key, value)
+
+    async def generation(self, name: str) -> int:
+        return self._generations.get(name, 0)
+
+    async def bump(self, name: str):
+        self._generations[name] = self._generations.get(name, 0) + 1
+
+
+class KeyValueBackend:
+    """
+    Shared backend on top of a Redis-style async client (get, set with ex, incr),
+    so every worker sees the same entries and invalidations. Evictions are left
+    to the store, which expires entries after ttl seconds.
+    """
+
+    def __init__(self, client, ttl: int = 300, prefix: str = "movie-cache:"):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+        self.evictions = 0
+
+    async def get(self, key: str) -> Optional[CachedResponse]:
+        raw = await self.client.get(self.prefix + key)
+        return CachedResponse.from_json(raw) if raw else None
+
+    async def set(self, key: str, value: CachedResponse):
+        await self.client.set(self.prefix + key, value.to_json(), ex=self.ttl)
+
+    async def generation(self, name: str) -> int:
+        value = await self.client.get(self.prefix + "gen:" + name)
+        return int(value) if value else 0
+
+    async def bump(self, name: str):
+        await self.client.incr(self.prefix + "gen:" + name)
+
+
+class LocalKeyValueStore:
+    """Stand-in for a shared key-value server with the subset of its API the cache uses"""
+
+    def __init__(self):
+        self.data: dict[str, object] = {}
+
+    async def get(self, key: str):
+        return self.data.get(key)
+
+    async def set(self, key: str, value, ex: Optional[int] = None):
+        self.data[key] = value
+
+    async def incr(self, key: str) -> int:
+        self.data[key] = int(self.data.get(key, 0)) + 1
+        return self.data[key]
+
+
+class ResponseCache:
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+
+    async def _key(self, watched_status: str, username: Optional[str], variant: str) -> str:
+        group = list_group(watched_status, username)
+        movies_generation = await self.backend.generation("movies")
+        group_generation = await self.backend.generation(group)
+        return f"{movies_generation}|{group}|{group_generation}|{variant}"
+
+    async def get(
+        self, watched_status: str, username: Optional[str], variant: str
+    ) -> tuple[str, Optional[CachedResponse]]:
+        """Look up a response; returns the key to store it under on a miss"""
+        key = await self._key(watched_status, username, variant)
+        entry = await self.backend.get(key)
+        if entry is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return key, entry
+
+    async def set(self, key: str, entry: CachedResponse):
+        await self.backend.set(key, entry)
+
+    async def invalidate_all(self):
+        """A movie's own data changed, which can show up in any list"""
+        await self.backend.bump("movies")
+
+    async def invalidate_watchlist(self, username: str, watched_status: str):
+        """A user's watchlist entry was written with watched_status"""
+        for group in (
+            list_group("all", None),
+            list_group("my", username),
+            list_group(watched_status, username),
+        ):
+            await self.backend.bump(group)
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.backend.evictions,
+        }
+
+
+@lru_cache
+def get_response_cache() -> ResponseCache:
+    settings = get_settings()
+    if settings.response_cache_url:
+        # Optional dependency, only needed for a shared cache
+        import redis.asyncio as redis
+
+        client = redis.from_url(settings.response_cache_url)
+        logger.info("Using the shared response cache")
+        return ResponseCache(KeyValueBackend(client, ttl=settings.response_cache_ttl))
+    return ResponseCache(
+        MemoryBackend(maxsize=settings.response_cache_size, ttl=settings.response_cache_local_ttl)
+    )
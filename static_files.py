@@ -0,0 +1,156 @@
+import gzip
+import os
+import re
+from mimetypes import guess_type
+from typing import Optional
+
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+from starlette.types import Scope
+
+from logging_config import setup_logger
+
+try:
+    import brotli
+except ImportError:  # optional, gzip only without it; api_responses uses this import too
+    brotli = None
+
+logger = setup_logger()
+
+# Static frontend files served with precompressed variants and cache headers.
+# At startup every compressible file gets .br/.gz variants: a sibling file if
+# the build already wrote one, else one compressed into cache_dir (rebuilt only
+# when the source is newer). Requests pick a variant through Accept-Encoding.
+# Fingerprinted build assets (assets/name-<hash>.js) never change under their
+# name and are cached for a year; everything else is revalidated with its ETag.
+
+COMPRESSIBLE = {".js", ".mjs", ".css", ".html", ".svg", ".json", ".map", ".txt", ".xml", ".ico"}
+MIN_COMPRESS_BYTES = 1024
+# Vite (Rollup) names build assets [name]-[hash] with an 8 character base64url hash
+FINGERPRINTED = re.compile(r"^assets/.+-[A-Za-z0-9_-]{8}\.\w+$")
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+# preferred first; suffix of the variant file
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+
+def accepted_encodings(accept_encoding: str) -> set:
+    """Codings the client accepts, from an Accept-Encoding header with q-values"""
+    accepted = set()
+    for item in accept_encoding.split(","):
+        coding, _, params = item.strip().partition(";")
+        quality = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if coding and quality > 0:
+            accepted.add(coding.strip().lower())
+    if "*" in accepted:
+        accepted.update(coding for coding, _ in ENCODINGS)
+    return accepted
+
+
+def cache_control(relative_path: str) -> str:
+    return IMMUTABLE if FINGERPRINTED.match(relative_path) else REVALIDATE
+
+
+def _compress(source: str, target: str, coding: str) -> bool:
+    """Write the compressed file, unless compressing does not make it smaller"""
+    with open(source, "rb") as file:
+        data = file.read()
+    if coding == "br":
+        compressed = brotli.compress(data, quality=11)
+    else:
+        compressed = gzip.compress(data, compresslevel=9, mtime=0)
+    if len(compressed) >= len(data):
+        return False
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    with open(target + ".tmp", "wb") as file:
+        file.write(compressed)
+    os.replace(target + ".tmp", target)
+    return True
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    def __init__(self, *, directory: str, cache_dir: Optional[str] = None, **kwargs):
+        super().__init__(directory=directory, **kwargs)
+        # lookup_path resolves symlinks, so paths are taken relative to the real directory
+        self.root = os.path.realpath(directory)
+        self.cache_dir = cache_dir
+        # relative path -> {coding: path of the compressed variant}
+        self.variants: dict[str, dict[str, str]] = {}
+
+    def precompress(self) -> int:
+        """Find or build the compressed variants; blocking, run it off the event loop"""
+        variants = {}
+        built = 0
+        codings = [(c, s) for c, s in ENCODINGS if c != "br" or brotli is not None]
+        for root, dirs, files in os.walk(self.root):
+            dirs[:] = [d for d in dirs if d != "node_modules" and not d.startswith(".")]
+            for name in files:
+                source = os.path.join(root, name)
+                if os.path.splitext(name)[1] not in COMPRESSIBLE:
+                    continue
+                stat_result = os.stat(source)
+                if stat_result.st_size < MIN_COMPRESS_BYTES:
+                    continue
+                relative = os.path.relpath(source, self.root).replace(os.sep, "/")
+                found = {}
+                for coding, suffix in codings:
+                    if os.path.isfile(source + suffix):
+                        found[coding] = source + suffix
+                    elif self.cache_dir:
+                        target = os.path.join(self.cache_dir, relative + suffix)
+                        fresh = (
+                            os.path.isfile(target)
+                            and os.stat(target).st_mtime >= stat_result.st_mtime
+                        )
+                        if not fresh:
+                            if not _compress(source, target, coding):
+                                continue
+                            built += 1
+                        found[coding] = target
+                if found:
+                    variants[relative] = found
+        self.variants = variants
+        logger.info(
+            "Static files: %s compressed variants for %s files (%s built)",
+            sum(len(found) for found in variants.values()), len(variants), built,
+        )
+        return built
+
+    def file_response(
+        self, full_path, stat_result: os.stat_result, scope: Scope, status_code: int = 200
+    ) -> Response:
+        request_headers = Headers(scope=scope)
+        relative = os.path.relpath(full_path, self.root).replace(os.sep, "/")
+        headers = {"Cache-Control": cache_control(relative)}
+
+        found = self.variants.get(relative)
+        response = None
+        if found:
+            headers["Vary"] = "Accept-Encoding"
+            accepted = accepted_encodings(request_headers.get("accept-encoding", ""))
+            for coding, _ in ENCODINGS:
+                path = found.get(coding)
+                if coding in accepted and path:
+                    # the ETag comes from the variant, so each encoding has its own
+                    response = FileResponse(
+                        path, status_code=status_code, headers=headers,
+                        media_type=guess_type(str(full_path))[0] or "text/plain",
+                        stat_result=os.stat(path),
+                    )
+                    response.headers["Content-Encoding"] = coding
+                    break
+        if response is None:
+            response = FileResponse(
+                full_path, status_code=status_code, stat_result=stat_result, headers=headers
+            )
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
@@ -0,0 +1,86 @@
+# test_api_responses.py
+import zlib
+from datetime import datetime
+
+from bson import ObjectId
+from fastapi import FastAPI, Response
+from fastapi.responses import StreamingResponse
+from starlette.testclient import TestClient
+
+from api_responses import CompressionMiddleware, FastJSONResponse, _Compressor
+
+app = FastAPI(default_response_class=FastJSONResponse)
+app.add_middleware(CompressionMiddleware, minimum_size=100)
+
+
+@app.get("/small")
+async def small():
+    return {"id": ObjectId("6634f1c2a1b2c3d4e5f60718"), "date": datetime(2025, 5, 7, 12, 30)}
+
+
+@app.get("/large")
+async def large():
+    return [{"title": f"movie {i}"} for i in range(100)]
+
+
+@app.get("/stream")
+async def stream():
+    async def lines():
+        for i in range(50):
+            yield f'{{"title": "movie {i}"}}\n'
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+@app.get("/tagged")
+async def tagged():
+    body = b"[" + b",".join(b'{"title": "movie"}' for _ in range(100)) + b"]"
+    return Response(body, media_type="application/json", headers={"ETag": '"abc"'})
+
+
+client = TestClient(app)
+
+
+def test_fast_json_handles_object_ids_and_datetimes():
+    response = client.get("/small", headers={"Accept-Encoding": "gzip"})
+
+    assert response.json() == {"id": "6634f1c2a1b2c3d4e5f60718", "date": "2025-05-07T12:30:00"}
+    assert "content-encoding" not in response.headers  # under the minimum size
+
+
+def test_large_body_is_compressed_only_when_accepted():
+    compressed = client.get("/large", headers={"Accept-Encoding": "gzip"})
+    plain = client.get("/large", headers={"Accept-Encoding": "identity"})
+
+    assert compressed.headers["content-encoding"] == "gzip"
+    assert compressed.headers["vary"] == "Accept-Encoding"
+    assert int(compressed.headers["content-length"]) < int(plain.headers["content-length"])
+    assert compressed.json() == plain.json()
+
+
+def test_streamed_body_is_compressed_chunk_by_chunk():
+    with client.stream("GET", "/stream", headers={"Accept-Encoding": "gzip"}) as response:
+        assert response.headers["content-encoding"] == "gzip"
+        assert "content-length" not in response.headers
+        raw = b"".join(response.iter_raw())
+
+    lines = zlib.decompress(raw, zlib.MAX_WBITS | 16).decode().splitlines()
+    assert len(lines) == 50
+
+
+def test_compressed_body_gets_a_weak_etag():
+    compressed = client.get("/tagged", headers={"Accept-Encoding": "gzip"})
+    plain = client.get("/tagged", headers={"Accept-Encoding": "identity"})
+
+    assert compressed.headers["etag"] == 'W/"abc"'
+    assert plain.headers["etag"] == '"abc"'
+
+
+def test_streamed_chunks_are_flushed_once_enough_has_come_in():
+    compressor = _Compressor("gzip", 6, 4, flush_size=1000)
+    outputs = [compressor.compress(b'{"title": "movie"}\n') for _ in range(100)]
+    outputs.append(compressor.finish())
+
+    # one flush per 1000 bytes in, instead of one per line
+    assert sum(1 for output in outputs if output) <= 4
+    lines = zlib.decompress(b"".join(outputs), zlib.MAX_WBITS | 16).decode().splitlines()
+    assert len(lines) == 100
@@ -0,0 +1,76 @@
+# test_jwt_auth.py
+import asyncio
+from datetime import timedelta
+
+import jwt
+import pytest
+from fastapi import HTTPException
+
+import jwt_auth
+from jwt_auth import create_access_token, decode_jwt_token
+from my_config import get_settings
+from token_revocation import RevocationList, revoked_tokens, token_key
+
+
+@pytest.fixture(autouse=True)
+def settings(monkeypatch):
+    monkeypatch.setenv("CONNECTION_STRING", "mongodb://localhost:27017")
+    monkeypatch.setenv("SECRET_KEY", "test-secret")
+    get_settings.cache_clear()
+    jwt_auth.token_cache.clear()
+    revoked_tokens.clear()
+    yield
+    get_settings.cache_clear()
+
+
+def test_token_is_verified_once_then_served_from_the_cache(monkeypatch):
+    token = create_access_token({"username": "alice", "role": "AdminUser"})
+    assert decode_jwt_token(token).username == "alice"
+
+    def fail(*args, **kwargs):
+        raise AssertionError("the signature was checked again")
+
+    monkeypatch.setattr(jwt, "decode", fail)
+    assert decode_jwt_token(token).role == "AdminUser"
+
+
+def test_expired_and_revoked_tokens_are_rejected():
+    expired = create_access_token({"username": "alice"}, timedelta(seconds=-5))
+    with pytest.raises(HTTPException) as error:
+        decode_jwt_token(expired)
+    assert error.value.status_code == 401
+
+    token = create_access_token({"username": "bob"})
+    decode_jwt_token(token)
+    revoked_tokens.add(token_key(token), float("inf"))
+    with pytest.raises(HTTPException):
+        decode_jwt_token(token)
+
+
+def test_revocation_list_forgets_expired_tokens_without_a_sync():
+    now = [0.0]
+    revocations = RevocationList(clock=lambda: now[0])
+    revocations.add("old", 10)
+    revocations.add("new", 50)
+
+    now[0] = 20
+    revocations.add("newer", 60)
+    assert "old" not in revocations
+    assert len(revocations) == 2
+
+
+def test_stream_user_comes_from_a_ticket_not_a_token(monkeypatch):
+    """A bearer token in the query string would be logged; only tickets open streams"""
+    tickets = {"ticket-1": {"username": "alice", "role": "AdminUser"}}
+
+    async def redeem(ticket):
+        return tickets.pop(ticket, None)
+
+    monkeypatch.setattr(jwt_auth, "redeem_stream_ticket", redeem)
+
+    user = asyncio.run(jwt_auth.get_stream_user("ticket-1"))
+    assert (user.username, user.role) == ("alice", "AdminUser")
+    with pytest.raises(HTTPException):
+        asyncio.run(jwt_auth.get_stream_user("ticket-1"))
+    with pytest.raises(HTTPException):
+        asyncio.run(jwt_auth.get_stream_user(create_access_token({"username": "alice"})))
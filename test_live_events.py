@@ -0,0 +1,88 @@
+# test_live_events.py
+import asyncio
+import os
+
+import pytest
+from bson import ObjectId
+
+from live_events import RESYNC, ChangeFeed, LiveEvent, event_from_change
+
+
+def change(collection, operation, document=None, key=None, token="t1"):
+    return {
+        "_id": {"_data": token},
+        "ns": {"coll": collection},
+        "operationType": operation,
+        "documentKey": {"_id": key or ObjectId()},
+        "fullDocument": document,
+    }
+
+
+def test_watchlist_changes_only_reach_their_owner():
+    event = event_from_change(
+        change("watchlist", "update", {"watched_id": "m1", "user_id": "alice"})
+    )
+
+    assert event.movie_id == "m1"
+    assert event.visible_to("alice") and not event.visible_to("bob")
+
+
+def test_review_deletes_are_covered_by_the_movie_delete():
+    movie_id = ObjectId()
+
+    assert event_from_change(change("reviews", "delete")) is None
+    assert event_from_change(change("movies", "delete", key=movie_id)).movie_id == str(movie_id)
+
+
+def test_slow_subscriber_gets_one_resync_instead_of_a_full_queue():
+    feed = ChangeFeed()
+    subscriber = feed.subscribe("alice", queue_size=2)
+    for i in range(5):
+        feed.publish(LiveEvent(f"t{i}", "movies", "update", "m1"))
+
+    assert subscriber.queue.qsize() == 1
+    assert subscriber.queue.get_nowait() is RESYNC
+    assert feed.overflows == 1
+
+
+def test_reconnect_replays_events_after_last_event_id():
+    feed = ChangeFeed()
+    for i in range(3):
+        owner = "alice" if i else "bob"
+        feed.publish(LiveEvent(f"t{i}", "watchlist", "update", "m1", user_id=owner))
+
+    subscriber = feed.subscribe("alice", queue_size=10, last_event_id="t0")
+    assert [subscriber.queue.get_nowait().id for _ in range(2)] == ["t1", "t2"]
+
+    stale = feed.subscribe("alice", queue_size=10, last_event_id="gone")
+    assert stale.queue.get_nowait() is RESYNC
+
+
+@pytest.mark.skipif(
+    not os.environ.get("TEST_REPLICA_SET_URL"),
+    reason="needs a replica set: TEST_REPLICA_SET_URL=mongodb://localhost:27017/?replicaSet=rs0",
+)
+def test_change_stream_against_a_replica_set():
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    async def run():
+        client = AsyncIOMotorClient(os.environ["TEST_REPLICA_SET_URL"])
+        db = client["MovieTrackerLiveEventsTest"]
+        feed = ChangeFeed()
+        subscriber = feed.subscribe("alice", queue_size=10)
+        feed.start(db)
+        try:
+            for _ in range(50):
+                if feed.available:
+                    break
+                await asyncio.sleep(0.1)
+            result = await db["movies"].insert_one({"title": "Live"})
+            event = await asyncio.wait_for(subscriber.queue.get(), 10)
+            assert (event.collection, event.operation) == ("movies", "insert")
+            assert event.movie_id == str(result.inserted_id)
+        finally:
+            await feed.stop()
+            await client.drop_database(db.name)
+            client.close()
+
+    asyncio.run(run())
@@ -0,0 +1,32 @@
+import json
+import logging
+import queue
+
+from logging_config import DroppingQueueHandler, JsonFormatter
+
+
+def make_record(msg, *args, **extra):
+    record = logging.makeLogRecord({"name": "movie_app", "levelname": "INFO", "msg": msg, "args": args})
+    record.__dict__.update(extra)
+    return record
+
+
+def test_json_formatter_builds_message_and_keeps_extra_fields():
+    record = make_record("Movie '%s' added by '%s'", "Alien", "ann", movie_id="abc")
+
+    entry = json.loads(JsonFormatter().format(record))
+
+    assert entry["message"] == "Movie 'Alien' added by 'ann'"
+    assert entry["level"] == "INFO"
+    assert entry["movie_id"] == "abc"
+
+
+def test_queue_handler_defers_formatting_and_drops_when_full():
+    handler = DroppingQueueHandler(queue.Queue(maxsize=1))
+
+    handler.emit(make_record("first %s", 1))
+    handler.emit(make_record("second %s", 2))
+
+    queued = handler.queue.get_nowait()
+    assert queued.msg == "first %s" and queued.args == (1,)
+    assert handler.dropped == 1
@@ -0,0 +1,61 @@
+import asyncio
+
+import httpx
+
+import metrics
+from metrics import (
+    Histogram,
+    MetricsMiddleware,
+    current_request,
+    mongo_command_timer,
+)
+
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = Histogram("latency_seconds", "Latency", (0.1, 1))
+    histogram.observe(0.05, route="/a")
+    histogram.observe(0.5, route="/a")
+    histogram.observe(3, route="/a")
+
+    lines = list(histogram.render())
+
+    assert 'latency_seconds_bucket{route="/a",le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{route="/a",le="1"} 2' in lines
+    assert 'latency_seconds_bucket{route="/a",le="+Inf"} 3' in lines
+    assert 'latency_seconds_count{route="/a"} 3' in lines
+
+
+def test_command_listener_sees_the_request_context():
+    """Motor runs pymongo, and so the listeners, in a copy of the caller's context"""
+    from motor.frameworks import asyncio as motor_asyncio
+
+    async def scenario():
+        stats = metrics.RequestStats()
+        current_request.set(stats)
+        loop = asyncio.get_running_loop()
+        await motor_asyncio.run_on_executor(loop, mongo_command_timer._record, "find", 1500)
+        return stats.commands
+
+    assert asyncio.run(scenario()) == [("find", 1.5)]
+
+
+def test_middleware_adds_server_timing_and_warns_over_budget(monkeypatch):
+    async def app(scope, receive, send):
+        # stands in for an endpoint running three Mongo commands
+        for _ in range(3):
+            mongo_command_timer._record("find", 1500)
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+
+    warnings = []
+    monkeypatch.setattr(metrics.logger, "warning", lambda *args: warnings.append(args))
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=MetricsMiddleware(app, op_budget=2))
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.get("/anything")
+
+    response = asyncio.run(scenario())
+
+    assert response.headers["server-timing"].startswith('mongo;dur=4.5;desc="3 ops"')
+    assert warnings and warnings[0][3] == 3
@@ -0,0 +1,81 @@
+import asyncio
+from datetime import datetime
+
+from movie_bulk import csv_lines, csv_rows, iter_lines, ndjson_rows, row_documents
+from movie_model import RequestMovieWithWatchStatusAndReview
+
+
+async def chunks(*parts: bytes):
+    for part in parts:
+        yield part
+
+
+async def collect(iterator):
+    return [item async for item in iterator]
+
+
+def test_iter_lines_joins_lines_split_across_chunks():
+    lines = asyncio.run(collect(iter_lines(chunks(b'{"a": 1}\n{"b"', b": 2}\r\n", b"last"))))
+
+    assert lines == ['{"a": 1}', '{"b": 2}', "last"]
+
+
+def test_ndjson_rows_reports_invalid_lines_by_row_number():
+    lines = iter_lines(chunks(b'{"a": 1}\n\nnot json\n'))
+
+    rows = asyncio.run(collect(ndjson_rows(lines)))
+
+    assert rows[0] == (1, {"a": 1})
+    assert rows[1][0] == 2 and rows[1][1].startswith("Invalid JSON")
+
+
+def test_csv_rows_nests_columns_and_keeps_multiline_fields():
+    body = (
+        b"title,comment,watched_status,rating,review\n"
+        b'Alien,"scary,\nvery",watched,5,great\n'
+        b"Heat,,not_watched\n"
+    )
+
+    rows = asyncio.run(collect(csv_rows(iter_lines(chunks(body)))))
+
+    number, row = rows[0]
+    assert number == 1
+    assert row["movie"] == {"title": "Alien", "comment": "scary,\nvery"}
+    assert row["review"] == {"rating": "5", "review": "great"}
+    assert rows[1] == (2, "Expected 5 columns, got 3")
+
+
+def test_exported_rows_read_back_as_the_same_rows():
+    exported = {
+        "movie": {"title": 'Say "hi"', "comment": "a,b"},
+        "watchlist": {"watched_status": "watched"},
+        "review": {"rating": 4, "review": "ok"},
+    }
+
+    async def rows():
+        yield exported
+
+    async def round_trip():
+        body = "".join(await collect(csv_lines(rows()))).encode()
+        return await collect(csv_rows(iter_lines(chunks(body))))
+
+    [(_, parsed)] = asyncio.run(round_trip())
+
+    payload = RequestMovieWithWatchStatusAndReview.model_validate(parsed)
+    assert payload.model_dump() == exported
+
+
+def test_row_documents_link_review_and_watchlist_to_the_movie():
+    payload = RequestMovieWithWatchStatusAndReview.model_validate(
+        {
+            "movie": {"title": "Amélie"},
+            "watchlist": {"watched_status": "watched"},
+            "review": {"rating": 3},
+        }
+    )
+
+    movie, review, watchlist = row_documents(payload, "ann", datetime(2024, 1, 1))
+
+    assert movie["title_normalized"] == "amelie"
+    assert movie["rating_histogram"] == {"3": 1}
+    assert review["movie_id"] == watchlist["_id"] == watchlist["watched_id"] == str(movie["_id"])
@@ -0,0 +1,148 @@
+# test_movie_queries.py
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+
+from movie_queries import (
+    InvalidCursor,
+    ListOptions,
+    all_movies_pipeline,
+    decode_cursor,
+    encode_cursor,
+    movie_detail_pipeline,
+    search_pipeline,
+    watchlist_movies_pipeline,
+)
+
+
+def test_watchlist_pipeline_filters_before_joining():
+    """The watchlist filter must be the first stage so it can use an index"""
+    pipeline = watchlist_movies_pipeline({"user_id": "alice", "watched_status": "watched"})
+
+    assert pipeline[0] == {"$match": {"user_id": "alice", "watched_status": "watched"}}
+    lookups = [stage["$lookup"]["from"] for stage in pipeline if "$lookup" in stage]
+    assert lookups == ["movies", "reviews"]
+
+
+def test_fallback_pipeline_dedupes_movies():
+    """Status-only listings span several users and must list each movie once"""
+    pipeline = watchlist_movies_pipeline({"watched_status": "watched"}, dedupe=True)
+
+    assert "$group" in pipeline[1]
+    assert pipeline[1]["$group"]["_id"] == "$watched_id"
+
+
+def test_pipelines_project_movie_response_shape():
+    """Both pipelines end in a projection onto the MovieResponse fields"""
+    for pipeline in [all_movies_pipeline(), watchlist_movies_pipeline({})]:
+        projection = pipeline[-1]["$project"]
+        assert set(projection) == {
+            "_id", "id", "title", "comment", "added_by", "date_added",
+            "review", "rating", "average_rating", "review_count",
+            "watched_status", "page_key",
+        }
+
+
+def test_cursor_round_trip():
+    """Cursors decode back to the (date_added, _id) pair they were built from"""
+    date_added = datetime(2025, 5, 7, 12, 30, 15, 123000)
+    cursor = encode_cursor(date_added, "6634f1c2a1b2c3d4e5f60718")
+
+    assert decode_cursor(cursor) == (date_added, "6634f1c2a1b2c3d4e5f60718")
+
+
+def test_malformed_cursor_is_rejected():
+    with pytest.raises(InvalidCursor):
+        decode_cursor("not-a-cursor")
+
+
+def test_paged_pipeline_sorts_and_limits_before_joining():
+    """Paging happens on the watchlist rows, before any $lookup"""
+    after = (datetime(2025, 5, 7), "abc")
+    pipeline = watchlist_movies_pipeline({"user_id": "alice"}, after=after, limit=20)
+
+    assert pipeline[1]["$match"]["$or"][1] == {"date_added": after[0], "_id": {"$gt": "abc"}}
+    assert pipeline[2] == {"$sort": {"date_added": 1, "_id": 1}}
+    assert pipeline[3] == {"$limit": 21}
+
+
+def test_detail_pipeline_only_embeds_the_callers_rows():
+    """The detail lookup joins only the caller's review and watchlist entry"""
+    movie_oid = ObjectId()
+    pipeline = movie_detail_pipeline(movie_oid, "alice")
+
+    assert pipeline[0] == {"$match": {"_id": movie_oid}}
+    for stage in pipeline:
+        if "$lookup" in stage:
+            assert stage["$lookup"]["pipeline"][0] == {"$match": {"user_id": "alice"}}
+
+
+def test_prefix_search_uses_anchored_normalized_pattern():
+    """Prefix search matches the start of the normalized title, so it can use the index"""
+    pipeline = search_pipeline("Amélie (2001", "prefix", offset=0, limit=10)
+
+    assert pipeline[0] == {"$match": {"title_normalized": {"$regex": r"^amelie\ \(2001"}}}
+    assert pipeline[2:4] == [{"$skip": 0}, {"$limit": 10}]
+
+
+def test_text_search_is_ranked_by_score():
+    pipeline = search_pipeline("space", "text", offset=20, limit=10)
+
+    assert pipeline[0] == {"$match": {"$text": {"$search": "space"}}}
+    assert pipeline[1] == {"$sort": {"score": {"$meta": "textScore"}, "_id": 1}}
+    assert pipeline[2] == {"$skip": 20}
+
+
+def test_all_listing_filters_and_sorts_before_the_page_is_cut():
+    """Filters and the sort run on the movies collection, ahead of $limit and the joins"""
+    options = ListOptions(sort="-rating", min_rating=3, added_by="alice")
+    after = (4.5, "6634f1c2a1b2c3d4e5f60718")
+    pipeline = all_movies_pipeline(after=after, limit=20, options=options)
+
+    assert pipeline[0] == {"$match": {"rating_average": {"$gte": 3}, "added_by": "alice"}}
+    assert pipeline[1]["$match"]["$or"][0] == {"rating_average": {"$lt": 4.5}}
+    assert pipeline[2] == {"$sort": {"rating_average": -1, "_id": -1}}
+    assert pipeline[3] == {"$limit": 21}
+
+
+def test_watchlist_sorted_by_title_pages_before_joining():
+    """The rows carry the sort and filter fields, so only the page is joined"""
+    options = ListOptions(sort="-title", min_rating=3, date_from=datetime(2025, 1, 1))
+    pipeline = watchlist_movies_pipeline({"user_id": "alice"}, limit=20, options=options)
+
+    assert pipeline[0] == {
+        "$match": {
+            "user_id": "alice",
+            "rating_average": {"$gte": 3},
+            "date_added": {"$gte": datetime(2025, 1, 1)},
+        }
+    }
+    stages = [next(iter(stage)) for stage in pipeline]
+    assert stages.index("$limit") < stages.index("$lookup")
+    assert {"$sort": {"title_normalized": -1, "_id": -1}} in pipeline
+    # the date shown is the row's, the one the list is bounded by
+    assert pipeline[-1]["$project"]["date_added"] == "$date_added"
+
+
+def test_listing_restricted_to_ids_keeps_the_list_projection():
+    """Refreshing one row runs the listing itself, so the row has the list's shape"""
+    movie_id = "6634f1c2a1b2c3d4e5f60718"
+    options = ListOptions(movie_ids=(movie_id, "not-an-id"))
+
+    assert all_movies_pipeline(options=options)[0] == {
+        "$match": {"_id": {"$in": [ObjectId(movie_id)]}}
+    }
+    pipeline = watchlist_movies_pipeline({"user_id": "alice"}, options=options)
+    assert pipeline[0] == {
+        "$match": {"user_id": "alice", "watched_id": {"$in": [movie_id, "not-an-id"]}}
+    }
+    assert options.cache_key() != ListOptions().cache_key()
+
+
+def test_cursor_is_tied_to_its_sort():
+    cursor = encode_cursor("amelie", "6634f1c2a1b2c3d4e5f60718", sort="title")
+
+    assert decode_cursor(cursor, "title") == ("amelie", "6634f1c2a1b2c3d4e5f60718")
+    with pytest.raises(InvalidCursor):
+        decode_cursor(cursor, "-title")
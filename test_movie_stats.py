@@ -0,0 +1,96 @@
+# test_movie_stats.py
+import asyncio
+from datetime import datetime
+
+from bson import ObjectId
+
+import movie_stats
+from db_context import stale_duplicates
+from movie_stats import initial_stats, merge_deltas, rating_delta, stats_update, upsert_reviews
+
+
+def test_new_review_increments_stats():
+    assert merge_deltas([rating_delta(None, 4)]) == {
+        "rating_sum": 4,
+        "rating_count": 1,
+        "rating_histogram.4": 1,
+    }
+
+
+def test_changed_rating_moves_histogram_bucket():
+    """Test that changing a rating keeps the count and moves one histogram entry"""
+    assert merge_deltas([rating_delta(2, 5)]) == {
+        "rating_sum": 3,
+        "rating_histogram.2": -1,
+        "rating_histogram.5": 1,
+    }
+
+
+def test_unchanged_rating_is_a_no_op():
+    assert merge_deltas([rating_delta(3, 3)]) == {}
+
+
+def test_deltas_for_several_reviews_merge_into_one_inc():
+    """An admin edit writes two reviews; both land in a single $inc"""
+    inc = merge_deltas([rating_delta(None, 4), rating_delta(1, 4)])
+
+    assert inc == {
+        "rating_sum": 7,
+        "rating_count": 1,
+        "rating_histogram.4": 2,
+        "rating_histogram.1": -1,
+    }
+
+
+def test_initial_stats():
+    assert initial_stats(None) == {
+        "rating_sum": 0, "rating_count": 0, "rating_histogram": {}, "rating_average": 0
+    }
+    assert initial_stats(0) == {
+        "rating_sum": 0, "rating_count": 1, "rating_histogram": {"0": 1}, "rating_average": 0.0
+    }
+
+
+def test_stats_update_recomputes_the_average_after_the_increments():
+    """The average is set in a second stage so it reads the incremented totals"""
+    pipeline = stats_update({"rating_sum": 3, "rating_histogram.5": 1})
+
+    assert pipeline[0]["$set"]["rating_histogram.5"] == {
+        "$add": [{"$ifNull": ["$rating_histogram.5", 0]}, 1]
+    }
+    assert list(pipeline[1]["$set"]) == ["rating_average"]
+
+
+def test_latest_duplicate_review_is_kept():
+    """Before the unique index is built, all but the latest review of a user go"""
+    reviews = [
+        {"u": datetime(2025, 1, 2), "i": ObjectId()},
+        {"u": None, "i": ObjectId()},  # written before updated_at existed
+        {"u": datetime(2025, 1, 3), "i": ObjectId()},
+    ]
+
+    assert stale_duplicates(reviews) == [reviews[0]["i"], reviews[1]["i"]]
+
+
+class FakeReviews:
+    def __init__(self, documents):
+        self.documents = documents
+        self.writes = []
+
+    async def find(self, query, projection=None, session=None):
+        for document in self.documents:
+            if document["user_id"] in query["user_id"]["$in"]:
+                yield document
+
+    async def bulk_write(self, requests, ordered=True, session=None):
+        self.writes.append(requests)
+
+
+def test_reviews_of_an_admin_edit_are_read_once_and_written_in_one_bulk(monkeypatch):
+    reviews = FakeReviews([{"user_id": "bob", "rating": 2}, {"user_id": "carol", "rating": 5}])
+    monkeypatch.setattr(movie_stats.Review, "get_motor_collection", lambda: reviews)
+
+    old_ratings = asyncio.run(upsert_reviews("m1", ["admin", "bob"], 4, "Good"))
+
+    assert old_ratings == [None, 2]
+    assert len(reviews.writes) == 1 and len(reviews.writes[0]) == 2
@@ -0,0 +1,64 @@
+# test_movie_sync.py
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+import movie_sync
+from movie_model import TOMBSTONE_RETENTION_SECONDS, MovieResponse, utc_now
+from movie_queries import InvalidCursor
+from movie_sync import decode_sync_token, encode_sync_token, fetch_changes
+
+
+def test_sync_token_round_trip():
+    started = utc_now()
+    assert decode_sync_token(encode_sync_token(started)) == started
+
+
+@pytest.mark.parametrize("token", ["not-a-token", encode_sync_token(datetime(2025, 1, 1))])
+def test_malformed_or_naive_sync_token_is_rejected(token):
+    with pytest.raises(InvalidCursor):
+        decode_sync_token(token)
+
+
+def test_first_sync_and_expired_token_ask_for_a_resync():
+    """Without a token, or with one older than the tombstones, nothing is queried"""
+    expired = encode_sync_token(utc_now() - timedelta(seconds=TOMBSTONE_RETENTION_SECONDS + 60))
+    for since in (None, expired):
+        changes = asyncio.run(fetch_changes(since, "alice"))
+        assert changes.resync and changes.changed == [] and changes.deleted == []
+        assert decode_sync_token(changes.token) <= utc_now()
+
+
+def test_changed_movies_are_run_through_the_synced_list(monkeypatch):
+    """Rows come from the listing; changed movies it does not return are removed"""
+    queries = []
+
+    async def changed_values(model, query, field, limit):
+        queries.append(query)
+        return {"Movie": ["m1", "m2"], "MovieTombstone": ["m3"]}.get(model.__name__, [])
+
+    async def fetch_movie_list(watched_status, username, options):
+        assert (watched_status, username) == ("watched", "alice")
+        assert options.movie_ids == ("m1", "m2")
+        return [MovieResponse(id="m1", title="Amelie", added_by="bob")], None
+
+    monkeypatch.setattr(movie_sync, "_changed_values", changed_values)
+    monkeypatch.setattr(movie_sync, "fetch_movie_list", fetch_movie_list)
+    since = encode_sync_token(utc_now())
+    changes = asyncio.run(fetch_changes(since, "alice", "watched"))
+
+    assert [row.id for row in changes.changed] == ["m1"]
+    assert (changes.removed, changes.deleted) == (["m2"], ["m3"])
+    assert {"user_id": "alice"}.items() <= queries[2].items()
+
+
+def test_limit_applies_to_all_changes_together(monkeypatch):
+    async def changed_values(model, query, field, limit):
+        # each source alone stays within the limit
+        return [f"{model.__name__}{i}" for i in range(limit)]
+
+    monkeypatch.setattr(movie_sync, "_changed_values", changed_values)
+    changes = asyncio.run(fetch_changes(encode_sync_token(utc_now()), "alice", limit=3))
+
+    assert changes.resync and changes.changed == []
@@ -0,0 +1,30 @@
+import asyncio
+
+import orphan_gc
+from orphan_gc import GcRunner
+
+
+def test_runner_refuses_a_second_run_while_one_is_running(monkeypatch):
+    async def scenario():
+        done = asyncio.Event()
+
+        async def fake_collect(progress, batch_size):
+            await done.wait()
+            progress.status = "done"
+            return progress
+
+        monkeypatch.setattr(orphan_gc, "collect_orphans", fake_collect)
+        runner = GcRunner()
+
+        assert runner.start() is True
+        assert runner.start() is False
+        assert runner.progress.status == "running"
+
+        done.set()
+        await runner._task
+        assert runner.progress.status == "done"
+        assert runner.start() is True
+        done.set()
+        await runner._task
+
+    asyncio.run(scenario())
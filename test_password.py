@@ -1,6 +1,9 @@
 # test_password.py
+import asyncio
+
 import pytest
-from jwt_auth import verify_password, get_password_hash
+from jwt_auth import verify_password, get_password_hash, pwd_context
+from password_hasher import PasswordHasher
 
 def test_password_hashing_and_verification():
     """Test that password hashing and verification work correctly"""
@@ -34,4 +37,27 @@ def test_password_hashing_and_verification():
     assert verify_password(special_password, special_hashed) == True
     assert verify_password("regular", special_hashed) == False
 
+def test_async_hasher_matches_sync_functions():
+    """Test that hashes made on the thread pool verify both ways"""
+
+    async def run():
+        hasher = PasswordHasher(pwd_context, max_workers=2)
+        try:
+            hashed, other = await asyncio.gather(
+                hasher.hash("test_password"), hasher.hash("other_password")
+            )
+            assert verify_password("test_password", hashed) == True
+            assert await hasher.verify("other_password", other) == True
+            assert await hasher.verify("wrong_password", get_password_hash("x")) == False
+            return hasher.stats()
+        finally:
+            hasher.shutdown()
+
+    stats = asyncio.run(run())
+
+    # All work finished and nothing is left queued
+    assert stats["completed"] == 4
+    assert stats["waiting"] == 0
+    assert stats["in_flight"] == 0
+
 # Run the test with: pytest test_password.py -v
\ No newline at end of file
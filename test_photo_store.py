@@ -0,0 +1,98 @@
+# test_photo_store.py
+import asyncio
+import base64
+from io import BytesIO
+
+import pytest
+from PIL import Image
+
+import photo_store
+from photo_store import InvalidPhoto, is_photo_digest, photo_digest, prepare_photo
+
+
+def make_image(size, image_format):
+    output = BytesIO()
+    Image.new("RGB", size, color=(200, 30, 30)).save(output, format=image_format)
+    return output.getvalue()
+
+
+def test_large_photo_is_downscaled():
+    """Test that photos larger than the limit are shrunk, keeping the aspect ratio"""
+    contents, content_type = prepare_photo(make_image((4000, 2000), "PNG"), 1000)
+
+    assert content_type == "image/png"
+    assert Image.open(BytesIO(contents)).size == (1000, 500)
+
+
+def test_small_photo_is_kept_as_is():
+    original = make_image((640, 480), "JPEG")
+    contents, content_type = prepare_photo(original, 1000)
+
+    assert contents == original
+    assert content_type == "image/jpeg"
+
+
+def test_non_image_is_rejected():
+    with pytest.raises(InvalidPhoto):
+        prepare_photo(b"definitely not an image", 1000)
+
+
+def test_digest_is_content_addressed():
+    digest = photo_digest(b"same bytes")
+
+    assert digest == photo_digest(b"same bytes")
+    assert is_photo_digest(digest)
+    assert not is_photo_digest("../../etc/passwd")
+
+
+def test_unreadable_legacy_photo_is_kept_and_marked(monkeypatch):
+    """A legacy photo that cannot be read is not unset, and not retried at every startup"""
+    webp = base64.b64encode(make_image((10, 10), "WEBP")).decode()
+    users = [
+        {"_id": 1, "photo": "data:image/webp;base64,UklGRg=="},
+        {"_id": 2, "photo": "data:image/webp;base64," + webp},
+    ]
+    updates = []
+    saved = []
+
+    class Collection:
+        async def find(self, query, projection):
+            assert query["photo_unreadable"] == {"$ne": True}
+            for user in users:
+                yield user
+
+        async def update_one(self, query, update):
+            updates.append((query["_id"], update))
+
+    async def save_photo(contents, content_type):
+        saved.append(content_type)
+        return "digest"
+
+    monkeypatch.setattr(photo_store.User, "get_motor_collection", lambda: Collection())
+    monkeypatch.setattr(photo_store, "save_photo", save_photo)
+    asyncio.run(photo_store.migrate_legacy_photos(1000))
+
+    assert updates == [
+        (1, {"$set": {"photo_unreadable": True}}),
+        (2, {"$set": {"photo_id": "digest"}, "$unset": {"photo": ""}}),
+    ]
+    assert saved == ["image/jpeg"]
+
+
+def test_other_formats_are_reencoded():
+    contents, content_type = prepare_photo(make_image((64, 32), "BMP"), 1000)
+
+    assert content_type == "image/jpeg"
+    assert Image.open(BytesIO(contents)).size == (64, 32)
+
+
+def test_tiny_file_with_a_huge_canvas_is_rejected():
+    """A 20000x20000 PNG compresses to a few KB but would decode to 1.6 GB"""
+    output = BytesIO()
+    Image.new("1", (20000, 20000)).save(output, format="PNG")
+    assert len(output.getvalue()) < 100 * 1024
+
+    with pytest.raises(InvalidPhoto):
+        prepare_photo(output.getvalue(), 1000)
+    with pytest.raises(InvalidPhoto):
+        prepare_photo(make_image((3100, 3100), "PNG"), 1000)  # under Pillow's own limit
@@ -0,0 +1,28 @@
+from pymongo import monitoring
+
+from pool_monitor import PoolGauges
+
+ADDRESS = ("localhost", 27017)
+
+
+def test_gauges_track_open_in_use_and_waiting_connections():
+    gauges = PoolGauges()
+
+    gauges.connection_created(monitoring.ConnectionCreatedEvent(ADDRESS, 1))
+    gauges.connection_check_out_started(monitoring.ConnectionCheckOutStartedEvent(ADDRESS))
+    gauges.connection_check_out_started(monitoring.ConnectionCheckOutStartedEvent(ADDRESS))
+    gauges.connection_checked_out(monitoring.ConnectionCheckedOutEvent(ADDRESS, 1, 0.002))
+
+    server = gauges.stats()["localhost:27017"]
+    assert (server["open"], server["in_use"], server["waiting"]) == (1, 1, 1)
+
+    gauges.connection_check_out_failed(
+        monitoring.ConnectionCheckOutFailedEvent(ADDRESS, "timeout", 0.010)
+    )
+    gauges.connection_checked_in(monitoring.ConnectionCheckedInEvent(ADDRESS, 1))
+
+    server = gauges.stats()["localhost:27017"]
+    assert (server["in_use"], server["waiting"]) == (0, 0)
+    assert server["checkout_failures"] == 1
+    assert server["checkout_wait_max_ms"] == 10.0
+    assert server["checkout_wait_mean_ms"] == 6.0
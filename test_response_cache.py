@@ -0,0 +1,110 @@
+# test_response_cache.py
+import asyncio
+
+from response_cache import (
+    CachedResponse,
+    KeyValueBackend,
+    LocalKeyValueStore,
+    MemoryBackend,
+    ResponseCache,
+    make_etag,
+)
+
+
+def cached(body: bytes) -> CachedResponse:
+    return CachedResponse(make_etag(body), body)
+
+
+async def store(cache, watched_status, username, body):
+    key, _ = await cache.get(watched_status, username, "None|None")
+    await cache.set(key, cached(body))
+
+
+def test_hit_after_store_and_miss_after_invalidate_all():
+    async def run():
+        cache = ResponseCache(MemoryBackend())
+        await store(cache, "all", "alice", b"[]")
+
+        _, entry = await cache.get("all", "bob", "None|None")
+        assert entry.body == b"[]"  # "all" is shared between users
+
+        await cache.invalidate_all()
+        _, entry = await cache.get("all", "bob", "None|None")
+        assert entry is None
+        return cache.stats()
+
+    assert asyncio.run(run()) == {"hits": 1, "misses": 2, "evictions": 0}
+
+
+def test_watchlist_invalidation_only_touches_that_users_lists():
+    """Test that a watchlist write drops the user's lists and "all", but not other users' lists"""
+
+    async def run():
+        cache = ResponseCache(MemoryBackend())
+        for watched_status, username in [
+            ("watched", "alice"), ("my", "alice"), ("watched", "bob"), ("all", None),
+        ]:
+            await store(cache, watched_status, username, b"[1]")
+
+        await cache.invalidate_watchlist("alice", "watched")
+
+        results = {}
+        for watched_status, username in [
+            ("watched", "alice"), ("my", "alice"), ("watched", "bob"), ("all", None),
+        ]:
+            _, entry = await cache.get(watched_status, username, "None|None")
+            results[(watched_status, username)] = entry is not None
+        return results
+
+    assert asyncio.run(run()) == {
+        ("watched", "alice"): False,
+        ("my", "alice"): False,
+        ("watched", "bob"): True,
+        ("all", None): False,
+    }
+
+
+def test_memory_backend_counts_evictions():
+    async def run():
+        cache = ResponseCache(MemoryBackend(maxsize=2))
+        for username in ["a", "b", "c"]:
+            await store(cache, "my", username, b"[]")
+        return cache.stats()["evictions"]
+
+    assert asyncio.run(run()) == 1
+
+
+def test_memory_entries_expire_since_other_workers_writes_are_not_seen():
+    now = [0.0]
+
+    async def run():
+        cache = ResponseCache(MemoryBackend(ttl=15, clock=lambda: now[0]))
+        await store(cache, "all", None, b"[]")
+        now[0] = 14
+        _, fresh = await cache.get("all", None, "None|None")
+        now[0] = 15
+        _, expired = await cache.get("all", None, "None|None")
+        return fresh, expired
+
+    fresh, expired = asyncio.run(run())
+    assert fresh is not None and expired is None
+
+
+def test_shared_backend_round_trips_entries():
+    """Test that two caches on the same store see each other's entries and invalidations"""
+
+    async def run():
+        shared = LocalKeyValueStore()
+        first = ResponseCache(KeyValueBackend(shared))
+        second = ResponseCache(KeyValueBackend(shared))
+        await store(first, "my", "alice", b'[{"id": "1"}]')
+
+        _, entry = await second.get("my", "alice", "None|None")
+        assert entry.body == b'[{"id": "1"}]'
+        assert entry.etag == make_etag(b'[{"id": "1"}]')
+
+        await first.invalidate_watchlist("alice", "watched")
+        _, entry = await second.get("my", "alice", "None|None")
+        assert entry is None
+
+    asyncio.run(run())
@@ -0,0 +1,57 @@
+# test_static_files.py
+import gzip
+
+from starlette.applications import Starlette
+from starlette.routing import Mount
+from starlette.testclient import TestClient
+
+from static_files import (
+    IMMUTABLE,
+    REVALIDATE,
+    PrecompressedStaticFiles,
+    accepted_encodings,
+    cache_control,
+)
+
+
+def make_client(tmp_path):
+    (tmp_path / "site" / "assets").mkdir(parents=True)
+    (tmp_path / "site" / "index.html").write_text("<html>" + "movie " * 500 + "</html>")
+    (tmp_path / "site" / "assets" / "index-B4x9kQz1.js").write_text("console.log(1);" * 200)
+    files = PrecompressedStaticFiles(
+        directory=str(tmp_path / "site"), cache_dir=str(tmp_path / "cache")
+    )
+    files.precompress()
+    return TestClient(Starlette(routes=[Mount("/", files)]))
+
+
+def test_accept_encoding_honours_zero_quality():
+    assert accepted_encodings("gzip;q=0, br;q=0.5, identity") == {"br", "identity"}
+
+
+def test_gzip_variant_is_served_and_revalidated(tmp_path):
+    client = make_client(tmp_path)
+
+    response = client.get("/index.html", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.headers["cache-control"] == "no-cache"
+    assert response.text.startswith("<html>movie")
+
+    etag = response.headers["etag"]
+    again = client.get("/index.html", headers={"Accept-Encoding": "gzip", "If-None-Match": etag})
+    assert again.status_code == 304
+
+
+def test_fingerprinted_assets_are_immutable(tmp_path):
+    client = make_client(tmp_path)
+
+    response = client.get("/assets/index-B4x9kQz1.js", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in response.headers
+    assert response.headers["cache-control"] == IMMUTABLE
+    assert gzip.decompress((tmp_path / "cache" / "assets" / "index-B4x9kQz1.js.gz").read_bytes())
+
+
+def test_hyphenated_names_are_not_taken_for_fingerprints():
+    assert cache_control("assets/index-B4x9kQz1.js") == IMMUTABLE
+    assert cache_control("assets/my-component.css") == REVALIDATE
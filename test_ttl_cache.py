@@ -0,0 +1,59 @@
+# test_ttl_cache.py
+from ttl_cache import TTLCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_entries_expire_after_the_ttl():
+    """Test that entries are dropped once their TTL has passed"""
+    clock = FakeClock()
+    cache = TTLCache(maxsize=10, ttl=60, clock=clock)
+    cache.set("alice", "AdminUser")
+
+    clock.now = 59
+    assert cache.get("alice") == "AdminUser"
+
+    clock.now = 60
+    assert cache.get("alice") is None
+    assert cache.stats() == {"size": 0, "hits": 1, "misses": 1, "evictions": 0}
+
+
+def test_entries_can_expire_at_their_own_time():
+    clock = FakeClock()
+    cache = TTLCache(maxsize=10, ttl=60, clock=clock)
+    cache.set("token", "alice", expires_at=100)
+
+    clock.now = 99
+    assert cache.get("token") == "alice"
+    clock.now = 100
+    assert cache.get("token") is None
+
+
+def test_evicts_least_recently_used():
+    cache = TTLCache(maxsize=2)
+    cache.set("alice", "AdminUser")
+    cache.set("bob", "BasicUser")
+
+    # reading alice makes bob the least recently used entry
+    assert cache.get("alice") == "AdminUser"
+    cache.set("carol", "BasicUser")
+
+    assert cache.get("bob") is None
+    assert cache.get("alice") == "AdminUser"
+    assert cache.get("carol") == "BasicUser"
+    assert cache.evictions == 1
+
+
+def test_invalidate():
+    """Test that a change can drop the cached entry right away"""
+    cache = TTLCache(maxsize=10, ttl=60)
+    cache.set("alice", "AdminUser")
+    cache.invalidate("alice")
+
+    assert cache.get("alice") is None
@@ -0,0 +1,30 @@
+# test_user_queries.py
+import pytest
+
+from movie_queries import InvalidCursor
+from user_queries import decode_user_cursor, encode_user_cursor, user_filter, user_list_pipeline
+
+
+def test_prefix_search_escapes_and_anchors():
+    """Prefixes are literal and anchored, so they can walk the unique indexes"""
+    query = user_filter("AdminUser", "a.b", None)
+
+    assert query == {"role": "AdminUser", "username": {"$regex": "^a\\.b"}}
+
+
+def test_cursor_bound_merges_with_prefix():
+    query = user_filter(None, "al", None)
+    pipeline = user_list_pipeline(query, "username", "alice", 10)
+
+    assert pipeline[0] == {"$match": {"username": {"$regex": "^al", "$gt": "alice"}}}
+    assert pipeline[1:3] == [{"$sort": {"username": 1}}, {"$limit": 11}]
+
+
+def test_cursor_is_tied_to_its_ordering():
+    cursor = encode_user_cursor("email", "alice@example.com")
+
+    assert decode_user_cursor(cursor, "email") == "alice@example.com"
+    with pytest.raises(InvalidCursor):
+        decode_user_cursor(cursor, "username")
+    with pytest.raises(InvalidCursor):
+        decode_user_cursor("not-a-cursor", "username")
@@ -0,0 +1,128 @@
+import asyncio
+import hashlib
+import math
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from beanie import Document
+from pymongo import ASCENDING, IndexModel
+
+from logging_config import setup_logger
+
+logger = setup_logger()
+
+# Tokens revoked by logging out. Each worker keeps the hashes of revoked,
+# unexpired tokens in memory, so checking a token is a set lookup. With the
+# store enabled, revocations are also written to Mongo, where a TTL index
+# drops them once the token would have expired anyway, and every worker
+# picks up the others' revocations on its next sync.
+
+
+def token_key(token: str) -> str:
+    """Tokens are never kept as they are, only their sha256"""
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+class RevokedToken(Document):
+    token_hash: str
+    expires_at: datetime
+    revoked_at: datetime
+
+    class Settings:
+        name = "revoked_tokens"
+        indexes = [
+            IndexModel([("token_hash", ASCENDING)], unique=True),
+            # Mongo removes the document once the token has expired
+            IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0),
+            # incremental sync between workers
+            IndexModel([("revoked_at", ASCENDING)]),
+        ]
+
+
+class RevocationList:
+    """
+    token hash -> expiry (epoch seconds) of revoked tokens. add() purges the
+    expired ones once the earliest expiry has passed, so the list stays
+    bounded whether or not the sync loop runs.
+    """
+
+    def __init__(self, clock=time.time):
+        self.clock = clock
+        self._expiry: dict[str, float] = {}
+        self._next_expiry = math.inf
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._expiry
+
+    def __len__(self) -> int:
+        return len(self._expiry)
+
+    def add(self, key: str, expires_at: float):
+        if self._next_expiry <= self.clock():
+            self.purge()
+        self._expiry[key] = expires_at
+        self._next_expiry = min(self._next_expiry, expires_at)
+
+    def purge(self):
+        """Forget tokens that have expired; they fail verification anyway"""
+        now = self.clock()
+        for key in [key for key, expires_at in self._expiry.items() if expires_at <= now]:
+            del self._expiry[key]
+        self._next_expiry = min(self._expiry.values(), default=math.inf)
+
+    def clear(self):
+        self._expiry.clear()
+        self._next_expiry = math.inf
+
+
+revoked_tokens = RevocationList()
+
+# revoked_at of the newest revocation seen by sync_revocations. Each sync
+# reads back a little further to allow for clock skew between workers.
+_synced_until: Optional[datetime] = None
+SYNC_OVERLAP = timedelta(seconds=60)
+
+
+async def revoke_token(token: str, expires_at: float, persist: bool = True):
+    """Revoke a token until it expires; persist writes it to the shared store"""
+    key = token_key(token)
+    revoked_tokens.add(key, expires_at)
+    if persist:
+        await RevokedToken.get_motor_collection().update_one(
+            {"token_hash": key},
+            {
+                "$setOnInsert": {
+                    "expires_at": datetime.fromtimestamp(expires_at, timezone.utc),
+                    "revoked_at": datetime.now(timezone.utc),
+                }
+            },
+            upsert=True,
+        )
+
+
+async def sync_revocations():
+    """Load revocations written since the last sync, by this or any other worker"""
+    global _synced_until
+    query = {"expires_at": {"$gt": datetime.now(timezone.utc)}}
+    if _synced_until is not None:
+        query["revoked_at"] = {"$gte": _synced_until - SYNC_OVERLAP}
+    cursor = RevokedToken.get_motor_collection().find(
+        query, projection={"token_hash": 1, "expires_at": 1, "revoked_at": 1}
+    )
+    async for document in cursor:
+        expires_at = document["expires_at"].replace(tzinfo=timezone.utc)
+        revoked_tokens.add(document["token_hash"], expires_at.timestamp())
+        if _synced_until is None or document["revoked_at"] > _synced_until:
+            _synced_until = document["revoked_at"]
+    revoked_tokens.purge()
+
+
+async def run_revocation_sync(interval: float):
+    """Background loop started by the lifespan"""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await sync_revocations()
+        except Exception as e:
+            logger.warning("Could not sync revoked tokens: %s", e)
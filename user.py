@@ -1,30 +1,44 @@
-from typing import Annotated
+import time
+from typing import Annotated, Literal, Optional
 from beanie import PydanticObjectId
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from passlib.context import CryptContext
 
 from jwt_auth import (
     LoginResult,
     Token,
+    UNBOUNDED_TOKEN_TTL,
     TokenData,
     create_access_token,
     decode_jwt_token,
 )
-from user_model import TokenValidationResponse, User, UserDto, UserRequest, ensure_admin_role
+from user_model import (
+    TokenValidationResponse,
+    User,
+    UserCredentials,
+    UserDto,
+    UserRequest,
+    UserSummary,
+    ensure_admin_role,
+)
+from authorization import get_authorized_user, role_cache
 from logging_config import setup_logger
+from my_config import get_settings
+from password_hasher import get_password_hasher
+from token_revocation import revoke_token
+from movie_queries import InvalidCursor
+from user_queries import count_users, fetch_user_page, user_filter
 
 logger = setup_logger()
 
-pwd_context = CryptContext(schemes=["bcrypt"])
-
 
 class HashPassword:
-    def create_hash(self, password: str):
-        return pwd_context.hash(password)
+    # bcrypt is slow on purpose, so it runs on the hasher's thread pool
+    async def create_hash(self, password: str):
+        return await get_password_hasher().hash(password)
 
-    def verify_hash(self, input_password: str, hashed_password: str):
-        return pwd_context.verify(input_password, hashed_password)
+    async def verify_hash(self, input_password: str, hashed_password: str):
+        return await get_password_hasher().verify(input_password, hashed_password)
 
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/users/sign-in")
@@ -32,9 +46,13 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/users/sign-in")
 hash_password = HashPassword()
 
 
-def get_user(token: Annotated[str, Depends(oauth2_scheme)]) -> TokenData:
-    print(token)
-    return decode_jwt_token(token)
+# async like get_current_user: a sync dependency would run in the threadpool
+# and touch the token cache from several threads at once
+async def get_user(token: Annotated[str, Depends(oauth2_scheme)]) -> TokenData:
+    token_data = decode_jwt_token(token)
+    # the token itself is a credential and is never logged
+    logger.debug("Bearer token decoded for user '%s'", token_data.username)
+    return token_data
 
 
 user_router = APIRouter()
@@ -46,28 +64,32 @@ async def login_for_access_token(
 ) -> LoginResult:  # Change return type to LoginResult
     ## Authenticate user by verifying the user in DB
     username = form_data.username
-    existing_user = await User.find_one(User.username == username)
+    existing_user = await User.find_one(
+        User.username == username, projection_model=UserCredentials
+    )
     if not existing_user:
-        logger.error(f"Failed login attempt for username '{username}: User not found")
+        logger.error("Failed login attempt for username '%s': User not found", username)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid username or password",
         )
 
-    authenticated = hash_password.verify_hash(
+    authenticated = await hash_password.verify_hash(
         form_data.password, existing_user.password
     )
     if authenticated:
         access_token = create_access_token(
             {"username": username, "role": existing_user.role}
         )
+        # The role was just read from the database, no need to read it again
+        role_cache.set(username, existing_user.role)
         # Return role information with the token
-        logger.info(f"User '{username}' successfully signed in. Role: {existing_user.role}")
+        logger.info("User '%s' successfully signed in. Role: %s", username, existing_user.role)
         return LoginResult(
             access_token=access_token, username=username, role=existing_user.role
         )
 
-    logger.error(f"Failed login attempt for username '{username}': Invalid password")
+    logger.error("Failed login attempt for username '%s': Invalid password", username)
     raise HTTPException(status_code=401, detail="Invalid username or password")
 
 
@@ -75,23 +97,27 @@ async def login_for_access_token(
 async def signup_user(user_request: UserRequest) -> dict:
     """Register a new user"""
     # Check if username already exists
-    existing_user = await User.find_one(User.username == user_request.username)
+    existing_user = await User.find_one(
+        User.username == user_request.username, projection_model=UserSummary
+    )
     if existing_user:
-        logger.warning(f"User signup failed: Username '{user_request.username}' already exists")
+        logger.warning("User signup failed: Username '%s' already exists", user_request.username)
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, detail="Username already exists"
         )
 
     # Check if email already exists
-    existing_email = await User.find_one(User.email == user_request.email)
+    existing_email = await User.find_one(
+        User.email == user_request.email, projection_model=UserSummary
+    )
     if existing_email:
-        logger.warning(f"User signup failed: Email '{user_request.email}' already exists")
+        logger.warning("User signup failed: Email '%s' already exists", user_request.email)
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, detail="Email already exists"
         )
 
     # Hash the password
-    hashed_password = hash_password.create_hash(user_request.password)
+    hashed_password = await hash_password.create_hash(user_request.password)
 
     # Create new user
     new_user = User(
@@ -102,7 +128,7 @@ async def signup_user(user_request: UserRequest) -> dict:
     )
 
     await new_user.insert()
-    logger.info(f"New user '{user_request.username}' signed up successfully. Role: BasicUser")
+    logger.info("New user '%s' signed up successfully. Role: BasicUser", user_request.username)
 
     return {"message": "User created successfully"}
 
@@ -110,7 +136,7 @@ async def signup_user(user_request: UserRequest) -> dict:
 
 @user_router.get("/validate-token", response_model=TokenValidationResponse)
 async def validate_token(token_data: Annotated[TokenData, Depends(get_user)]) -> TokenValidationResponse:
-    logger.info(f"Token validated for user '{token_data.username}'. Role: {token_data.role}")
+    logger.info("Token validated for user '%s'. Role: %s", token_data.username, token_data.role)
     return TokenValidationResponse(
         username=token_data.username,
         role=token_data.role,
@@ -118,38 +144,65 @@ async def validate_token(token_data: Annotated[TokenData, Depends(get_user)]) ->
     )
 
 @user_router.post("/logout")
-async def logout_user(token_data: Annotated[TokenData, Depends(get_user)]) -> dict:
-    logger.info(f"User: '{token_data.username}' logged out. Role: {token_data.role}")
+async def logout_user(
+    token: Annotated[str, Depends(oauth2_scheme)],
+    token_data: Annotated[TokenData, Depends(get_user)],
+) -> dict:
+    # The token stays revoked until it would have expired
+    if token_data.exp:
+        expires_at = token_data.exp.timestamp()
+    else:
+        expires_at = time.time() + UNBOUNDED_TOKEN_TTL
+    await revoke_token(
+        token, expires_at, persist=get_settings().token_revocation_sync_seconds > 0
+    )
+    logger.info("User: '%s' logged out. Role: %s", token_data.username, token_data.role)
     return {"message": "Logged out successfully"}
 
 
-@user_router.get("")
-async def get_all_users(user: Annotated[TokenData, Depends(get_user)]) -> list[UserDto]:
+@user_router.get("", response_model=list[UserDto])
+async def get_all_users(
+    user: Annotated[TokenData, Depends(get_authorized_user)],
+    role: Optional[str] = Query(None, description="Only users with this role"),
+    username: Optional[str] = Query(None, max_length=100, description="Username prefix"),
+    email: Optional[str] = Query(None, max_length=100, description="Email prefix"),
+    after: Optional[str] = Query(None, description="Cursor returned in X-Next-Cursor"),
+    limit: int = Query(100, ge=1, le=1000, description="Page size"),
+    count: Literal["none", "estimated", "exact"] = Query(
+        "none", description="Return the number of matching users in X-Total-Count"
+    ),
+) -> Response:
+    """One page of users, ordered by username (by email when searching by email)"""
     ensure_admin_role(user)
-    users = await User.find_all().to_list()
-    result = []
-    for u in users:
-        result.append(
-            UserDto(id=str(u.id), username=u.username, email=u.email, role=u.role)
-        )
-    return result
+    try:
+        body, next_cursor = await fetch_user_page(role, username, email, after, limit)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    headers = {}
+    if next_cursor:
+        headers["X-Next-Cursor"] = next_cursor
+    if count != "none":
+        query = user_filter(role, username, email)
+        headers["X-Total-Count"] = str(await count_users(query, exact=count == "exact"))
+    return Response(content=body, media_type="application/json", headers=headers)
 
 
 @user_router.post("/{id}")
 async def update_user_role(
-    id: PydanticObjectId, user: Annotated[TokenData, Depends(get_user)]
+    id: PydanticObjectId, user: Annotated[TokenData, Depends(get_authorized_user)]
 ) -> dict:
     ensure_admin_role(user)
-    affected_user = await User.get(id)
+    affected_user = await User.find_one(User.id == id, projection_model=UserSummary)
     if not affected_user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"The user with ID={id} is not found.",
         )
 
-    if affected_user.role == "BasicUser":
-        affected_user.role = "AdminUser"
-    else:
-        affected_user.role = "BasicUser"
-    await affected_user.save()
-    return {"newRole": affected_user.role}
+    new_role = "AdminUser" if affected_user.role == "BasicUser" else "BasicUser"
+    # Only the role is written, not the whole document
+    await User.find_one(User.id == id).update({"$set": {"role": new_role}})
+    # drop the cached role so the change applies to the user's next request
+    role_cache.invalidate(affected_user.username)
+    return {"newRole": new_role}
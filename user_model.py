@@ -1,7 +1,8 @@
 from typing import Optional
-from beanie import Document
+from beanie import Document, PydanticObjectId
 from fastapi import HTTPException, status
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+from pymongo import ASCENDING, IndexModel
 
 from jwt_auth import TokenData
 
@@ -11,10 +12,40 @@ class User(Document):
     email: str
     password: str  # hash & salted password in the database
     role: str = "BasicUser"
-    photo: Optional[str] = None 
+    photo: Optional[str] = None  # legacy base64 photo, moved to photo_store at startup
+    photo_id: Optional[str] = None  # digest of the background photo in photo_store
+    photo_unreadable: bool = False  # legacy photo the migration could not read
 
     class Settings:
         name = "users"
+        indexes = [
+            IndexModel([("username", ASCENDING)], unique=True),
+            IndexModel([("email", ASCENDING)], unique=True),
+            # admin listing filtered by role, paged by username
+            IndexModel([("role", ASCENDING), ("username", ASCENDING)]),
+        ]
+
+
+class UserSummary(BaseModel):
+    """
+    # projection for reading users without their password or photo data
+    """
+
+    id: PydanticObjectId = Field(alias="_id")
+    username: str
+    email: str
+    role: str = "BasicUser"
+    photo_id: Optional[str] = None
+
+
+class UserCredentials(BaseModel):
+    """
+    # projection for signing in, only what checking the password needs
+    """
+
+    username: str
+    password: str
+    role: str = "BasicUser"
 
 
 class UserRequest(BaseModel):
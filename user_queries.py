@@ -0,0 +1,105 @@
+import re
+from typing import List, Optional, Tuple
+
+from pydantic import TypeAdapter
+
+from movie_queries import InvalidCursor, decode_opaque, encode_opaque
+from user_model import User, UserDto
+
+# ----- ADMIN USER LISTING -----
+# Users are paged by username, or by email when searching by email prefix;
+# both are unique, so the last value of a page is a complete keyset cursor.
+# Prefix searches are case sensitive anchored regexes, which use the indexes.
+
+user_list_adapter = TypeAdapter(List[UserDto])
+
+USER_PROJECTION = {
+    "$project": {
+        "_id": 0,
+        "id": {"$toString": "$_id"},
+        "username": 1,
+        "email": 1,
+        "role": 1,
+    }
+}
+
+
+def encode_user_cursor(sort_field: str, value: str) -> str:
+    return encode_opaque({"f": sort_field, "v": value})
+
+
+def decode_user_cursor(cursor: str, sort_field: str) -> str:
+    """The last value of the previous page; the cursor must be for the same ordering"""
+    try:
+        data = decode_opaque(cursor)
+        if data["f"] != sort_field:
+            raise ValueError("cursor is for another ordering")
+        return str(data["v"])
+    except (ValueError, KeyError, TypeError) as e:
+        raise InvalidCursor(f"Invalid cursor: {cursor}") from e
+
+
+def user_filter(
+    role: Optional[str], username_prefix: Optional[str], email_prefix: Optional[str]
+) -> dict:
+    query = {}
+    if role:
+        query["role"] = role
+    if username_prefix:
+        query["username"] = {"$regex": "^" + re.escape(username_prefix)}
+    if email_prefix:
+        query["email"] = {"$regex": "^" + re.escape(email_prefix)}
+    return query
+
+
+def sort_field_for(email_prefix: Optional[str]) -> str:
+    # an email prefix search walks the email index, so the page follows it
+    return "email" if email_prefix else "username"
+
+
+def user_list_pipeline(query: dict, sort_field: str, after: Optional[str], limit: int) -> list:
+    if after is not None:
+        bound = {"$gt": after}
+        existing = query.get(sort_field)
+        query = {**query, sort_field: {**existing, **bound} if existing else bound}
+    return [
+        {"$match": query},
+        {"$sort": {sort_field: 1}},
+        {"$limit": limit + 1},
+        USER_PROJECTION,
+    ]
+
+
+async def fetch_user_page(
+    role: Optional[str] = None,
+    username_prefix: Optional[str] = None,
+    email_prefix: Optional[str] = None,
+    after: Optional[str] = None,
+    limit: int = 100,
+) -> Tuple[bytes, Optional[str]]:
+    """
+    One page of users as UserDto JSON, and the cursor of the next page if
+    there is one. Raises InvalidCursor for a malformed cursor.
+    """
+    sort_field = sort_field_for(email_prefix)
+    after_value = decode_user_cursor(after, sort_field) if after else None
+    query = user_filter(role, username_prefix, email_prefix)
+    rows = await User.aggregate(user_list_pipeline(query, sort_field, after_value, limit)).to_list()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_user_cursor(sort_field, rows[-1][sort_field])
+    body = user_list_adapter.dump_json(user_list_adapter.validate_python(rows))
+    return body, next_cursor
+
+
+async def count_users(query: dict, exact: bool) -> int:
+    """
+    Total number of users matching query. Without a filter and unless exact is
+    asked for, this is the collection metadata count, which costs no scan.
+    """
+    collection = User.get_motor_collection()
+    if not query and not exact:
+        return await collection.estimated_document_count()
+    return await collection.count_documents(query)